@@ -1,7 +1,34 @@
+import os
+import sys
+import csv
+import json
 import time
+import random
+import argparse
 import subprocess
+import threading
+import concurrent.futures
 from pathlib import Path
-from typing import Iterable, Tuple, Optional, List
+from collections import deque
+from typing import Dict, Iterable, Tuple, Optional, List
+
+try:
+    import htcondor
+except ImportError:
+    htcondor = None
+
+from CondorLogParser import CondorLogParser
+
+# HTCondor JobStatus codes
+JOB_STATUS = {1: "idle", 2: "running", 3: "removed", 4: "completed", 5: "held", 6: "transferring_output", 7: "suspended"}
+# Hold codes worth a release: the job is fine, a file transfer or the worker node was not
+# (6 FailedToCreateProcess, 7-10 UnableToOpen{Output,Input}{,Stream}, 12 TransferOutputError, 13 TransferInputError)
+TRANSIENT_HOLD_CODES = (6, 7, 8, 9, 10, 12, 13)
+TRANSIENT_HOLD_PATTERNS = ("transfer", "timed out", "connection", "temporarily", "network")
+# Holds put on by a user (condor_hold) are left alone
+USER_HOLD_CODES = (1,)
+# Columns of the telemetry time series; the other states are folded into running/other
+TELEMETRY_STATES = ("idle", "running", "held", "completed", "other")
 
 # Example usage snippets:
 # 1) Read the global clusters file and wait only on those:
@@ -13,18 +40,599 @@ from typing import Iterable, Tuple, Optional, List
 # clusters = CondorJobCountMonitor.load_clusters_for_dirs(resubmitted_dirs, condor_root="condor")
 # monitor.wait_until_jobs_below(clusters=clusters)
 
+# 3) Follow the user logs instead of querying the schedd (like condor_wait):
+# logs = CondorJobCountMonitor.find_user_logs(["condor/log/"])
+# monitor.wait_until_jobs_below(clusters=clusters, logs=logs)
+
+# 4) Record per-cluster counts while waiting, with throughput/ETA in the progress messages:
+# monitor = CondorJobCountMonitor(threshold=1, verbose=True, telemetry="condor/telemetry.csv")
+
+# 5) Release transiently held jobs (up to 3 times) and remove the others while waiting:
+# monitor = CondorJobCountMonitor(threshold=1, hold_policy=HoldPolicy(max_releases=3, report_path="condor/held_jobs.jsonl"))
+
+def _histograms(pairs: Iterable[Tuple[str, int]]) -> Dict[str, Dict[str, int]]:
+    """{cluster_id: {status_name: count}} from (cluster_id, JobStatus) pairs."""
+    histograms: Dict[str, Dict[str, int]] = {}
+    for cluster_id, status_code in pairs:
+        status = JOB_STATUS.get(status_code, "unknown")
+        hist = histograms.setdefault(cluster_id, {})
+        hist[status] = hist.get(status, 0) + 1
+    return histograms
+
+class CondorQBackend:
+    """Job queries through the condor_q command line, one call per schedd with autoformat output."""
+    name = "cli"
+
+    def __init__(self, verbose: bool = False):
+        self.verbose = verbose
+
+    def _condor_q_af_cmd(self, cluster_ids: Optional[List[str]] = None, schedd: Optional[str] = None) -> List[str]:
+        """One condor_q for all cluster_ids on a schedd (or all of $USER's jobs), printing "ClusterId JobStatus" per job."""
+        cmd = ["condor_q"]
+        if schedd:
+            cmd += ["-name", schedd]
+        if cluster_ids:
+            cmd += list(cluster_ids)
+        else:
+            cmd.append(os.environ.get("USER", ""))
+        return cmd + ["-af", "ClusterId", "JobStatus"]
+
+    def _condor_q_user_cmd(self, total: bool = False) -> str:
+        cmd = "condor_q $USER"
+        if total:
+            cmd = cmd + " -total"
+        return cmd
+
+    def _run_condor_q(self, cmd: List[str], max_retries: int = 5, backoff: int = 2) -> Optional[str]:
+        """Run condor_q with retries if schedd is unreachable. Returns None if it keeps failing."""
+        attempt = 0
+    
+        transient_errors = [
+            "Can't find address of local schedd",
+            "Can't find address of schedd",
+            "Unable to connect to",
+            "Failed to connect",
+        ]
+    
+        while attempt < max_retries:
+            attempt += 1
+            try:
+                return subprocess.check_output(
+                    cmd,
+                    text=True,
+                    stderr=subprocess.STDOUT
+                )
+            except subprocess.CalledProcessError as e:
+                output = (e.output or "").strip()
+                if any(sig in output for sig in transient_errors):
+                    wait_time = min(backoff * attempt, 10)  # cap at 10s
+                    print(f"[warn] condor_q transient schedd error "
+                          f"({' '.join(cmd)}, attempt={attempt}/{max_retries}). "
+                          f"Retrying in {wait_time}s...")
+                    print("  Output:", output.replace("\n", " | "))
+                    time.sleep(wait_time)
+                    continue
+                else:
+                    # not transient, re-raise
+                    raise
+    
+        # if we exit the loop, all retries failed
+        print(f"[error] condor_q failed after {max_retries} retries ({' '.join(cmd)})")
+        return None
+
+    @staticmethod
+    def _parse_af_output(output: str) -> Dict[str, Dict[str, int]]:
+        """{cluster_id: {status_name: count}} from "-af ClusterId JobStatus" lines."""
+        pairs = []
+        for line in output.splitlines():
+            fields = line.split()
+            if len(fields) == 2 and fields[0].isdigit() and fields[1].isdigit():
+                pairs.append((fields[0], int(fields[1])))
+        return _histograms(pairs)
+
+    def query_status(self, schedd: Optional[str], cluster_ids: Optional[List[str]]) -> Optional[Dict[str, Dict[str, int]]]:
+        """Status histograms of cluster_ids (all of $USER's jobs if None) on schedd, None if the query failed."""
+        try:
+            output = self._run_condor_q(self._condor_q_af_cmd(cluster_ids, schedd))
+        except (subprocess.CalledProcessError, OSError) as e:
+            if self.verbose:
+                print(f"[CondorJobCountMonitor] condor_q failed on {schedd or 'local schedd'}: {e}")
+            return None
+        return None if output is None else self._parse_af_output(output)
+
+    def held_jobs(self, schedd: Optional[str], cluster_ids: Optional[List[str]]) -> Optional[List[dict]]:
+        """Held jobs of cluster_ids (all of $USER's if None) on schedd with their hold reason, None if the query failed."""
+        cmd = self._condor_q_af_cmd(cluster_ids, schedd)[:-3]
+        cmd += ["-constraint", "JobStatus == 5", "-af:j", "HoldReasonCode", "HoldReasonSubCode", "NumHolds", "HoldReason"]
+        try:
+            output = self._run_condor_q(cmd)
+        except (subprocess.CalledProcessError, OSError) as e:
+            if self.verbose:
+                print(f"[CondorJobCountMonitor] condor_q failed on {schedd or 'local schedd'}: {e}")
+            return None
+        if output is None:
+            return None
+        jobs = []
+        for line in output.splitlines():
+            # -af:j prints the job id first; HoldReason has spaces and comes last
+            fields = line.split(None, 4)
+            if len(fields) < 4 or "." not in fields[0]:
+                continue
+            code, subcode, num_holds = (int(f) if f.lstrip("-").isdigit() else None for f in fields[1:4])
+            jobs.append({"job_id": fields[0], "code": code, "subcode": subcode, "num_holds": num_holds,
+                         "reason": fields[4] if len(fields) > 4 else ""})
+        return jobs
+
+    def act(self, action: str, schedd: Optional[str], job_ids: List[str]) -> bool:
+        """condor_release ("release") or condor_rm ("remove") job_ids on schedd. Returns True on success."""
+        cmd = [{"release": "condor_release", "remove": "condor_rm"}[action]]
+        if schedd:
+            cmd += ["-name", schedd]
+        try:
+            result = subprocess.run(cmd + list(job_ids), capture_output=True, text=True)
+        except OSError as e:
+            print(f"[CondorJobCountMonitor] {cmd[0]} failed: {e}")
+            return False
+        if result.returncode != 0:
+            print(f"[CondorJobCountMonitor] {cmd[0]} failed on {schedd or 'local schedd'}: {(result.stdout + result.stderr).strip()}")
+            return False
+        return True
+
+    def total_user_jobs(self) -> int:
+        # -total only prints the summary line, cheaper than listing every job
+        output = subprocess.check_output(self._condor_q_user_cmd(total=True), shell=True, text=True)
+        total = 0
+        for line in output.splitlines():
+            # "Total for query: 108 jobs; 0 completed, 0 removed, 0 idle, 108 running, 0 held, 0 suspended"
+            parts = line.split()
+            if line.startswith("Total for query:") and len(parts) > 3 and parts[3].isdigit():
+                total += int(parts[3])
+        return total
+
+class HTCondorBindingsBackend:
+    """
+    Job queries through the htcondor Python bindings: no fork per poll, one Schedd handle per schedd
+    kept for the lifetime of the monitor, and only ClusterId/JobStatus projected and streamed.
+    """
+    name = "bindings"
+    PROJECTION = ["ClusterId", "JobStatus"]
+
+    def __init__(self, verbose: bool = False, htcondor_module=None):
+        self.htcondor = htcondor_module or htcondor
+        if self.htcondor is None:
+            raise ImportError("the htcondor Python bindings are not available")
+        self.verbose = verbose
+        self._collector = None
+        self._schedds = {}
+        self._lock = threading.Lock()
+
+    def _schedd(self, name: Optional[str]):
+        with self._lock:
+            schedd = self._schedds.get(name)
+            if schedd is None:
+                if name is None:
+                    schedd = self.htcondor.Schedd()
+                else:
+                    if self._collector is None:
+                        self._collector = self.htcondor.Collector()
+                    schedd = self.htcondor.Schedd(self._collector.locate(self.htcondor.DaemonTypes.Schedd, name))
+                self._schedds[name] = schedd
+            return schedd
+
+    def _iter_ads(self, schedd, constraint: str, projection: List[str]):
+        # xquery streams ads as they arrive; newer bindings only have query
+        if hasattr(schedd, "xquery"):
+            return schedd.xquery(requirements=constraint, projection=projection)
+        return schedd.query(constraint=constraint, projection=projection)
+
+    @staticmethod
+    def _user_constraint() -> str:
+        return f'Owner == "{os.environ.get("USER", "")}"'
+
+    def _constraint(self, cluster_ids: Optional[List[str]]) -> str:
+        if cluster_ids:
+            return " || ".join(f"ClusterId == {int(c)}" for c in cluster_ids)
+        return self._user_constraint()
+
+    def _failed(self, schedd: Optional[str], what: str, e: Exception):
+        # Drop the handle: the schedd may have moved or restarted, locate it again next time
+        with self._lock:
+            self._schedds.pop(schedd, None)
+        if self.verbose:
+            print(f"[CondorJobCountMonitor] schedd {what} failed on {schedd or 'local schedd'}: {e}")
+
+    def query_status(self, schedd: Optional[str], cluster_ids: Optional[List[str]]) -> Optional[Dict[str, Dict[str, int]]]:
+        """Status histograms of cluster_ids (all of $USER's jobs if None) on schedd, None if the query failed."""
+        try:
+            ads = self._iter_ads(self._schedd(schedd), self._constraint(cluster_ids), self.PROJECTION)
+            return _histograms((str(ad["ClusterId"]), int(ad["JobStatus"])) for ad in ads)
+        except Exception as e:
+            self._failed(schedd, "query", e)
+            return None
+
+    def held_jobs(self, schedd: Optional[str], cluster_ids: Optional[List[str]]) -> Optional[List[dict]]:
+        """Held jobs of cluster_ids (all of $USER's if None) on schedd with their hold reason, None if the query failed."""
+        constraint = f"({self._constraint(cluster_ids)}) && JobStatus == 5"
+        projection = ["ClusterId", "ProcId", "HoldReasonCode", "HoldReasonSubCode", "NumHolds", "HoldReason"]
+        try:
+            return [{"job_id": f"{ad['ClusterId']}.{ad['ProcId']}", "code": ad.get("HoldReasonCode"),
+                     "subcode": ad.get("HoldReasonSubCode"), "num_holds": ad.get("NumHolds"),
+                     "reason": ad.get("HoldReason", "")}
+                    for ad in self._iter_ads(self._schedd(schedd), constraint, projection)]
+        except Exception as e:
+            self._failed(schedd, "query", e)
+            return None
+
+    def act(self, action: str, schedd: Optional[str], job_ids: List[str]) -> bool:
+        """Release ("release") or remove ("remove") job_ids on schedd. Returns True on success."""
+        job_action = {"release": self.htcondor.JobAction.Release, "remove": self.htcondor.JobAction.Remove}[action]
+        try:
+            self._schedd(schedd).act(job_action, list(job_ids))
+        except Exception as e:
+            self._failed(schedd, action, e)
+            print(f"[CondorJobCountMonitor] {action} of {len(job_ids)} job(s) failed on {schedd or 'local schedd'}: {e}")
+            return False
+        return True
+
+    def total_user_jobs(self) -> int:
+        return sum(1 for _ in self._iter_ads(self._schedd(None), self._user_constraint(), ["ClusterId"]))
+
+def make_backend(name: str = "auto", verbose: bool = False):
+    """
+    "cli" (condor_q), "bindings" (htcondor Python bindings), or "auto": the bindings when they
+    can be imported, otherwise condor_q.
+    """
+    if name == "cli":
+        return CondorQBackend(verbose)
+    if name == "bindings":
+        return HTCondorBindingsBackend(verbose)
+    if name != "auto":
+        raise ValueError(f"Unknown condor backend {name}, choose from auto, cli, bindings")
+    if htcondor is not None:
+        try:
+            return HTCondorBindingsBackend(verbose)
+        except Exception as e:
+            if verbose:
+                print(f"[CondorJobCountMonitor] htcondor bindings unusable ({e}), falling back to condor_q")
+    return CondorQBackend(verbose)
+
+class PollSchedule:
+    """
+    Delays between the queries of a wait loop.
+
+    The delay starts at min_interval and grows by factor (up to max_interval) for as long as the
+    watched count does not move. Once jobs are draining, the delay follows eta_fraction of the
+    estimated time left before the count reaches its target: long while far from it, shorter and
+    shorter as it gets close, so the end of a long wait is noticed quickly. Each delay is spread by +-jitter so that
+    several waiting scripts do not query the schedd in lockstep.
+    """
+    def __init__(self, min_interval: float = 5.0, max_interval: float = 300.0, factor: float = 1.5,
+                 jitter: float = 0.2, eta_fraction: float = 0.5, clock=time.monotonic, rng=None):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.factor = factor
+        self.jitter = jitter
+        self.eta_fraction = eta_fraction
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self._delay = None
+        self._last_count = None
+        self._start = None  # (time, count) when the count last sat at its first value
+
+    def next_delay(self, count: Optional[int], target: int) -> float:
+        """
+        Seconds to sleep after a query that saw count jobs (None if the query failed), when waiting
+        for count to drop to target.
+        """
+        now = self.clock()
+        if count is None or count == self._last_count:
+            delay = min(self.max_interval, (self._delay or self.min_interval) * self.factor)
+        else:
+            delay = self.min_interval
+        if count is not None:
+            # Drain rate measured from the last time the count sat at its first value
+            if self._start is None or count == self._start[1]:
+                self._start = (now, count)
+            elapsed, drained = now - self._start[0], self._start[1] - count
+            if elapsed > 0 and drained > 0 and count > target:
+                eta = (count - target) / (drained / elapsed)
+                # Moving: pace the queries on the time left; static: keep backing off, but not past it
+                delay = eta * self.eta_fraction if count != self._last_count else min(delay, eta * self.eta_fraction)
+                delay = min(self.max_interval, max(self.min_interval, delay))
+            self._last_count = count
+        self._delay = delay
+        return delay * self.rng.uniform(1 - self.jitter, 1 + self.jitter)
+
+class JobTelemetry:
+    """
+    Time series of per-cluster job counts, with rolling completion throughput and ETA.
+
+    Every record() folds one set of status histograms (see CondorJobCountMonitor.status_histograms)
+    into idle/running/held/completed/other counts per (cluster, schedd). Rows are appended to path,
+    CSV if it ends in .csv and JSON lines otherwise, only for clusters whose counts changed, so a
+    long wait stays small on disk; a cluster that left the queue gets a row of zeros. Jobs count as
+    done once they left the queue or completed; throughput is measured over the last window_s seconds.
+
+    Usage:
+        telemetry = JobTelemetry("condor/telemetry.csv")
+        telemetry.record(monitor.status_histograms(clusters))
+        telemetry.throughput(), telemetry.eta(telemetry.queued())   # jobs/min, seconds
+        JobTelemetry.replay("condor/telemetry.csv")                 # rebuilt from the file
+    """
+    COLUMNS = ("time", "cluster", "schedd") + TELEMETRY_STATES
+
+    def __init__(self, path: Optional[str] = None, window_s: float = 900.0, clock=time.time):
+        self.path = path
+        self.window_s = window_s
+        self.clock = clock
+        self.counts: Dict[Tuple[str, Optional[str]], Dict[str, int]] = {}
+        self.peak: Dict[Tuple[str, Optional[str]], int] = {}       # most jobs seen in the queue at once
+        self.last_change: Dict[Tuple[str, Optional[str]], float] = {}
+        self.samples = deque()  # (time, jobs done)
+
+    @staticmethod
+    def fold(hist: Dict[str, int]) -> Dict[str, int]:
+        counts = dict.fromkeys(TELEMETRY_STATES, 0)
+        for status, n in hist.items():
+            if status == "transferring_output":
+                status = "running"
+            counts[status if status in counts else "other"] += n
+        return counts
+
+    def record(self, histograms: Dict[Tuple[str, Optional[str]], Optional[Dict[str, int]]],
+               complete: bool = False, now: Optional[float] = None) -> List[dict]:
+        """
+        Add one sample. Clusters mapped to None (schedd not reachable) keep their previous counts.
+        With complete=True, histograms covers the whole queue and clusters missing from it have
+        left. Returns the rows written.
+        """
+        now = self.clock() if now is None else now
+        current = {key: self.fold(hist) for key, hist in histograms.items() if hist is not None}
+        if complete:
+            for key in self.counts:
+                current.setdefault(key, dict.fromkeys(TELEMETRY_STATES, 0))
+        rows = [dict({"time": round(now, 1), "cluster": cluster_id, "schedd": schedd or ""}, **counts)
+                for (cluster_id, schedd), counts in current.items() if counts != self.counts.get((cluster_id, schedd))]
+        self._apply(now, rows)
+        self._write(rows)
+        return rows
+
+    def _apply(self, now: float, rows: List[dict]):
+        for row in rows:
+            key = (str(row["cluster"]), row["schedd"] or None)
+            counts = {state: int(row[state]) for state in TELEMETRY_STATES}
+            self.counts[key] = counts
+            self.peak[key] = max(self.peak.get(key, 0), sum(counts.values()))
+            self.last_change[key] = now
+        done = sum(self.peak[key] - sum(counts.values()) + counts["completed"] for key, counts in self.counts.items())
+        self.samples.append((now, done))
+        # Keep one sample at or before the start of the window
+        while len(self.samples) > 2 and self.samples[1][0] <= now - self.window_s:
+            self.samples.popleft()
+
+    def _write(self, rows: List[dict]):
+        if not self.path or not rows:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        as_csv = self.path.endswith(".csv")
+        new_file = not os.path.exists(self.path)
+        with open(self.path, "a", newline="") as f:
+            if as_csv:
+                writer = csv.DictWriter(f, fieldnames=self.COLUMNS)
+                if new_file:
+                    writer.writeheader()
+                writer.writerows(rows)
+            else:
+                for row in rows:
+                    f.write(json.dumps(row, separators=(",", ":")) + "\n")
+
+    @classmethod
+    def replay(cls, path: str, window_s: float = 900.0) -> "JobTelemetry":
+        """Telemetry rebuilt from a file written by record(); further samples are appended to it."""
+        telemetry = cls(path, window_s)
+        if not os.path.exists(path):
+            return telemetry
+        with open(path, "r", newline="") as f:
+            if path.endswith(".csv"):
+                rows = list(csv.DictReader(f))
+            else:
+                rows = [json.loads(line) for line in f if line.strip()]
+        group: List[dict] = []
+        for row in rows:
+            if group and float(row["time"]) != float(group[0]["time"]):
+                telemetry._apply(float(group[0]["time"]), group)
+                group = []
+            group.append(row)
+        if group:
+            telemetry._apply(float(group[0]["time"]), group)
+        return telemetry
+
+    def queued(self, states: Iterable[str] = ("idle", "running", "held", "other")) -> int:
+        return sum(counts[state] for counts in self.counts.values() for state in states)
+
+    def throughput(self) -> Optional[float]:
+        """Jobs finished per minute over the rolling window, None before two samples."""
+        if len(self.samples) < 2:
+            return None
+        (t0, done0), (t1, done1) = self.samples[0], self.samples[-1]
+        if t1 <= t0:
+            return None
+        return max(0, done1 - done0) * 60.0 / (t1 - t0)
+
+    def eta(self, remaining: int) -> Optional[float]:
+        """Seconds until remaining more jobs have finished at the current throughput, None if unknown."""
+        if remaining <= 0:
+            return 0.0
+        rate = self.throughput()
+        return remaining * 60.0 / rate if rate else None
+
+    def progress(self, remaining: int) -> str:
+        """", 12.5 jobs/min, ETA 1h02m" style suffix for progress messages."""
+        rate = self.throughput()
+        if rate is None:
+            return ""
+        eta = self.eta(remaining)
+        return f", {rate:.1f} jobs/min" + (f", ETA {format_duration(eta)}" if eta is not None else ", no progress")
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+class HoldPolicy:
+    """
+    What CondorJobCountMonitor.handle_held does with held jobs.
+
+    Transient holds (hold code in transient_codes or reason matching transient_patterns, i.e. file
+    transfer and worker-node trouble) are released, at most max_releases times per job. Other holds
+    (memory limit, periodic_hold policies, ...) will not go away by themselves: the jobs are removed
+    when remove_permanent is set, so that checkJobs.py resubmits them, and kept otherwise. Holds put
+    on by a user are never touched. Every release/removal is appended to report_path (JSON lines).
+    """
+    def __init__(self, max_releases: int = 3, remove_permanent: bool = True, report_path: Optional[str] = None,
+                 transient_codes: Iterable[int] = TRANSIENT_HOLD_CODES, transient_patterns: Iterable[str] = TRANSIENT_HOLD_PATTERNS):
+        self.max_releases = max_releases
+        self.remove_permanent = remove_permanent
+        self.report_path = report_path
+        self.transient_codes = tuple(transient_codes)
+        self.transient_patterns = tuple(p.lower() for p in transient_patterns)
+
+    def is_transient(self, job: dict) -> bool:
+        reason = (job.get("reason") or "").lower()
+        return job.get("code") in self.transient_codes or any(p in reason for p in self.transient_patterns)
+
+    def decide(self, job: dict, releases_done: int) -> str:
+        """"release", "remove" or "keep"."""
+        if job.get("code") in USER_HOLD_CODES:
+            return "keep"
+        if self.is_transient(job) and releases_done < self.max_releases:
+            return "release"
+        return "remove" if self.remove_permanent else "keep"
+
+    def report(self, entries: List[dict]):
+        if not self.report_path or not entries:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.report_path)), exist_ok=True)
+        with open(self.report_path, "a") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
 class CondorJobCountMonitor:
     """
     Condor job-count monitor with integrated cluster-list utilities.
 
+    Queries go through a backend (see make_backend): the htcondor Python bindings when they can be
+    imported, condor_q otherwise. The wait_* methods space their queries with a PollSchedule
+    (min_interval..max_interval); given logs= they follow the jobs' user logs instead and leave the
+    schedd alone. With telemetry (a JobTelemetry or a .csv/.jsonl path) every query of a wait is
+    recorded and the progress messages carry throughput and ETA. Held jobs seen while waiting are
+    reported with their hold reasons and, given a hold_policy (see HoldPolicy), released or removed.
+
     Usage:
         monitor = CondorJobCountMonitor(threshold=1, verbose=True)
         clusters = CondorJobCountMonitor.load_submitted_clusters("condor")
         monitor.wait_until_jobs_below(clusters=clusters)
     """
-    def __init__(self, threshold: int = 10000, verbose: bool = False):
+    def __init__(self, threshold: int = 10000, verbose: bool = False, backend="auto",
+                 min_interval: float = 5.0, max_interval: float = 300.0, log_interval: float = 1.0,
+                 telemetry=None, hold_policy: Optional[HoldPolicy] = None):
         self.verbose = verbose
+        self.hold_policy = hold_policy
+        self.releases: Dict[Tuple[Optional[str], str], int] = {}     # (schedd, job_id) -> releases done here
+        self.removed_held: List[dict] = []                           # jobs removed by the hold policy
+        self._reported_holds = set()
+        self.telemetry = JobTelemetry.replay(telemetry) if isinstance(telemetry, str) else telemetry
+        self.backend = make_backend(backend, verbose) if isinstance(backend, str) else backend
         self.set_threshold(threshold)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.log_interval = log_interval
+        # Swapped out to run the wait loops against a simulated queue
+        self.sleep = time.sleep
+        self.clock = time.monotonic
+
+    def held_jobs(self, clusters: Optional[Iterable[Tuple[str, Optional[str]]]] = None) -> Dict[Tuple[str, Optional[str]], List[dict]]:
+        """
+        Held jobs per cluster: {(cluster_id, schedd): [{"job_id", "code", "subcode", "num_holds", "reason"}, ...]},
+        one query per schedd, schedds concurrently. Schedds that could not be queried are left out.
+        If clusters is None all of $USER's held jobs on the local schedd are returned.
+        """
+        groups = self.group_by_schedd(clusters) if clusters is not None else {None: None}
+        result: Dict[Tuple[str, Optional[str]], List[dict]] = {}
+        if not groups:
+            return result
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(groups), 16)) as executor:
+            futures = {executor.submit(self.backend.held_jobs, schedd, ids): schedd for schedd, ids in groups.items()}
+            for future in concurrent.futures.as_completed(futures):
+                for job in future.result() or []:
+                    result.setdefault((job["job_id"].split(".")[0], futures[future]), []).append(job)
+        return result
+
+    def handle_held(self, clusters: Optional[Iterable[Tuple[str, Optional[str]]]] = None) -> Dict[str, int]:
+        """
+        Report held jobs (of clusters, if given) with their reasons and apply the hold policy:
+        release transient holds, remove permanent ones. Returns {"held", "released", "removed"} counts.
+        """
+        held = self.held_jobs(clusters)
+        counts = {"held": sum(len(jobs) for jobs in held.values()), "released": 0, "removed": 0}
+        actions: Dict[Tuple[str, Optional[str]], List[dict]] = {}
+        for (cluster_id, schedd), jobs in sorted(held.items(), key=lambda kv: (kv[0][1] or "", kv[0][0])):
+            new = [job for job in jobs if (schedd, job["job_id"], job["num_holds"]) not in self._reported_holds]
+            if new:
+                by_reason: Dict[str, int] = {}
+                for job in new:
+                    self._reported_holds.add((schedd, job["job_id"], job["num_holds"]))
+                    by_reason[job["reason"]] = by_reason.get(job["reason"], 0) + 1
+                for reason, n in sorted(by_reason.items(), key=lambda kv: -kv[1]):
+                    print(f"[CondorJobCountMonitor] cluster {cluster_id} on {schedd or 'local schedd'}: {n} job(s) held: {reason}")
+            if self.hold_policy is None:
+                continue
+            for job in jobs:
+                # NumHolds counts every hold of the job, also those released before this process started
+                releases_done = max(self.releases.get((schedd, job["job_id"]), 0), (job["num_holds"] or 1) - 1)
+                action = self.hold_policy.decide(job, releases_done)
+                if action != "keep":
+                    actions.setdefault((action, schedd), []).append(dict(job, schedd=schedd, releases=releases_done))
+
+        report = []
+        for (action, schedd), jobs in sorted(actions.items(), key=lambda kv: (kv[0][0], kv[0][1] or "")):
+            if not self.backend.act(action, schedd, [job["job_id"] for job in jobs]):
+                continue
+            now = round(time.time(), 1)
+            for job in jobs:
+                report.append(dict(job, action=action, time=now))
+                if action == "release":
+                    self.releases[(schedd, job["job_id"])] = job["releases"] + 1
+                else:
+                    self.removed_held.append(job)
+            counts["released" if action == "release" else "removed"] += len(jobs)
+            print(f"[CondorJobCountMonitor] {'Released' if action == 'release' else 'Removed'} {len(jobs)} held job(s) on {schedd or 'local schedd'}"
+                  + ("" if action == "release" else "; they will be resubmitted by checkJobs.py"))
+        if self.hold_policy is not None:
+            self.hold_policy.report(report)
+        return counts
+
+    def _handle_held_in(self, histograms, global_query: bool):
+        """handle_held for the clusters of histograms that have held jobs."""
+        held_clusters = [key for key, hist in histograms.items() if hist and hist.get("held")]
+        if held_clusters:
+            self.handle_held(None if global_query else held_clusters)
+
+    def _record(self, histograms, complete: bool = False):
+        if self.telemetry is not None:
+            self.telemetry.record(histograms, complete=complete)
+
+    def _progress(self, remaining: int) -> str:
+        return self.telemetry.progress(remaining) if self.telemetry is not None else ""
+
+    def _schedule(self, logs: bool = False) -> PollSchedule:
+        if logs:
+            # Reading local logs costs a stat per file: poll them faster, but still back off
+            return PollSchedule(self.log_interval, min(self.max_interval, 30.0), clock=self.clock)
+        return PollSchedule(self.min_interval, self.max_interval, clock=self.clock)
 
     def set_threshold(self, threshold: int):
         self.threshold = max(1, int(threshold))
@@ -104,157 +712,160 @@ class CondorJobCountMonitor:
             pass
 
     # ---------------------------
-    # Internal condor_q builders / parsers
+    # Schedd queries
     # ---------------------------
-    def _condor_q_cmd(self, cluster_id: str, schedd: Optional[str] = None, total: bool = False) -> str:
-        if schedd:
-            base = f"condor_q -name {schedd} {cluster_id}"
-        else:
-            base = f"condor_q {cluster_id}"
-        if total:
-            base = base + " -total"
-        return base
+    @staticmethod
+    def group_by_schedd(clusters: Iterable[Tuple[str, Optional[str]]]) -> Dict[Optional[str], List[str]]:
+        """{schedd_or_None: [cluster_id, ...]}, keeping the first occurrence of each cluster."""
+        groups: Dict[Optional[str], List[str]] = {}
+        for cluster_id, schedd in clusters:
+            ids = groups.setdefault(schedd, [])
+            if str(cluster_id) not in ids:
+                ids.append(str(cluster_id))
+        return groups
 
-    def _condor_q_user_cmd(self, total: bool = False) -> str:
-        cmd = "condor_q $USER"
-        if total:
-            cmd = cmd + " -total"
-        return cmd
+    def _query_schedd(self, schedd: Optional[str], cluster_ids: Optional[List[str]]) -> Optional[Dict[str, Dict[str, int]]]:
+        return self.backend.query_status(schedd, cluster_ids)
 
-    def _run_condor_q(self, cluster_id, schedd=None, total=False,
-                      max_retries: int = 5, backoff: int = 2):
-        """Run condor_q with retries if schedd is unreachable."""
-        cmd = self._condor_q_cmd(cluster_id, schedd, total)
-        attempt = 0
-    
-        transient_errors = [
-            "Can't find address of local schedd",
-            "Unable to connect to",
-            "Failed to connect",
-        ]
-    
-        while attempt < max_retries:
-            attempt += 1
-            try:
-                return subprocess.check_output(
-                    cmd,
-                    shell=True,
-                    text=True,
-                    stderr=subprocess.STDOUT
-                )
-            except subprocess.CalledProcessError as e:
-                output = (e.output or "").strip()
-                if any(sig in output for sig in transient_errors):
-                    wait_time = min(backoff * attempt, 10)  # cap at 10s
-                    print(f"[warn] condor_q transient schedd error "
-                          f"(cluster={cluster_id}, schedd={schedd}, attempt={attempt}/{max_retries}). "
-                          f"Retrying in {wait_time}s...")
-                    print("  Output:", output.replace("\n", " | "))
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    # not transient, re-raise
-                    raise
-    
-        # if we exit the loop, all retries failed
-        print(f"[error] condor_q failed after {max_retries} retries "
-              f"(cluster={cluster_id}, schedd={schedd})")
-        return None
+    # ---------------------------
+    # User logs
+    # ---------------------------
+    @staticmethod
+    def find_user_logs(paths: Iterable[str]) -> List[str]:
+        """*.log files under paths (files are taken as they are), e.g. ["condor_Summer23_130X_SMS/log/"]."""
+        logs: List[str] = []
+        todo = list(paths)
+        while todo:
+            path = todo.pop()
+            if not os.path.isdir(path):
+                logs.append(path)
+                continue
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        todo.append(entry.path)
+                    elif entry.name.endswith(".log"):
+                        logs.append(entry.path)
+        return sorted(logs)
 
-    def _count_jobs_from_output(self, output: str) -> int:
+    @staticmethod
+    def log_state_counts(parser: CondorLogParser, logs: Iterable[str], cluster_ids: Optional[Iterable[str]] = None) -> Dict[str, int]:
         """
-        Return the total jobs for the condor_q output (cluster-specific).
-        Only looks at 'Total for query:' line.
+        {state: number of jobs} over the jobs recorded in logs (only cluster_ids if given), see
+        CondorLogParser for the states. Logs that did not grow since the last call are not read again.
         """
-        for line in output.splitlines():
-            if line.startswith("Total for query:"):
-                # Example line: "Total for query: 108 jobs; 0 completed, 0 removed, 0 idle, 108 running, 0 held, 0 suspended"
-                parts = line.split()
-                try:
-                    return int(parts[3])  # the number after 'Total for query:'
-                except ValueError:
-                    return 0
-        return 0
-
-    def _count_idle_jobs_from_output(self, output: str) -> int:
-        idle = 0
-        for line in output.splitlines():
-            line = line.strip()
-            if not line or line.startswith("--") or "ID" in line:
-                continue
-            fields = line.split()
-            if len(fields) > 5:
-                status = fields[5]
-                if status == "I":
-                    idle += 1
-        return idle
+        wanted = {str(c) for c in cluster_ids} if cluster_ids is not None else None
+        counts: Dict[str, int] = {}
+        for path in logs:
+            for job_id, job in parser.parse_file(path).items():
+                if wanted is not None and job_id.split(".")[0] not in wanted:
+                    continue
+                counts[job["state"]] = counts.get(job["state"], 0) + 1
+        return counts
 
     # ---------------------------
     # Public API (with clusters support)
     # ---------------------------
+    def status_histograms(self, clusters: Optional[Iterable[Tuple[str, Optional[str]]]] = None) -> Dict[Tuple[str, Optional[str]], Optional[Dict[str, int]]]:
+        """
+        Per-cluster job-status histogram, e.g. {("76596545", "lpcschedd3.fnal.gov"): {"idle": 10, "running": 90}}.
+        Clusters are grouped by schedd and every schedd is queried once, all schedds concurrently.
+        A cluster with no jobs left maps to {}; clusters whose schedd could not be queried map to None.
+        If clusters is None all of $USER's jobs on the local schedd are returned, keyed by (cluster_id, None).
+        """
+        if clusters is None:
+            histograms = self._query_schedd(None, None)
+            if histograms is None:
+                raise RuntimeError("condor_q failed for $USER")
+            return {(cluster_id, None): hist for cluster_id, hist in histograms.items()}
+
+        groups = self.group_by_schedd(clusters)
+        result: Dict[Tuple[str, Optional[str]], Optional[Dict[str, int]]] = {}
+        if not groups:
+            return result
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(groups), 16)) as executor:
+            futures = {executor.submit(self._query_schedd, schedd, ids): schedd for schedd, ids in groups.items()}
+            for future in concurrent.futures.as_completed(futures):
+                schedd = futures[future]
+                histograms = future.result()
+                for cluster_id in groups[schedd]:
+                    result[(cluster_id, schedd)] = None if histograms is None else histograms.get(cluster_id, {})
+        return result
+
     def get_total_jobs(self, clusters: Optional[Iterable[Tuple[str, Optional[str]]]] = None) -> int:
         """
         Returns the total number of jobs.
-        If clusters is None: behave as before and query `condor_q $USER -total`.
-        If clusters is provided: sum job totals for each (cluster_id, schedd).
+        If clusters is None: all of $USER's jobs (`condor_q $USER -total` with the CLI backend).
+        If clusters is provided: sum of the jobs of each (cluster_id, schedd); clusters whose schedd cannot be queried are skipped.
         Returns -1 on error.
         """
         try:
             if clusters is None:
-                output = subprocess.check_output(self._condor_q_user_cmd(total=True), shell=True, text=True)
-                total = 0
-                for line in output.splitlines():
-                    if "Total for query" in line:
-                        parts = [p for p in line.split() if p.isdigit()]
-                        if parts:
-                            total += int(parts[-1])
-                return total
-            else:
-                total = 0
-                for cluster_id, schedd in clusters:
-                    output = self._run_condor_q(cluster_id, schedd, total=False)
-                    if output is not None:
-                        total += self._count_jobs_from_output(output)
-                return total
+                return self.backend.total_user_jobs()
+            histograms = self.status_histograms(clusters)
+            return sum(sum(hist.values()) for hist in histograms.values() if hist)
         except Exception as e:
             print(f"Error retrieving job count: {e}")
         return -1
 
-    def wait_until_no_idle_jobs(self, clusters: Optional[Iterable[Tuple[str, Optional[str]]]] = None):
+    def _wait_on_logs(self, logs: Iterable[str], clusters: Optional[Iterable[Tuple[str, Optional[str]]]],
+                      states: Tuple[str, ...], target: int, what: str):
+        """Wait until fewer than target jobs in logs (of clusters, if given) are in one of states."""
+        logs = self.find_user_logs(logs)
+        cluster_ids = [c for c, _ in clusters] if clusters is not None else None
+        parser = CondorLogParser()
+        schedule = self._schedule(logs=True)
         check_count = 0
+        while True:
+            counts = self.log_state_counts(parser, logs, cluster_ids)
+            waiting = sum(counts.get(state, 0) for state in states)
+            if waiting < target:
+                if self.verbose:
+                    print(f"[CondorJobCountMonitor] {waiting} {what} job(s) left in {len(logs)} user log(s). Proceeding...")
+                return
+            if check_count % 10 == 0 and self.verbose:
+                print(f"[CondorJobCountMonitor] {waiting} {what} job(s) in {len(logs)} user log(s). Waiting...")
+            check_count += 1
+            self.sleep(schedule.next_delay(waiting, target - 1))
+
+    def wait_until_no_idle_jobs(self, clusters: Optional[Iterable[Tuple[str, Optional[str]]]] = None,
+                                logs: Optional[Iterable[str]] = None):
+        """
+        Wait until no job (of clusters, if given) is idle. With logs (user log files or directories)
+        the jobs' events are followed in the logs and the schedd is not queried.
+        """
         active_clusters = list(clusters) if clusters is not None else None
-    
+        if logs is not None:
+            return self._wait_on_logs(logs, active_clusters, ("idle",), 1, "idle")
+
+        check_count = 0
+        schedule = self._schedule()
         while True:
+            idle_jobs = None
             try:
+                histograms = self.status_histograms(active_clusters)
+                self._record(histograms, complete=active_clusters is None)
+                self._handle_held_in(histograms, global_query=active_clusters is None)
+                idle_jobs = sum(hist.get("idle", 0) for hist in histograms.values() if hist)
                 if active_clusters is None:
-                    output = subprocess.check_output(self._condor_q_user_cmd(total=False), shell=True, text=True)
-                    idle_jobs = self._count_idle_jobs_from_output(output)
                     if idle_jobs == 0:
                         if self.verbose:
                             print("[CondorJobCountMonitor] All jobs have moved out of idle (global check).")
                         break
                     if check_count % 10 == 0 and self.verbose:
-                        print(f"[CondorJobCountMonitor] {idle_jobs} job(s) still idle (global). Waiting...")
+                        print(f"[CondorJobCountMonitor] {idle_jobs} job(s) still idle (global){self._progress(idle_jobs)}. Waiting...")
                 else:
-                    idle_jobs = 0
                     new_active = []
-                    for cluster_id, schedd in active_clusters:
-                        output = self._run_condor_q(cluster_id, schedd, total=False)
-                        if output is None:
+                    for (cluster_id, schedd), hist in histograms.items():
+                        if hist is None:
                             if self.verbose:
                                 print(f"[CondorJobCountMonitor] condor_q failed for {cluster_id} on {schedd}; assuming finished.")
                             continue
-                    
-                        total_jobs_cluster = self._count_jobs_from_output(output)
-                        cluster_idle = self._count_idle_jobs_from_output(output)
-                    
-                        if total_jobs_cluster == 0:
+                        if not hist:
                             if self.verbose:
                                 print(f"[CondorJobCountMonitor] cluster {cluster_id} on {schedd} has no jobs; assuming finished.")
                             continue
-                    
-                        idle_jobs += cluster_idle
-                        if cluster_idle > 0:
+                        if hist.get("idle", 0) > 0:
                             new_active.append((cluster_id, schedd))
     
                     active_clusters = new_active
@@ -263,35 +874,52 @@ class CondorJobCountMonitor:
                             print("[CondorJobCountMonitor] No active clusters remaining; exiting idle wait.")
                         break
                     if check_count % 10 == 0 and self.verbose:
-                        print(f"[CondorJobCountMonitor] {idle_jobs} idle job(s) remaining across {len(active_clusters)} cluster(s). Waiting...")
+                        print(f"[CondorJobCountMonitor] {idle_jobs} idle job(s) remaining across {len(active_clusters)} cluster(s){self._progress(idle_jobs)}. Waiting...")
     
             except Exception as e:
                 print(f"[CondorJobCountMonitor] Error retrieving job statuses: {e}", flush=True)
             check_count += 1
-            time.sleep(5)
+            self.sleep(schedule.next_delay(idle_jobs, 0))
     
     
-    def wait_until_jobs_below(self, clusters: Optional[Iterable[Tuple[str, Optional[str]]]] = None):
-        check_count = 0
+    def wait_until_jobs_below(self, clusters: Optional[Iterable[Tuple[str, Optional[str]]]] = None,
+                              logs: Optional[Iterable[str]] = None, threshold: Optional[int] = None) -> Optional[int]:
+        """
+        Wait until fewer than threshold (default: self.threshold) jobs (of clusters, if given) are in
+        the queue and return the job count last seen (None when following logs). With logs (user log
+        files or directories) jobs are counted until their terminate/abort event shows up in the
+        logs, as condor_wait does, and the schedd is not queried.
+        """
+        threshold = self.threshold if threshold is None else max(1, int(threshold))
         active_clusters = list(clusters) if clusters is not None else None
-    
+        if logs is not None:
+            return self._wait_on_logs(logs, active_clusters, CondorLogParser.IN_FLIGHT, threshold, "unfinished")
+
+        check_count = 0
+        schedule = self._schedule()
         while True:
+            total_jobs = None
             try:
-                if active_clusters is None:
+                if active_clusters is None and self.telemetry is None and self.hold_policy is None:
                     total_jobs = self.get_total_jobs(clusters=None)
+                elif active_clusters is None:
+                    # Per-cluster counts are needed for the telemetry and the hold policy, -total is not enough
+                    histograms = self.status_histograms(None)
+                    self._record(histograms, complete=True)
+                    self._handle_held_in(histograms, global_query=True)
+                    total_jobs = sum(sum(hist.values()) for hist in histograms.values())
                 else:
                     total_jobs = 0
                     new_active = []
-                    for cluster_id, schedd in active_clusters:
-                        cmd = self._condor_q_cmd(cluster_id, schedd, total=False)
-                        try:
-                            output = subprocess.check_output(cmd, shell=True, text=True)
-                        except subprocess.CalledProcessError:
+                    histograms = self.status_histograms(active_clusters)
+                    self._record(histograms)
+                    self._handle_held_in(histograms, global_query=False)
+                    for (cluster_id, schedd), hist in histograms.items():
+                        if hist is None:
                             if self.verbose:
                                 print(f"[CondorJobCountMonitor] condor_q failed for {cluster_id} on {schedd}; assuming finished.")
                             continue
-    
-                        job_count = self._count_jobs_from_output(output)
+                        job_count = sum(hist.values())
                         if job_count == 0:
                             if self.verbose:
                                 print(f"[CondorJobCountMonitor] cluster {cluster_id} on {schedd} has no jobs; assuming finished.")
@@ -304,24 +932,127 @@ class CondorJobCountMonitor:
                     if not active_clusters:
                         if self.verbose:
                             print("[CondorJobCountMonitor] No active clusters remaining; exiting job count wait.")
-                        break
+                        return 0
     
                 if total_jobs == -1:
                     print("[CondorJobCountMonitor] Error retrieving job count, retrying...", flush=True)
-                elif total_jobs < self.threshold:
+                    total_jobs = None
+                elif total_jobs < threshold:
                     if self.verbose:
-                        print(f"[CondorJobCountMonitor] Job count ({total_jobs}) is below threshold ({self.threshold}). Proceeding...")
-                    break
+                        print(f"[CondorJobCountMonitor] Job count ({total_jobs}) is below threshold ({threshold}). Proceeding...")
+                    return total_jobs
                 else:
                     if check_count % 10 == 0 and self.verbose:
-                        print(f"[CondorJobCountMonitor] Current jobs: {total_jobs}. Waiting for jobs to drop below {self.threshold}...")
+                        print(f"[CondorJobCountMonitor] Current jobs: {total_jobs}{self._progress(total_jobs - threshold + 1)}. Waiting for jobs to drop below {threshold}...")
     
             except Exception as e:
                 print(f"[CondorJobCountMonitor] Error while waiting for jobs: {e}", flush=True)
             check_count += 1
-            time.sleep(5)
+            self.sleep(schedule.next_delay(total_jobs, threshold - 1))
+
+def print_status(monitor: CondorJobCountMonitor, clusters: List[Tuple[str, Optional[str]]],
+                 telemetry: Optional[JobTelemetry] = None, stall_minutes: float = 60.0):
+    """One line per cluster, totals with throughput/ETA, and schedds whose counts stopped moving."""
+    histograms = monitor.status_histograms(clusters)
+    telemetry = telemetry or JobTelemetry()
+    telemetry.record(histograms)
+    now = telemetry.clock()
+
+    header = f"{'cluster':<12} {'schedd':<28} " + " ".join(f"{state:>9}" for state in TELEMETRY_STATES) + f" {'changed':>9}"
+    print(header)
+    print("-" * len(header))
+    unreachable = set()
+    for (cluster_id, schedd), hist in sorted(histograms.items(), key=lambda kv: (kv[0][1] or "", int(kv[0][0]))):
+        if hist is None:
+            unreachable.add(schedd or "local schedd")
+            print(f"{cluster_id:<12} {schedd or '-':<28} {'schedd not reachable':>49}")
+            continue
+        counts = JobTelemetry.fold(hist)
+        changed = telemetry.last_change.get((cluster_id, schedd))
+        age = format_duration(now - changed) + " ago" if changed is not None and now > changed else "now"
+        print(f"{cluster_id:<12} {schedd or '-':<28} " + " ".join(f"{counts[state]:>9}" for state in TELEMETRY_STATES) + f" {age:>9}")
+
+    queued = telemetry.queued()
+    print("-" * len(header))
+    print(f"{len(histograms)} cluster(s), {queued} job(s) in the queue" + telemetry.progress(queued))
+
+    # A schedd is suspicious when it still holds idle/running jobs but none of its clusters moved lately
+    last_by_schedd: Dict[Optional[str], float] = {}
+    active_by_schedd: Dict[Optional[str], int] = {}
+    for (cluster_id, schedd), counts in telemetry.counts.items():
+        if (cluster_id, schedd) not in histograms:
+            continue
+        active_by_schedd[schedd] = active_by_schedd.get(schedd, 0) + counts["idle"] + counts["running"]
+        last_by_schedd[schedd] = max(last_by_schedd.get(schedd, 0.0), telemetry.last_change[(cluster_id, schedd)])
+    for schedd, active in sorted(active_by_schedd.items(), key=lambda kv: kv[0] or ""):
+        if active and now - last_by_schedd[schedd] >= stall_minutes * 60:
+            print(f"[CondorJobCountMonitor] {schedd or 'local schedd'}: {active} idle/running job(s) but no change for "
+                  f"{format_duration(now - last_by_schedd[schedd])}, possibly stalled")
+    for schedd in sorted(unreachable):
+        print(f"[CondorJobCountMonitor] {schedd}: query failed")
+    # Hold reasons of the held jobs (and the hold policy, if the monitor has one)
+    monitor._handle_held_in(histograms, global_query=False)
+
+def parse_args(argv: List[str]):
+    ap = argparse.ArgumentParser(
+        description="Wait for HTCondor jobs (default command) or summarise the submitted clusters.",
+        epilog=(
+        "Example usage:\n"
+        "python3 CondorJobCountMonitor.py wait --condor-dir condor_Summer23_130X_SMS --telemetry condor_Summer23_130X_SMS/telemetry.csv -v\n"
+        "python3 CondorJobCountMonitor.py status --condor-dir condor_Summer23_130X_SMS\n"
+        ),
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    sub = ap.add_subparsers(dest="command")
+
+    wait = sub.add_parser("wait", help="Wait until the number of jobs drops below a threshold.")
+    wait.add_argument("--threshold", type=int, default=1, help="Proceed once fewer jobs than this are left (default: 1, i.e. all finished).")
+    wait.add_argument("--condor-dir", default=None, help="Only wait on the clusters recorded in <dir>/submitted_clusters.txt.")
+    wait.add_argument("--logs", nargs="+", default=None, help="Follow these user logs (files or directories) instead of querying the schedd.")
+    wait.add_argument("--max-interval", type=float, default=300.0, help="Longest pause between two queries, in seconds.")
+    wait.add_argument("--telemetry", default=None, help="Append per-cluster counts to this .csv/.jsonl file while waiting.")
+    wait.add_argument("--release-holds", type=int, default=None, metavar="N",
+                      help="Release jobs held for transient reasons (file transfer, ...) up to N times each and remove the other held jobs.")
+    wait.add_argument("--keep-held", action="store_true", help="With --release-holds: keep permanently held jobs instead of removing them.")
+    wait.add_argument("--hold-report", default=None, help="Append released/removed held jobs to this JSON-lines file.")
+
+    status = sub.add_parser("status", help="Per-cluster counts of the clusters in submitted_clusters.txt, with throughput and ETA.")
+    status.add_argument("--condor-dir", default="condor", help="Directory holding submitted_clusters.txt.")
+    status.add_argument("--telemetry", default=None, help="Telemetry file to read history from and append to (default: <condor-dir>/telemetry.csv if it exists).")
+    status.add_argument("--stall-minutes", type=float, default=60.0, help="Flag schedds whose idle/running counts did not change for this long.")
+
+    for parser in (wait, status):
+        parser.add_argument("--backend", default="auto", choices=["auto", "cli", "bindings"], help="How to query the schedd.")
+        parser.add_argument("-v", "--verbose", action="store_true")
+
+    # Without a command the script waits, as it always did
+    if not argv or argv[0] not in ("wait", "status", "-h", "--help"):
+        argv = ["wait"] + argv
+    return ap.parse_args(argv)
 
 if __name__ == "__main__":
-        condor_monitor = CondorJobCountMonitor(threshold=1,verbose=False)
-        print("Waiting for jobs to finish...")
-        condor_monitor.wait_until_jobs_below()
+    args = parse_args(sys.argv[1:])
+
+    if args.command == "status":
+        telemetry_path = args.telemetry or os.path.join(args.condor_dir, "telemetry.csv")
+        telemetry = JobTelemetry.replay(telemetry_path) if args.telemetry or os.path.exists(telemetry_path) else None
+        condor_monitor = CondorJobCountMonitor(verbose=args.verbose, backend=args.backend)
+        clusters = CondorJobCountMonitor.load_submitted_clusters(args.condor_dir)
+        if not clusters:
+            print(f"[CondorJobCountMonitor] No clusters recorded in {os.path.join(args.condor_dir, 'submitted_clusters.txt')}")
+            sys.exit(1)
+        print_status(condor_monitor, clusters, telemetry, args.stall_minutes)
+        sys.exit(0)
+
+    hold_policy = None
+    if args.release_holds is not None:
+        hold_policy = HoldPolicy(max_releases=args.release_holds, remove_permanent=not args.keep_held, report_path=args.hold_report)
+    condor_monitor = CondorJobCountMonitor(threshold=args.threshold, verbose=args.verbose, backend=args.backend,
+                                           max_interval=args.max_interval, telemetry=args.telemetry, hold_policy=hold_policy)
+    clusters = CondorJobCountMonitor.load_submitted_clusters(args.condor_dir) if args.condor_dir else None
+    if args.condor_dir and not clusters:
+        # Waiting on no clusters would return at once, e.g. for a mistyped directory
+        print(f"[CondorJobCountMonitor] No clusters recorded in {os.path.join(args.condor_dir, 'submitted_clusters.txt')}")
+        sys.exit(1)
+    print("Waiting for jobs to finish...")
+    condor_monitor.wait_until_jobs_below(clusters=clusters, logs=args.logs)
@@ -0,0 +1,251 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Example usage snippets:
+# 1) State of the job that last used a user log:
+# parser = CondorLogParser("condor_Summer23_130X_SMS/state/logs.json")
+# job = parser.latest_job("condor_Summer23_130X_SMS/log/SMS-T1tttt/SMS-T1tttt_0.log")
+# if job and job["state"] in CondorLogParser.IN_FLIGHT: ...
+# parser.save()
+
+EVENT_RE = re.compile(r'^(\d{3}) \((\d+)\.(\d+)\.\d+\) (\S+ \S+) (.*)$')
+RETURN_RE = re.compile(r'\(return value (-?\d+)\)')
+SIGNAL_RE = re.compile(r'\(signal (\d+)\)')
+CODE_RE = re.compile(r'Code (\d+) Subcode (-?\d+)')
+USAGE_RE = re.compile(r'Usr (\d+) (\d+):(\d+):(\d+), Sys (\d+) (\d+):(\d+):(\d+)\s+-\s+Run Remote Usage')
+MEMORY_USAGE_RE = re.compile(r'^\s*(\d+)\s+-\s+MemoryUsage of job \(MB\)')
+MEMORY_RESOURCE_RE = re.compile(r'^\s*Memory \(MB\)\s*:\s*(\d+)\s+(\d+)')
+HOST_RE = re.compile(r'host:\s*(\S+)')
+MEMORY_LIMIT_RE = re.compile(r'memory limit of (\d+) megabytes', re.I)
+
+class CondorLogParser:
+    """
+    Incremental parser for HTCondor user logs (the log = ... files written by make_filter_file.py).
+
+    Each log is read from the byte offset where the previous call stopped, up to the last complete
+    event ("..." terminator), and folded into one record per job (cluster.proc):
+        state           idle, running, held, completed, failed, removed
+        return_value    exit code of a normal termination, signal for an abnormal one
+        memory_mb       peak memory seen (image size updates and the termination resource table)
+        request_memory_mb, runtime_s (wall time of the last execution), cpu_s
+        hold_reason, hold_code, hold_subcode, evictions, host
+    Offsets and job records are kept in a JSON state file so later runs only read new events.
+
+    Usage:
+        parser = CondorLogParser("state/logs.json")
+        jobs = parser.parse_file("log/DATASET/DATASET_0.log")   # {"1234.0": {...}, ...}
+        job = parser.latest_job("log/DATASET/DATASET_0.log")    # record of the newest cluster
+        parser.save()
+    """
+    IN_FLIGHT = ("idle", "running", "held")
+
+    def __init__(self, state_file: Optional[str] = None):
+        self.state_file = state_file
+        self.files: Dict[str, dict] = {}  # path -> {"offset", "inode", "jobs"}
+        if state_file and os.path.exists(state_file):
+            try:
+                with open(state_file, "r") as f:
+                    self.files = json.load(f)
+            except (OSError, ValueError):
+                self.files = {}
+
+    def save(self, state_file: Optional[str] = None):
+        path = state_file or self.state_file
+        if not path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(json.dumps(self.files, separators=(",", ":")))
+        os.replace(tmp_path, path)
+
+    # ---------------------------
+    # Event stream
+    # ---------------------------
+    @staticmethod
+    def _timestamp(stamp: str) -> Optional[float]:
+        # Newer condor writes "2024-05-01 12:00:00", older "05/01 12:00:00" (no year)
+        for fmt in ("%Y-%m-%d %H:%M:%S", "%m/%d %H:%M:%S"):
+            try:
+                dt = datetime.strptime(stamp, fmt)
+            except ValueError:
+                continue
+            if fmt.startswith("%m"):
+                dt = dt.replace(year=datetime.now().year)
+            return dt.timestamp()
+        return None
+
+    @staticmethod
+    def iter_events(text: str) -> Iterator[Tuple[str, str, float, str, List[str]]]:
+        """Yield (code, "cluster.proc", timestamp, header text, body lines) for each event in text."""
+        event = None
+        for line in text.splitlines():
+            if event is None:
+                m = EVENT_RE.match(line)
+                if m:
+                    event = (m.group(1), f"{int(m.group(2))}.{int(m.group(3))}",
+                             CondorLogParser._timestamp(m.group(4)), m.group(5), [])
+                continue
+            if line.startswith("..."):
+                yield event
+                event = None
+            else:
+                event[4].append(line)
+
+    @staticmethod
+    def _new_job() -> dict:
+        return {
+            "state": "idle", "return_value": None, "signal": None,
+            "memory_mb": None, "request_memory_mb": None, "runtime_s": None, "cpu_s": None,
+            "hold_reason": None, "hold_code": None, "hold_subcode": None,
+            "evictions": 0, "host": None,
+            "submit_time": None, "start_time": None, "end_time": None,
+        }
+
+    @staticmethod
+    def _update_memory(job: dict, memory_mb: int):
+        job["memory_mb"] = max(job["memory_mb"] or 0, memory_mb)
+
+    @classmethod
+    def apply_event(cls, jobs: Dict[str, dict], code: str, job_id: str, stamp: Optional[float], header: str, body: List[str]):
+        """Fold one event into the job records."""
+        job = jobs.get(job_id)
+        if job is None:
+            job = jobs[job_id] = cls._new_job()
+
+        if code == "000":  # submit
+            job["state"] = "idle"
+            job["submit_time"] = stamp
+        elif code == "001":  # execute
+            job["state"] = "running"
+            job["start_time"] = stamp
+            m = HOST_RE.search(header)
+            if m:
+                job["host"] = m.group(1)
+        elif code in ("004", "007"):  # evicted, shadow exception: back to idle
+            job["state"] = "idle"
+            job["evictions"] += 1
+        elif code == "005":  # terminated
+            job["end_time"] = stamp
+            if stamp is not None and job["start_time"] is not None:
+                job["runtime_s"] = stamp - job["start_time"]
+            for line in body:
+                m = RETURN_RE.search(line)
+                if m:
+                    job["return_value"] = int(m.group(1))
+                m = SIGNAL_RE.search(line)
+                if m:
+                    job["signal"] = int(m.group(1))
+                m = USAGE_RE.search(line)
+                if m:
+                    v = [int(x) for x in m.groups()]
+                    job["cpu_s"] = v[0] * 86400 + v[1] * 3600 + v[2] * 60 + v[3] + v[4] * 86400 + v[5] * 3600 + v[6] * 60 + v[7]
+                m = MEMORY_RESOURCE_RE.match(line)
+                if m:
+                    cls._update_memory(job, int(m.group(1)))
+                    job["request_memory_mb"] = int(m.group(2))
+            job["state"] = "completed" if job["return_value"] == 0 and job["signal"] is None else "failed"
+        elif code == "006":  # image size update
+            for line in body:
+                m = MEMORY_USAGE_RE.match(line)
+                if m:
+                    cls._update_memory(job, int(m.group(1)))
+        elif code == "009":  # aborted (condor_rm)
+            job["state"] = "removed"
+            job["end_time"] = stamp
+        elif code == "012":  # held
+            job["state"] = "held"
+            reason = [line.strip() for line in body if line.strip()]
+            job["hold_reason"] = None
+            for line in reason:
+                m = CODE_RE.search(line)
+                if m:
+                    job["hold_code"], job["hold_subcode"] = int(m.group(1)), int(m.group(2))
+                elif job["hold_reason"] is None:
+                    job["hold_reason"] = line
+            m = MEMORY_LIMIT_RE.search(job["hold_reason"] or "")
+            if m:
+                job["request_memory_mb"] = int(m.group(1))
+        elif code == "013":  # released
+            job["state"] = "idle"
+
+    # ---------------------------
+    # Public API
+    # ---------------------------
+    def parse_file(self, path: str) -> Dict[str, dict]:
+        """Read the events appended to path since the last call. Returns {"cluster.proc": record}."""
+        entry = self.files.get(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return entry["jobs"] if entry else {}
+        # New file, or rewritten/truncated since last time: start over
+        if entry is None or entry.get("inode") != st.st_ino or st.st_size < entry["offset"]:
+            entry = {"offset": 0, "inode": st.st_ino, "jobs": {}}
+            self.files[path] = entry
+        if st.st_size == entry["offset"]:
+            return entry["jobs"]
+
+        with open(path, "rb") as f:
+            f.seek(entry["offset"])
+            data = f.read()
+        # Only consume complete events; a partially written one is read again next time
+        end = data.rfind(b"\n...\n")
+        if end == -1:
+            if not data.startswith(b"...\n"):
+                return entry["jobs"]
+            end = 0
+        else:
+            end += 1
+        end += len(b"...\n")
+        for event in self.iter_events(data[:end].decode("utf-8", errors="replace")):
+            self.apply_event(entry["jobs"], *event)
+        entry["offset"] += end
+        return entry["jobs"]
+
+    def latest_job(self, path: str) -> Optional[dict]:
+        """Record of the most recently submitted job (highest cluster) in path, None if none."""
+        jobs = self.parse_file(path)
+        if not jobs:
+            return None
+        job_id = max(jobs, key=lambda j: tuple(int(x) for x in j.split(".")))
+        return dict(jobs[job_id], job_id=job_id)
+
+def _iter_logs(paths: List[str]) -> Iterator[str]:
+    for p in paths:
+        if os.path.isdir(p):
+            for root, _, files in os.walk(p):
+                for fn in sorted(files):
+                    if fn.endswith(".log"):
+                        yield os.path.join(root, fn)
+        else:
+            yield p
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Summarise HTCondor user logs (job states, exit codes, memory, runtime).")
+    ap.add_argument("paths", nargs="+", help="Log files or directories (e.g. condor_<year>/log/).")
+    ap.add_argument("--state", default=None, help="JSON file with saved offsets; only new events are read when given.")
+    ap.add_argument("-v", "--verbose", action="store_true", help="Print one line per job.")
+    args = ap.parse_args()
+
+    start = time.time()
+    parser = CondorLogParser(args.state)
+    counts: Dict[str, int] = {}
+    for log_path in _iter_logs(args.paths):
+        job = parser.latest_job(log_path)
+        if job is None:
+            continue
+        counts[job["state"]] = counts.get(job["state"], 0) + 1
+        if args.verbose:
+            print(f"{log_path}: {job['job_id']} {job['state']} rv={job['return_value']} "
+                  f"mem={job['memory_mb']}MB runtime={job['runtime_s']}s"
+                  + (f" hold='{job['hold_reason']}'" if job["state"] == "held" else ""))
+    parser.save()
+    summary = ", ".join(f"{k}={v}" for k, v in sorted(counts.items()))
+    print(f"[CondorLogParser] {summary or 'no jobs'} ({time.time() - start:.1f}s)", file=sys.stderr)
@@ -0,0 +1,195 @@
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+import concurrent.futures
+from typing import Dict, List, Optional, Tuple
+
+# Example usage snippets:
+# 1) Pack the files of a dataset into jobs of about 200k events each (sizes/event counts from DAS):
+# meta = FileMetadata("condor_Summer23_130X_SMS/state/file_metadata.json", source="das")
+# jobs = pack_files(files, meta.lookup(files), budget=200000, key="events")   # [[file, ...], ...]
+# 2) Which input files went into which job (written by make_filter_file.py --pack-events/--pack-bytes):
+# job_files = load_job_files("condor_Summer23_130X_SMS")   # {(dataset, index): [file, ...]}
+
+JOB_FILES_NAME = "job_files.tsv"
+
+def parse_bytes(value: str) -> Optional[int]:
+    """Byte budget ("5 GB", "500MB", "1073741824") in bytes."""
+    m = re.match(r'^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)B?\s*$', value or "", flags=re.I)
+    if not m:
+        return None
+    return int(float(m.group(1)) * 1024 ** " KMGT".index(m.group(2).upper() or " "))
+
+def lfn_of(url: str) -> str:
+    """/store/... part of an xrootd URL (the LFN DAS knows the file by)."""
+    return "/store" + url.split("/store", 1)[1] if "/store" in url else url
+
+def _run(cmd: List[str], timeout: int = 120) -> Optional[str]:
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"[JobPlanner] {cmd[0]} failed: {e}", flush=True)
+        return None
+    if proc.returncode != 0:
+        print(f"[JobPlanner] {' '.join(cmd)} failed ({proc.returncode}): {proc.stderr.strip()}", flush=True)
+        return None
+    return proc.stdout
+
+class FileMetadata:
+    """
+    Size (bytes) and event count of input files, cached in a JSON file since neither changes.
+
+    source="das": one dasgoclient query finds the dataset of the first uncached file, a second
+    one returns name, size and nevents of every file of that dataset.
+    source="xrdfs": "xrdfs <redirector> stat" per file, in parallel; sizes only.
+    """
+    def __init__(self, cache_path: Optional[str] = None, source: str = "das", workers: int = 16):
+        if source not in ("das", "xrdfs"):
+            raise ValueError(f"Unknown metadata source {source}, choose from das, xrdfs")
+        self.cache_path = cache_path
+        self.source = source
+        self.workers = workers
+        self.files: Dict[str, dict] = {}  # lfn -> {"size", "events"}
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, "r") as f:
+                    self.files = json.load(f)
+            except (OSError, ValueError):
+                self.files = {}
+
+    def save(self):
+        if not self.cache_path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(json.dumps(self.files, separators=(",", ":")))
+        os.replace(tmp_path, self.cache_path)
+
+    def _das_fill(self, missing: List[str]):
+        todo = set(missing)
+        while todo:
+            lfn = sorted(todo)[0]
+            out = _run(["dasgoclient", f"-query=dataset file={lfn}"]) or ""
+            datasets = [line.strip() for line in out.splitlines() if line.strip()]
+            todo.discard(lfn)
+            if not datasets:
+                continue
+            out = _run(["dasgoclient", f"-query=file dataset={datasets[0]} | grep file.name, file.size, file.nevents"]) or ""
+            for line in out.splitlines():
+                fields = line.split()
+                if len(fields) == 3 and fields[1].isdigit():
+                    self.files[fields[0]] = {"size": int(fields[1]), "events": int(fields[2]) if fields[2].isdigit() else None}
+                    todo.discard(fields[0])
+
+    def _xrdfs_stat(self, url: str) -> Tuple[str, Optional[int]]:
+        m = re.match(r'^root://([^/]+)/+(/.*)$', url)
+        if not m:
+            return lfn_of(url), None
+        out = _run(["xrdfs", m.group(1), "stat", m.group(2)], timeout=60) or ""
+        size = re.search(r'^\s*Size:\s*(\d+)', out, flags=re.M)
+        return lfn_of(url), int(size.group(1)) if size else None
+
+    def lookup(self, urls: List[str]) -> Dict[str, dict]:
+        """{url: {"size": bytes or None, "events": count or None}}; only uncached files are looked up."""
+        missing = sorted({lfn_of(u) for u in urls} - set(self.files))
+        if missing and self.source == "das":
+            self._das_fill(missing)
+        elif missing:
+            todo = [u for u in urls if lfn_of(u) in set(missing)]
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for lfn, size in executor.map(self._xrdfs_stat, todo):
+                    if size is not None:
+                        self.files[lfn] = {"size": size, "events": None}
+        if missing:
+            self.save()
+        return {u: self.files.get(lfn_of(u), {"size": None, "events": None}) for u in urls}
+
+def pack_files(files: List[str], meta: Dict[str, dict], budget: float, key: str = "events",
+               max_files: int = 0) -> List[List[str]]:
+    """
+    Split files (kept in order) into consecutive jobs of about budget events ("events") or bytes
+    ("size"): as many jobs as the total needs, each cut where its weight comes closest to an equal
+    share of what is left, so there is no small straggler at the end. A file larger than the budget
+    is a job of its own. Files without metadata weigh the median of the others; without any
+    metadata every file is its own job. max_files > 0 caps the files per job.
+    """
+    if not files:
+        return []
+    known = sorted(meta[f][key] for f in files if meta.get(f, {}).get(key))
+    if not known or budget <= 0:
+        return [[f] for f in files]
+    fallback = known[len(known) // 2]
+    weights = [meta.get(f, {}).get(key) or fallback for f in files]
+
+    jobs: List[List[str]] = []
+    current: List[str] = []
+    weight = 0.0
+    remaining = float(sum(weights))
+    share = 0.0
+    for f, w in zip(files, weights):
+        # Close the job when adding f overshoots its share by more than stopping short of it
+        if current and (weight + w - share > share - weight or (max_files and len(current) >= max_files)):
+            jobs.append(current)
+            current, weight = [], 0.0
+        if not current:
+            share = remaining / max(1, -(-remaining // budget))
+        current.append(f)
+        weight += w
+        remaining -= w
+    if current:
+        jobs.append(current)
+    return jobs
+
+def write_job_files(condor_dir: str, dataset_jobs: Dict[str, List[List[str]]], meta: Dict[str, dict]):
+    """<condor_dir>/job_files.tsv: one "dataset index file events bytes" line per input file."""
+    path = os.path.join(condor_dir, JOB_FILES_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write("# dataset\tindex\tfile\tevents\tbytes\n")
+        for dataset in sorted(dataset_jobs):
+            for index, files in enumerate(dataset_jobs[dataset]):
+                for url in files:
+                    m = meta.get(url, {})
+                    f.write(f"{dataset}\t{index}\t{url}\t{m.get('events') or ''}\t{m.get('size') or ''}\n")
+    os.replace(tmp_path, path)
+
+def load_job_files(condor_dir: str) -> Dict[Tuple[str, int], List[str]]:
+    """{(dataset, index): [input file, ...]} from <condor_dir>/job_files.tsv, {} if the jobs were not packed."""
+    job_files: Dict[Tuple[str, int], List[str]] = {}
+    try:
+        with open(os.path.join(condor_dir, JOB_FILES_NAME), "r") as f:
+            for line in f:
+                if line.startswith("#") or not line.strip():
+                    continue
+                dataset, index, url = line.rstrip("\n").split("\t")[:3]
+                job_files.setdefault((dataset, int(index)), []).append(url)
+    except OSError:
+        pass
+    return job_files
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Show how the files of MINIAOD file lists would be packed into jobs.")
+    ap.add_argument("lists", nargs="+", help="File lists (one xrootd URL per line), e.g. samples/MINI/Summer23_130X_SMS/*.txt")
+    group = ap.add_mutually_exclusive_group(required=True)
+    group.add_argument("--pack-events", type=int, default=None, help="Target events per job.")
+    group.add_argument("--pack-bytes", default=None, help="Target input size per job, e.g. '10 GB'.")
+    ap.add_argument("--metadata", default="das", choices=["das", "xrdfs"], help="Where file sizes/event counts come from (xrdfs: sizes only).")
+    ap.add_argument("--cache", default="file_metadata.json", help="JSON cache of file metadata.")
+    args = ap.parse_args()
+
+    key, budget = ("events", args.pack_events) if args.pack_events else ("size", parse_bytes(args.pack_bytes))
+    if not budget:
+        ap.error(f"could not parse --pack-bytes {args.pack_bytes}")
+    metadata = FileMetadata(args.cache, source=args.metadata)
+    for list_path in args.lists:
+        with open(list_path) as f:
+            files = [ln.strip() for ln in f if ln.strip() and not ln.strip().startswith("#")]
+        meta = metadata.lookup(files)
+        jobs = pack_files(files, meta, budget, key)
+        loads = [sum(meta[u][key] or 0 for u in job) for job in jobs]
+        print(f"{os.path.basename(list_path)}: {len(files)} files -> {len(jobs)} jobs, "
+              f"{key} per job min/max {min(loads) if loads else 0}/{max(loads) if loads else 0}", file=sys.stderr)
@@ -0,0 +1,178 @@
+import os
+import re
+import json
+import time
+import subprocess
+from typing import Callable, Dict, List, Optional, Tuple
+
+from CondorJobCountMonitor import CondorJobCountMonitor
+from CondorLogParser import CondorLogParser
+
+# Example usage snippets:
+# 1) Submit a campaign in chunks that fit under 90000 queued jobs, resuming after an interruption:
+# monitor = CondorJobCountMonitor(threshold=90000)
+# scheduler = SubmissionScheduler("condor_Summer23_130X_SMS/", "Summer23_130X_SMS", monitor, write_submit)
+# scheduler.prepare({"SMS-T1tttt": ["/store/...root", ...], ...})
+# scheduler.run()
+
+class SubmissionScheduler:
+    """
+    Capacity-aware, resumable submission of one campaign in chunks.
+
+    The jobs of all datasets form one queue (smallest datasets first, so complete datasets become
+    available early), saved once as <condor_dir>/state/<campaign>.jobs ("Dataset Index Item" rows).
+    Each chunk is a contiguous range of rows written to src/<campaign>_<k>.jobs with its own submit
+    file (write_submit(srcfile, tablefile)) and submitted as one cluster, sized to the free room
+    under the monitor's threshold (at least min_chunk jobs, at most max_chunk).
+
+    Progress is kept in <condor_dir>/state/submission.json. A chunk is recorded as "intent" before
+    condor_submit runs and as "submitted" with its cluster afterwards; after an interruption an
+    intent is settled from the user log of its first job (which condor_submit writes at submit
+    time), so a chunk is never submitted twice.
+    """
+    def __init__(self, condor_dir: str, campaign: str, monitor: CondorJobCountMonitor,
+                 write_submit: Callable[[str, str], None], min_chunk: int = 500, max_chunk: int = 20000):
+        self.condor_dir = condor_dir
+        self.campaign = campaign
+        self.monitor = monitor
+        self.write_submit = write_submit
+        self.min_chunk = max(1, min_chunk)
+        self.max_chunk = max(self.min_chunk, max_chunk)
+        self.state_path = os.path.join(condor_dir, "state", "submission.json")
+        self.table_path = os.path.join(condor_dir, "state", campaign + ".jobs")
+        self.state = self._load()
+
+    # ---------------------------
+    # Persistent state
+    # ---------------------------
+    def _load(self) -> Optional[dict]:
+        try:
+            with open(self.state_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(json.dumps(self.state, indent=1))
+        os.replace(tmp_path, self.state_path)
+
+    @staticmethod
+    def order_rows(dataset_items: Dict[str, List[str]]) -> List[Tuple[str, int, str]]:
+        """(Dataset, Index, Item) rows, datasets with fewer jobs first."""
+        rows = []
+        for dataset in sorted(dataset_items, key=lambda d: (len(dataset_items[d]), d)):
+            rows.extend((dataset, index, item) for index, item in enumerate(dataset_items[dataset]))
+        return rows
+
+    def in_progress(self) -> bool:
+        return self.state is not None and not self.finished()
+
+    def finished(self) -> bool:
+        return (self.state is not None and self.state["next_row"] >= self.state["rows"]
+                and all(chunk["status"] == "submitted" for chunk in self.state["chunks"]))
+
+    def prepare(self, dataset_items: Dict[str, List[str]]):
+        """Write the job table of a new campaign; an interrupted campaign keeps the table it started with."""
+        if self.state is not None:
+            return
+        rows = self.order_rows(dataset_items)
+        os.makedirs(os.path.dirname(self.table_path), exist_ok=True)
+        with open(self.table_path, "w") as f:
+            f.writelines(f"{dataset} {index} {item}\n" for dataset, index, item in rows)
+        self.state = {"campaign": self.campaign, "rows": len(rows), "next_row": 0, "chunks": []}
+        self._save()
+
+    def _rows(self, start: int, end: int) -> List[str]:
+        with open(self.table_path, "r") as f:
+            return [line for i, line in enumerate(f) if start <= i < end]
+
+    # ---------------------------
+    # Interrupted submissions
+    # ---------------------------
+    def _first_log(self, chunk: dict) -> Optional[str]:
+        """User log of the first job of chunk, from the log line of its submit file."""
+        try:
+            with open(chunk["submit"], "r") as f:
+                m = re.search(r'^\s*log\s*=\s*(\S+)', f.read(), flags=re.M)
+        except OSError:
+            return None
+        rows = self._rows(chunk["start"], chunk["start"] + 1)
+        if not m or not rows:
+            return None
+        dataset, index, item = rows[0].split(None, 2)
+        path = m.group(1).replace("$ENV(PWD)", os.getcwd())
+        for name, value in (("Dataset", dataset), ("Index", index), ("Item", item.strip())):
+            path = path.replace(f"$({name})", value)
+        return path
+
+    def _settle_intents(self):
+        """Decide for every chunk left as "intent" whether condor_submit got through."""
+        for chunk in self.state["chunks"]:
+            if chunk["status"] != "intent":
+                continue
+            log_path = self._first_log(chunk)
+            job = CondorLogParser().latest_job(log_path) if log_path else None
+            cluster = job["job_id"].split(".")[0] if job else None
+            if cluster and (job.get("submit_time") or 0) >= chunk["time"] - 60:
+                print(f"[SubmissionScheduler] {self.campaign}: chunk {chunk['chunk']} was submitted as cluster {cluster} before the interruption")
+                chunk.update(status="submitted", cluster=cluster)
+                self.state["next_row"] = max(self.state["next_row"], chunk["end"])
+                CondorJobCountMonitor.record_cluster(cluster, condor_dir=self.condor_dir)
+            else:
+                print(f"[SubmissionScheduler] {self.campaign}: chunk {chunk['chunk']} was not submitted, queueing its rows again")
+                chunk["status"] = "abandoned"
+        # Rows of abandoned chunks are taken up again from the first of them
+        abandoned = [c["start"] for c in self.state["chunks"] if c["status"] == "abandoned"]
+        if abandoned:
+            self.state["next_row"] = min(abandoned)
+            self.state["chunks"] = [c for c in self.state["chunks"] if c["status"] != "abandoned"]
+        self._save()
+
+    # ---------------------------
+    # Submission
+    # ---------------------------
+    def _submit_chunk(self, size: int) -> bool:
+        start = self.state["next_row"]
+        end = min(self.state["rows"], start + size)
+        k = 1 + max([c["chunk"] for c in self.state["chunks"]] or [-1])
+        srcfile = os.path.join(self.condor_dir, "src", f"{self.campaign}_{k}.submit")
+        tablefile = os.path.join(self.condor_dir, "src", f"{self.campaign}_{k}.jobs")
+        with open(tablefile, "w") as f:
+            f.writelines(self._rows(start, end))
+        self.write_submit(srcfile, tablefile)
+
+        chunk = {"chunk": k, "start": start, "end": end, "submit": srcfile, "status": "intent", "time": time.time(), "cluster": None}
+        self.state["chunks"].append(chunk)
+        self._save()
+
+        print(f"[SubmissionScheduler] {self.campaign}: submitting rows {start}-{end - 1} ({end - start} jobs) with condor_submit {srcfile}", flush=True)
+        proc = subprocess.run(["condor_submit", srcfile], capture_output=True, text=True)
+        m = re.search(r"submitted to cluster\s+(\d+)", proc.stdout or "")
+        if proc.returncode != 0 or not m:
+            print(f"[SubmissionScheduler] condor_submit failed for {srcfile}: {(proc.stdout + proc.stderr).strip()}", flush=True)
+            # Nothing was queued: the rows stay pending for the next run
+            self.state["chunks"].remove(chunk)
+            self._save()
+            return False
+        chunk.update(status="submitted", cluster=m.group(1))
+        self.state["next_row"] = end
+        self._save()
+        CondorJobCountMonitor.record_cluster(m.group(1), condor_dir=self.condor_dir)
+        return True
+
+    def run(self) -> bool:
+        """Submit the remaining rows chunk by chunk as room frees up. Returns False if a submission failed."""
+        self._settle_intents()
+        while self.state["next_row"] < self.state["rows"]:
+            remaining = self.state["rows"] - self.state["next_row"]
+            wanted = min(remaining, self.min_chunk)
+            queued = self.monitor.wait_until_jobs_below(threshold=self.monitor.threshold - wanted + 1)
+            headroom = self.monitor.threshold - (queued or 0)
+            if not self._submit_chunk(min(remaining, self.max_chunk, max(wanted, headroom))):
+                return False
+        print(f"[SubmissionScheduler] {self.campaign}: all {self.state['rows']} jobs submitted in "
+              f"{len(self.state['chunks'])} cluster(s)", flush=True)
+        return True
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Time checkJobs.py --dry-run on a generated condor tree: S submissions (make_filter_file.py
+--per-dataset layout) of J jobs each, a fraction of them failing (no txt output). To compare with
+another revision, pass its checkJobs.py and the options it understands, e.g.
+
+git show <rev>:GeneratorInterface/Core/test/checkJobs.py > /tmp/checkJobs_old.py
+python3 bench_checkJobs.py --checkjobs /tmp/checkJobs_old.py --args="--dry-run"
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def make_tree(root, n_submissions, n_jobs, failing, seed=1):
+    # Same paths make_submit_sh writes: condor_<year>/{src,out,err,log,txt}/<dataset>/<dataset>_<procid>.*
+    rng = random.Random(seed)
+    n_failed = 0
+    for s in range(n_submissions):
+        year = f"Bench{s}_130X_SMS"
+        dataset = f"SMS-Bench{s}"
+        base = os.path.join(root, "condor_" + year)
+        for sub in ("src", "out/" + dataset, "err/" + dataset, "log/" + dataset, "txt/" + dataset):
+            os.makedirs(os.path.join(base, sub), exist_ok=True)
+        listfile = os.path.join(root, "lists", year, dataset + ".txt")
+        os.makedirs(os.path.dirname(listfile), exist_ok=True)
+        with open(listfile, "w") as f:
+            f.writelines(f"root://cmsxrootd.fnal.gov//store/mc/Run3/{dataset}/MINIAODSIM/{i:06d}.root\n" for i in range(n_jobs))
+        with open(os.path.join(base, "src", dataset + ".submit"), "w") as f:
+            f.write("universe = vanilla \nexecutable = execute_script.sh \nuse_x509userproxy = true \n"
+                    f"Arguments = $(Item) {dataset}_$(ProcId).txt Run3\n"
+                    f"output = $ENV(PWD)/condor_{year}/out/{dataset}/{dataset}_$(ProcId).out \n"
+                    f"error = $ENV(PWD)/condor_{year}/err/{dataset}/{dataset}_$(ProcId).err \n"
+                    f"log = $ENV(PWD)/condor_{year}/log/{dataset}/{dataset}_$(ProcId).log \n"
+                    "request_memory = 2 GB \ntransfer_input_files = runGenFilterEfficiencyAnalyzer_cfg.py\n"
+                    "should_transfer_files = YES \nwhen_to_transfer_output = ON_EXIT \n"
+                    f"transfer_output_files = {dataset}_$(ProcId).txt \n"
+                    f'transfer_output_remaps = "{dataset}_$(ProcId).txt=$ENV(PWD)/condor_{year}/txt/{dataset}/{dataset}_$(ProcId).txt" \n'
+                    '+DesiredOS="EL9"\n'
+                    f"queue $(Item) from {listfile} \n")
+        for i in range(n_jobs):
+            stem = os.path.join(base, "{}", dataset, f"{dataset}_{i}")
+            with open(stem.format("out") + ".out", "w") as f:
+                f.write("Begin processing the 1st record\n" * 20 + f"Wrote output to: {dataset}_{i}.txt\n")
+            with open(stem.format("err") + ".err", "w") as f:
+                f.write("%MSG-w XrdAdaptor: file open\n")
+            if rng.random() < failing:
+                n_failed += 1
+                continue
+            with open(stem.format("txt") + ".txt", "w") as f:
+                f.write("Lumi section run: 1 luminosityBlock: 1\nN total = 10 N passed = 5 N failed = 5\n"
+                        "Generator filter efficiency = 0.5 +- 0.1\n")
+    return n_failed
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark checkJobs.py on a generated condor tree.")
+    ap.add_argument("--submissions", type=int, default=5, help="Submissions (condor_* directories).")
+    ap.add_argument("--jobs", type=int, default=10000, help="Jobs per submission.")
+    ap.add_argument("--failing", type=float, default=0.01, help="Fraction of jobs without txt output.")
+    ap.add_argument("--checkjobs", default=os.path.join(HERE, "checkJobs.py"), help="checkJobs.py to time (default: this one).")
+    ap.add_argument("--args", default="--dry-run --no-cache --no-logs", help="Options passed to checkJobs.py.")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        n_failed = make_tree(root, args.submissions, args.jobs, args.failing)
+        cmd = [sys.executable, os.path.abspath(args.checkjobs), "--root-dir", "."] + args.args.split()
+        start = time.perf_counter()
+        proc = subprocess.run(cmd, cwd=root, capture_output=True, text=True)
+        elapsed = time.perf_counter() - start
+        n_fail_lines = sum(1 for line in proc.stdout.splitlines() if "FAIL" in line and "proc" in line)
+        print(f"{args.submissions} x {args.jobs} jobs, {n_failed} failing: {os.path.basename(args.checkjobs)} {args.args}")
+        print(f"  {elapsed:7.2f} s, exit code {proc.returncode}, {n_fail_lines} FAIL line(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,46 @@
 #!/usr/bin/env python3
 import argparse
+import contextlib
+import io
 import os
 import re
 import subprocess
 import sys
 import glob
+import json
+import mmap
 import shlex
-from typing import List, Tuple, Optional
+import time
+import threading
+import concurrent.futures
+from typing import Dict, List, Tuple, Optional
+
+from CondorLogParser import CondorLogParser
+from CondorJobCountMonitor import CondorJobCountMonitor, HoldPolicy
 
 CMS_ENV = "/cvmfs/cms.cern.ch/cmsset_default.sh"
 MARKER_OUT = "Wrote output to:"
+# execute_script.sh prints the marker a few lines before the end of the .out file
+OUT_TAIL_BYTES = 64 * 1024
+# cmsRun exceptions end up at the end of the .err file
+ERR_TAIL_BYTES = 256 * 1024
+
+# Failure causes, each resubmitted in its own file
+CAUSE_OOM = "oom"
+CAUSE_XROOTD = "xrootd"
+CAUSE_HELD = "held"
+CAUSE_OTHER = "other"
+# OOM-specific text only: a bare "Killed" is any SIGKILL (wall time, preemption, condor_rm) and counts as other
+OOM_PATTERNS = ("bad_alloc", "Out of memory", "out of memory", "MemoryExceeded", "memory limit", "Killed process",
+                "oom-kill", "oom_kill", "OOM killer")
+# cmsRun exit codes 8020/8021/8028 (FileOpenError/FileReadError/FallbackFileOpenError) modulo 256
+XROOTD_RETURN_VALUES = (84, 85, 92)
+XROOTD_PATTERNS = ("FileOpenError", "FileReadError", "FallbackFileOpenError", "XrdCl", "[ERROR] Server responded",
+                   "Operation expired", "No servers are available", "Socket timeout")
+# checkJobs --watch gives up on a submission whose resubmission failed this many rounds in a row
+WATCH_MAX_ERROR_ROUNDS = 3
+# Cycled through for jobs failing to read their input
+XROOTD_REDIRECTORS = ("root://cmsxrootd.fnal.gov/", "root://cms-xrd-global.cern.ch/", "root://xrootd-cms.infn.it/")
 
 # -------------------- parsing helpers --------------------
 def _sanitize_token(s: str, maxlen: int = 80) -> str:
@@ -81,20 +112,48 @@ def read_file(path: str) -> Optional[str]:
     except Exception:
         return None
 
-def find_submit_file(base_dir: str, submit_name: str) -> Optional[str]:
+def _scandir_names(directory: str, suffix: str) -> List[str]:
+    try:
+        with os.scandir(directory) as it:
+            return sorted(e.path for e in it if e.name.endswith(suffix) and e.is_file())
+    except OSError:
+        return []
+
+def find_submit_files(base_dir: str, submit_name: str) -> List[str]:
+    """
+    Submit files of a submission directory: <base_dir>/<submit_name>.sub, else src/*.submit,
+    else *.submit one directory level down. Uses os.scandir only, never a recursive walk.
+    """
     p1 = os.path.join(base_dir, f"{submit_name}.sub")
     if os.path.isfile(p1):
-        return p1
-    srcdir = os.path.join(base_dir, "src")
-    if os.path.isdir(srcdir):
-        for fn in os.listdir(srcdir):
-            if fn.endswith(".submit"):
-                return os.path.join(srcdir, fn)
-    for root, _, files in os.walk(base_dir):
-        for fn in files:
-            if fn.endswith(".submit"):
-                return os.path.join(root, fn)
-    return None
+        return [p1]
+    found = _scandir_names(os.path.join(base_dir, "src"), ".submit")
+    if found:
+        return found
+    try:
+        with os.scandir(base_dir) as it:
+            subdirs = sorted(e.path for e in it if e.is_dir())
+    except OSError:
+        return []
+    for d in subdirs:
+        found.extend(_scandir_names(d, ".submit"))
+    return found
+
+def find_submit_file(base_dir: str, submit_name: str) -> Optional[str]:
+    found = find_submit_files(base_dir, submit_name)
+    return found[0] if found else None
+
+def inventory_condor_tree(root_dir: str) -> List[str]:
+    """All condor_*/src/*.submit under root_dir, listed with one os.scandir per directory."""
+    submit_paths = []
+    try:
+        with os.scandir(root_dir) as it:
+            base_dirs = sorted(e.path for e in it if e.name.startswith("condor_") and e.is_dir())
+    except OSError:
+        return []
+    for base_dir in base_dirs:
+        submit_paths.extend(_scandir_names(os.path.join(base_dir, "src"), ".submit"))
+    return submit_paths
 
 def extract_line_value(content: str, key: str) -> Optional[str]:
     pattern = re.compile(r'^\s*' + re.escape(key) + r'\s*=\s*(.+)$', flags=re.M)
@@ -136,14 +195,39 @@ def extract_queue_from_path(content: str) -> Optional[str]:
     toks = last.split()
     return toks[-1]
 
+def extract_queue_vars(content: str) -> List[str]:
+    """
+    Variables of the last "queue <vars> from" statement: ["Item"] for "queue $(Item) from list.txt",
+    ["Dataset", "Index", "Item"] for the campaign submits of make_filter_file.py.
+    """
+    matches = re.findall(r'^\s*queue\b(.*?)\bfrom\b', content, flags=re.M | re.I)
+    if not matches:
+        return ["Item"]
+    names = []
+    for tok in re.split(r'[\s,]+', matches[-1].strip()):
+        tok = tok.strip()
+        if tok.startswith("$(") and tok.endswith(")"):
+            tok = tok[2:-1]
+        if tok and not tok.isdigit():
+            names.append(tok)
+    return names or ["Item"]
+
+def split_queue_row(line: str, queue_vars: List[str]) -> Dict[str, str]:
+    """One row of a queue table: fields split on commas/whitespace, the last variable takes the rest of the line (as condor does)."""
+    fields = re.split(r'\s*,\s*|\s+', line.strip(), maxsplit=len(queue_vars) - 1)
+    return {name: (fields[i] if i < len(fields) else "") for i, name in enumerate(queue_vars)}
+
 # -------------------- template expansion --------------------
-def expand_template(s: str, item: str, procid: int, cwd_replacement: Optional[str] = None) -> str:
+def expand_template(s: str, item: str, procid: int, cwd_replacement: Optional[str] = None,
+                    variables: Optional[Dict[str, str]] = None) -> str:
     if s is None:
         return ""
     out = s
     if cwd_replacement is None:
         cwd_replacement = os.getcwd()
     out = out.replace("$ENV(PWD)", cwd_replacement)
+    for name, value in (variables or {}).items():
+        out = out.replace(f"$({name})", value)
     out = out.replace("$(Item)", item)
     out = out.replace("$(ITEM)", item)
     out = out.replace("${Item}", item)
@@ -156,28 +240,209 @@ def expand_template(s: str, item: str, procid: int, cwd_replacement: Optional[st
     return out
 
 # -------------------- checks --------------------
-def _file_nonzero(p: str) -> bool:
+class DirIndex:
+    """
+    (size, mtime_ns) of the files in each directory, listed once with os.scandir and shared
+    between threads, so checking thousands of jobs costs one listing per out/txt directory
+    instead of several stat calls per job.
+    """
+    def __init__(self):
+        self._dirs: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        self._lock = threading.Lock()
+
+    def _listing(self, directory: str) -> Dict[str, Tuple[int, int]]:
+        listing = self._dirs.get(directory)
+        if listing is not None:
+            return listing
+        listing = {}
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        if entry.is_file():
+                            st = entry.stat()
+                            listing[entry.name] = (st.st_size, st.st_mtime_ns)
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+        with self._lock:
+            return self._dirs.setdefault(directory, listing)
+
+    def stat(self, path: str) -> Optional[Tuple[int, int]]:
+        """(size, mtime_ns) of path, None if it does not exist."""
+        directory, name = os.path.split(os.path.abspath(path))
+        return self._listing(directory).get(name)
+
+    def size(self, path: str) -> Optional[int]:
+        """Size of path, None if it does not exist."""
+        st = self.stat(path)
+        return st[0] if st else None
+
+class JobStateCache:
+    """
+    Per-submission record of what checkJobs saw last time, in <base_dir>/state/<submit stem>.json:
+    procid -> status (passed, failed, pending), txt/out paths and their (size, mtime_ns), and for
+    resubmitted jobs the number of retries and the last cluster. A job that passed is not
+    re-examined while its txt and out files are unchanged. The cache is dropped when the
+    submit file changes.
+    """
+    def __init__(self, base_dir: str, submit_path: str):
+        stem = os.path.splitext(os.path.basename(submit_path))[0]
+        self.path = os.path.join(base_dir, "state", f"{stem}.json")
+        try:
+            st = os.stat(submit_path)
+            self.submit_sig = [st.st_size, st.st_mtime_ns]
+        except OSError:
+            self.submit_sig = None
+        self.jobs: Dict[str, dict] = {}
+        try:
+            with open(self.path, "r") as f:
+                saved = json.load(f)
+            if saved.get("submit") == self.submit_sig:
+                self.jobs = saved.get("jobs", {})
+        except (OSError, ValueError):
+            pass
+
+    def passed_unchanged(self, procid: int, index: DirIndex) -> bool:
+        job = self.jobs.get(str(procid))
+        if not job or job["status"] != "passed":
+            return False
+        return (index.stat(job["txt"]) == tuple(job["txt_sig"])
+                and index.stat(job["out"]) == tuple(job["out_sig"]))
+
+    def set(self, procid: int, txt_path: str, out_path: str, status: str, index: DirIndex):
+        txt_sig = index.stat(txt_path)
+        out_sig = index.stat(out_path)
+        old = self.jobs.get(str(procid), {})
+        self.jobs[str(procid)] = {
+            "status": status,
+            "txt": txt_path, "txt_sig": list(txt_sig) if txt_sig else None,
+            "out": out_path, "out_sig": list(out_sig) if out_sig else None,
+            "retries": old.get("retries", 0), "cluster": old.get("cluster"), "resubmitted_at": old.get("resubmitted_at"),
+        }
+
+    def retries(self, procid: int) -> int:
+        return self.jobs.get(str(procid), {}).get("retries", 0)
+
+    def resubmitted_clusters(self) -> List[str]:
+        """Clusters of the last resubmission of jobs that have not passed yet."""
+        return sorted({job["cluster"] for job in self.jobs.values() if job.get("cluster") and job.get("status") != "passed"})
+
+    def awaiting_resubmission(self, procid: int, log_job: Optional[dict], in_queue: Dict[str, bool]) -> bool:
+        """
+        True if the job was resubmitted and its user log has no submit event of the new cluster, but
+        that cluster is still in the queue (in_queue: cluster -> bool, unknown clusters count as queued).
+        Once the log shows the new cluster its own events decide.
+        """
+        job = self.jobs.get(str(procid), {})
+        if not job.get("cluster"):
+            return False
+        if log_job is not None and int(log_job["job_id"].split(".")[0]) >= int(job["cluster"]):
+            return False
+        return in_queue.get(job["cluster"], True)
+
+    def mark_resubmitted(self, procids: List[int], cluster: str):
+        now = time.time()
+        for procid in procids:
+            job = self.jobs.setdefault(str(procid), {"status": "failed"})
+            job["status"] = "pending"
+            job["retries"] = job.get("retries", 0) + 1
+            job["cluster"] = cluster
+            job["resubmitted_at"] = now
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(json.dumps({"submit": self.submit_sig, "jobs": self.jobs}, separators=(",", ":")))
+        os.replace(tmp_path, self.path)
+
+def _file_nonzero(p: str, index: Optional[DirIndex] = None) -> bool:
+    if index is not None:
+        return bool(index.size(p))
     try:
         return os.path.exists(p) and os.path.getsize(p) > 0
     except Exception:
         return False
 
-def out_file_ok(out_path: str) -> bool:
-    if not os.path.exists(out_path):
+def out_file_ok(out_path: str, index: Optional[DirIndex] = None) -> bool:
+    """True if the job's .out contains MARKER_OUT: read the tail first, mmap the whole file as a fallback."""
+    if not _file_nonzero(out_path, index):
         return False
+    marker = MARKER_OUT.encode()
     try:
-        subprocess.check_call(['bash', '-c', f'grep -q "{MARKER_OUT}" {out_path}'])
-        return True
-    except subprocess.CalledProcessError:
-        return False
+        with open(out_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            f.seek(max(0, size - OUT_TAIL_BYTES))
+            if marker in f.read():
+                return True
+            if size <= OUT_TAIL_BYTES:
+                return False
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return mm.find(marker) != -1
     except Exception:
         return False
 
+def read_tail(path: str, nbytes: int) -> str:
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - nbytes))
+            return f.read().decode("utf-8", errors="replace")
+    except Exception:
+        return ""
+
+def classify_failure(log_job: Optional[dict], err_path: str) -> str:
+    """Cause of a failed job from its user-log record and the end of its .err file: oom, xrootd, held or other."""
+    if log_job:
+        hold_reason = log_job["hold_reason"] or ""
+        if log_job["hold_code"] == 34 or "memory" in hold_reason.lower():
+            return CAUSE_OOM
+        if (log_job["signal"] == 9 and log_job["memory_mb"] and log_job["request_memory_mb"]
+                and log_job["memory_mb"] >= 0.95 * log_job["request_memory_mb"]):
+            return CAUSE_OOM
+    err_tail = read_tail(err_path, ERR_TAIL_BYTES)
+    if any(p in err_tail for p in OOM_PATTERNS):
+        return CAUSE_OOM
+    if any(p in err_tail for p in XROOTD_PATTERNS):
+        return CAUSE_XROOTD
+    if log_job and log_job["return_value"] in XROOTD_RETURN_VALUES:
+        return CAUSE_XROOTD
+    if log_job and log_job["hold_reason"]:
+        return CAUSE_HELD
+    return CAUSE_OTHER
+
+def parse_memory_mb(value: str) -> Optional[int]:
+    """request_memory value ("2 GB", "2048", "4096MB") in MB."""
+    m = re.match(r'^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)B?\s*$', value or "", flags=re.I)
+    if not m:
+        return None
+    factor = {"": 1, "K": 1.0 / 1024, "M": 1, "G": 1024, "T": 1024 * 1024}[m.group(2).upper()]
+    return int(float(m.group(1)) * factor)
+
+def escalate_memory(current_mb: int, peak_mb: Optional[int], factor: float, max_mb: int) -> int:
+    """New request_memory for OOM jobs: factor x the last request, at least 1.25 x the peak seen, rounded up to 512 MB."""
+    target = max(current_mb * factor, (peak_mb or 0) * 1.25)
+    target = int(-(-target // 512) * 512)
+    return max(current_mb, min(target, max_mb))
+
+def switch_redirector(args_str: str, redirectors=XROOTD_REDIRECTORS) -> str:
+    """Replace the xrootd redirector of the input file(s) in args_str with the next one in redirectors."""
+    def repl(m):
+        current = m.group(0)
+        for i, r in enumerate(redirectors):
+            if r == current:
+                return redirectors[(i + 1) % len(redirectors)]
+        return redirectors[0] if current != redirectors[0] else redirectors[1]
+    return re.sub(r'root://[^/\s]+/', repl, args_str)
+
 # -------------------- resubmit writer --------------------
-def make_resubmit_header_from_submit_content(submit_content: str, submit_name: str, forced_dataset: Optional[str] = None) -> str:
+def make_resubmit_header_from_submit_content(submit_content: str, submit_name: str, forced_dataset: Optional[str] = None,
+                                             request_memory: Optional[str] = None) -> str:
     exec_line = extract_line_value(submit_content, "executable") or "execute_script.sh"
     transfer_input = extract_line_value(submit_content, "transfer_input_files") or ""
-    req_mem = extract_line_value(submit_content, "request_memory") or "2 GB"
+    req_mem = request_memory or extract_line_value(submit_content, "request_memory") or "2 GB"
 
     # Decide proc_type and OS correctly: 130X -> Run3 -> EL9, else -> UL -> SL7
     if "130X" in submit_name:
@@ -214,11 +479,12 @@ def make_resubmit_header_from_submit_content(submit_content: str, submit_name: s
     return header
 
 def write_resubmit_file(resubmit_path: str, submit_name: str, submit_content: str,
-                        failed_entries: List[Tuple[int, str, str]], forced_dataset: Optional[str] = None) -> None:
+                        failed_entries: List[Tuple[int, str, str]], forced_dataset: Optional[str] = None,
+                        request_memory: Optional[str] = None, datasets: Optional[Dict[int, str]] = None) -> None:
     if not failed_entries:
         raise RuntimeError("No failed entries to write")
 
-    header = make_resubmit_header_from_submit_content(submit_content, submit_name, forced_dataset)
+    header = make_resubmit_header_from_submit_content(submit_content, submit_name, forced_dataset, request_memory)
 
     # determine proc_type same way as make_submit_sh: "130X" -> Run3 else UL
     proc_type_token = "Run3" if "130X" in submit_name else "UL"
@@ -227,10 +493,12 @@ def write_resubmit_file(resubmit_path: str, submit_name: str, submit_content: st
         f.write("# AUTO-GENERATED resubmit file (standalone)\n")
         f.write("# Header (derived from original submit)\n")
         f.write(header)
+        # Args goes last: condor gives the last variable the rest of the row, so the comma-joined
+        # input files of a packed job stay one field
         if forced_dataset:
-            f.write("queue LogFile, Args, TxtFile from (\n")
+            f.write("queue LogFile, TxtFile, Args from (\n")
         else:
-            f.write("queue LogFile, Dataset, Args, TxtFile from (\n")
+            f.write("queue LogFile, Dataset, TxtFile, Args from (\n")
 
         for procid, item, args_str in failed_entries:
             safe_item = _sanitize_token(item)[:80] if item else "dataset"
@@ -269,19 +537,127 @@ def write_resubmit_file(resubmit_path: str, submit_name: str, submit_content: st
 
             if forced_dataset:
                 dataset_token = forced_dataset
+            elif datasets and procid in datasets:
+                dataset_token = datasets[procid]
             else:
                 dataset_token = _derive_dataset_token(item, args_str=args_str, txt_token=txt_token)
 
-            # Quote the entire Args field as a single token so condor sees it as one field.
-            args_quoted = shlex.quote(" ".join(tokens))
-
             if forced_dataset:
-                f.write(f"{log_token} {args_quoted} {txt_token}\n")
+                f.write(f"{log_token} {txt_token} {' '.join(tokens)}\n")
             else:
-                f.write(f"{log_token} {dataset_token} {args_quoted} {txt_token}\n")
+                f.write(f"{log_token} {dataset_token} {txt_token} {' '.join(tokens)}\n")
 
         f.write(")\n")
 
+# -------------------- per-job checks --------------------
+def job_paths(procid: int, item: str, args_str: str, submit_path: str, base_dir: str,
+              transfer_remap: Optional[str], output_template: Optional[str], error_template: Optional[str],
+              cwd: str, log_template: Optional[str] = None, variables: Optional[Dict[str, str]] = None) -> Tuple[str, str, str, str]:
+    """Expected (txt, out, err, log) paths of one job; variables are its other queue columns (Dataset, Index, ...)."""
+    # Determine expected txt path (same logic as before but we won't use item as dataset token)
+    if transfer_remap:
+        txt_path = expand_template(transfer_remap, item, procid, cwd_replacement=cwd, variables=variables)
+    else:
+        m = re.search(r'([^\s"\'`]+\.txt)\b', args_str)
+        if m:
+            candidate = m.group(1)
+            if os.path.isabs(candidate):
+                txt_path = candidate
+            elif "/" in candidate or "\\" in candidate:
+                txt_path = os.path.normpath(os.path.join(os.path.dirname(submit_path), candidate))
+                if not os.path.exists(txt_path):
+                    txt_path = os.path.join(base_dir, "txt", candidate)
+            else:
+                # candidate is a bare filename like SOME_0.txt; place under base_dir/txt/<dataset_guess>/
+                dataset_guess = item.split()[0] if item and not item.startswith('root://') else ""
+                if dataset_guess:
+                    txt_path = os.path.join(base_dir, "txt", dataset_guess, candidate)
+                else:
+                    # put directly under <base_dir>/txt/<candidate>
+                    txt_path = os.path.join(base_dir, "txt", candidate)
+        else:
+            # fallback: build safe path using sanitized item
+            safe_item = _sanitize_token(item)[:80]
+            txt_path = os.path.join(base_dir, "txt", safe_item, f"{safe_item}_{procid}.txt")
+
+    # Derive log_token and dataset_token robustly & sanitized
+    log_token = _derive_log_token(args_str, item, procid)
+
+    # Use the basename of the expected txt file (if any) as the primary hint
+    txt_basename = os.path.basename(txt_path) if txt_path else ""
+    dataset_token = _derive_dataset_token(item, args_str=args_str, txt_token=txt_basename)
+
+    # out_path (prefer template)
+    if output_template:
+        out_path = expand_template(output_template, item, procid, cwd_replacement=cwd, variables=variables)
+    else:
+        out_path = os.path.join(base_dir, "out", dataset_token, f"{log_token}.out")
+
+    # err_path
+    if error_template:
+        err_path = expand_template(error_template, item, procid, cwd_replacement=cwd, variables=variables)
+    else:
+        err_path = os.path.join(base_dir, "err", dataset_token, f"{log_token}.err")
+
+    # log_path
+    if log_template:
+        log_path = expand_template(log_template, item, procid, cwd_replacement=cwd, variables=variables)
+    else:
+        log_path = os.path.join(base_dir, "log", dataset_token, f"{log_token}.log")
+
+    return txt_path, out_path, err_path, log_path
+
+def describe_item(item: str) -> str:
+    """Item of a job for messages: a packed job (comma-joined input files) as its first file and a count."""
+    files = item.split(",")
+    return item if len(files) == 1 else f"{files[0]} (+{len(files) - 1} more files)"
+
+def log_reasons(log_job: Optional[dict]) -> List[str]:
+    """Failure details from the job's condor user-log record (see CondorLogParser)."""
+    if not log_job:
+        return []
+    reasons = []
+    if log_job["state"] == "removed":
+        reasons.append("removed from queue")
+    if log_job["signal"] is not None:
+        reasons.append(f"killed by signal {log_job['signal']}")
+    elif log_job["return_value"] not in (None, 0):
+        reasons.append(f"exit code {log_job['return_value']}")
+    if log_job["hold_reason"] and log_job["state"] != "completed":
+        reasons.append(f"was held: {log_job['hold_reason']}")
+    if log_job["memory_mb"]:
+        reasons.append(f"peak memory {log_job['memory_mb']} MB")
+    return reasons
+
+def clusters_in_queue(base_dir: str, cluster_ids: List[str]) -> Dict[str, bool]:
+    """cluster -> whether it still has jobs in the queue; clusters whose schedd cannot be queried are left out."""
+    if not cluster_ids:
+        return {}
+    wanted = set(cluster_ids)
+    clusters = [(c, schedd) for c, schedd in CondorJobCountMonitor.load_submitted_clusters(condor_dir=base_dir) if c in wanted]
+    clusters += [(c, None) for c in wanted - {c for c, _ in clusters}]
+    try:
+        histograms = CondorJobCountMonitor(threshold=1, verbose=False).status_histograms(clusters)
+    except Exception as e:
+        print(f"[checkJobs] Warning: could not query resubmitted clusters: {e}", file=sys.stderr)
+        return {}
+    return {c: bool(hist) for (c, _), hist in histograms.items() if hist is not None}
+
+def check_job(txt_path: str, out_path: str, err_path: str, index: Optional[DirIndex] = None) -> List[str]:
+    """Reasons the job failed, empty if it passed."""
+    txt_ok = _file_nonzero(txt_path, index)
+    err_ok = True # err_file_ok(err_path) # Err file not worth checking at this stage from verbose output
+    out_ok = out_file_ok(out_path, index)
+
+    reasons = []
+    if not txt_ok:
+        reasons.append("missing/empty txt")
+    if not err_ok:
+        reasons.append("err has content")
+    if not out_ok:
+        reasons.append("out missing or missing marker")
+    return reasons
+
 # -------------------- main flow --------------------
 def parse_args():
     p = argparse.ArgumentParser(description="Check condor submission using original listfile and resubmit failed jobs.")
@@ -289,19 +665,41 @@ def parse_args():
     p.add_argument("--root-dir", default=".", help="Parent path containing the condor submission folders (default: current dir).")
     p.add_argument("--no-submit", action="store_true", help="Do not submit the resubmit file (only write it).")
     p.add_argument("--dry-run", action="store_true", help="Do everything except write the resubmit file; prints planned actions.")
-    return p.parse_args()
-
-def build_jobs_from_submit(submit_path: str) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[str], List[Tuple[int,str,str]]]:
+    p.add_argument("--workers", type=int, default=16, help="Threads used to check job outputs (default: 16).")
+    p.add_argument("-j", "--jobs", type=int, default=None, help="Submissions processed in parallel worker processes (default: number of CPUs).")
+    p.add_argument("--memory-factor", type=float, default=2.0, help="Multiply request_memory by this for jobs that ran out of memory (default: 2).")
+    p.add_argument("--max-memory", default="8 GB", help="Upper limit for escalated request_memory (default: 8 GB).")
+    p.add_argument("--no-logs", action="store_true", help="Do not read the condor user logs: jobs still idle/running/held are then treated as failed.")
+    p.add_argument("--max-retries", type=int, default=None, help="Resubmit each job at most this many times (default: unlimited, 3 with --watch).")
+    p.add_argument("--watch", action="store_true", help="Keep checking and resubmitting until every job has passed or used up its retries.")
+    p.add_argument("--interval", type=int, default=300, help="Seconds between checks in --watch mode (default: 300).")
+    p.add_argument("--no-cache", action="store_true", help="Re-examine every job, ignoring the state files under <submission>/state/ (they are still rewritten).")
+    opts = p.parse_args()
+    if opts.watch:
+        if opts.dry_run or opts.no_submit:
+            p.error("--watch resubmits jobs, it cannot be combined with --dry-run or --no-submit")
+        if opts.max_retries is None:
+            opts.max_retries = 3
+    return opts
+
+def build_jobs_from_submit(submit_path: str) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[str], List[Tuple[int,str,str]], Dict[int, Dict[str, str]]]:
+    """
+    Templates and jobs of a submit file: (args, transfer_output_remaps, output, error templates,
+    [(procid, item, expanded args)], {procid: other queue columns}). The last is empty for a plain
+    "queue $(Item) from list" and holds Dataset/Index for a multi-column queue table.
+    """
     content = read_file(submit_path)
     if content is None:
-        return None, None, None, None, []
+        return None, None, None, None, [], {}
     args_template = extract_line_value(content, "Arguments")
     transfer_remap = extract_transfer_output_remaps(content)
     output_template = extract_line_value(content, "output")
     error_template = extract_line_value(content, "error")
     queue_path = extract_queue_from_path(content)
+    queue_vars = extract_queue_vars(content)
 
     items: List[Tuple[int,str,str]] = []
+    row_vars: Dict[int, Dict[str, str]] = {}
     if queue_path:
         submit_dir = os.path.dirname(submit_path)
         possible_path = queue_path
@@ -322,19 +720,23 @@ def build_jobs_from_submit(submit_path: str) -> Tuple[Optional[str], Optional[st
             with open(listfile, 'r') as lf:
                 raw_lines = [ln.rstrip("\n") for ln in lf]
             clean_lines = [ln.strip() for ln in raw_lines if ln.strip() and not ln.strip().startswith("#")]
-            for idx, item in enumerate(clean_lines):
+            for idx, line in enumerate(clean_lines):
+                variables = None
+                item = line
+                if queue_vars != ["Item"]:
+                    variables = split_queue_row(line, queue_vars)
+                    item = variables.pop("Item", None) or variables[queue_vars[-1]]
+                    row_vars[idx] = variables
                 if args_template:
-                    args_str = expand_template(args_template, item, idx)
+                    args_str = expand_template(args_template, item, idx, variables=variables)
                 else:
                     args_str = item
                 items.append((idx, item, args_str))
         else:
             items = []
-    return args_template, transfer_remap, output_template, error_template, items
-
-def main():
-    opts = parse_args()
+    return args_template, transfer_remap, output_template, error_template, items, row_vars
 
+def resolve_submit_paths(opts) -> List[str]:
     # Build list of submit files to process
     submit_paths = []
 
@@ -346,27 +748,27 @@ def main():
                 submit_paths.append(os.path.abspath(arg))
                 continue
 
-            # 2) if it's a directory path, try to find a .submit under it
+            # 2) if it's a directory path, take the .submit files under it
             if os.path.isdir(arg):
-                found = find_submit_file(arg, os.path.basename(arg))
+                found = find_submit_files(arg, os.path.basename(arg))
                 if found:
-                    submit_paths.append(os.path.abspath(found))
+                    submit_paths.extend(os.path.abspath(f) for f in found)
                     continue
 
             # 3) try under root-dir: root-dir/arg
             cand = os.path.join(opts.root_dir, arg)
             if os.path.isdir(cand):
-                found = find_submit_file(cand, os.path.basename(cand))
+                found = find_submit_files(cand, os.path.basename(cand))
                 if found:
-                    submit_paths.append(os.path.abspath(found))
+                    submit_paths.extend(os.path.abspath(f) for f in found)
                     continue
 
             # 4) try with condor_ prefix under root-dir
             cand2 = os.path.join(opts.root_dir, "condor_" + arg)
             if os.path.isdir(cand2):
-                found = find_submit_file(cand2, os.path.basename(cand2))
+                found = find_submit_files(cand2, os.path.basename(cand2))
                 if found:
-                    submit_paths.append(os.path.abspath(found))
+                    submit_paths.extend(os.path.abspath(f) for f in found)
                     continue
 
             # 5) try glob expansion for user convenience (e.g., "condor_*/src/*.submit")
@@ -391,116 +793,152 @@ def main():
 
     else:
         # No args: scan for all condor_*/src/*.submit under root-dir
-        pattern = os.path.join(opts.root_dir, "condor_*", "src", "*.submit")
-        submit_paths = sorted(glob.glob(pattern))
-
-    if not submit_paths:
-        print("[checkJobs] No submit files found to process.", file=sys.stderr)
-        sys.exit(1)
-
-    # Process each submit file independently
-    any_failures = False
-    for submit_path in submit_paths:
-        print("\n" + "="*80)
-        print(f"[checkJobs] Processing submit: {submit_path}", flush=True)
-        print("="*80 + "\n", flush=True)
-
-        # Determine base_dir as the parent of the 'src' directory containing submit
-        submit_dir = os.path.dirname(submit_path)
-        base_dir = os.path.normpath(os.path.join(submit_dir, ".."))
-
-        if not os.path.isdir(base_dir):
-            print(f"[checkJobs] ERROR: derived submission directory not found for {submit_path}: {base_dir}", file=sys.stderr)
-            any_failures = True
-            continue
-
-        submit_content = read_file(submit_path) or ""
-        args_template, transfer_remap, output_template, error_template, items = build_jobs_from_submit(submit_path)
-
-        if not items:
-            print(f"[checkJobs] ERROR: could not parse any items from the submit listfile for {submit_path}. Skipping.", file=sys.stderr)
-            any_failures = True
-            continue
-
-        print(f"[checkJobs] Found {len(items)} items from listfile (submit: {submit_path})", flush=True)
-
-        failed_entries = []
-        passed_count = 0
-
-        # Use cwd replacement for $ENV(PWD)
-        cwd = os.getcwd()
-
-        for procid, item, args_str in items:
-            # Determine expected txt path (same logic as before but we won't use item as dataset token)
-            if transfer_remap:
-                txt_path = expand_template(transfer_remap, item, procid, cwd_replacement=cwd)
-            else:
-                m = re.search(r'([^\s"\'`]+\.txt)\b', args_str)
-                if m:
-                    candidate = m.group(1)
-                    if os.path.isabs(candidate):
-                        txt_path = candidate
-                    elif "/" in candidate or "\\" in candidate:
-                        txt_path = os.path.normpath(os.path.join(os.path.dirname(submit_path), candidate))
-                        if not os.path.exists(txt_path):
-                            txt_path = os.path.join(base_dir, "txt", candidate)
-                    else:
-                        # candidate is a bare filename like SOME_0.txt; place under base_dir/txt/<dataset_guess>/
-                        dataset_guess = item.split()[0] if item and not item.startswith('root://') else ""
-                        if dataset_guess:
-                            txt_path = os.path.join(base_dir, "txt", dataset_guess, candidate)
-                        else:
-                            # put directly under <base_dir>/txt/<candidate>
-                            txt_path = os.path.join(base_dir, "txt", candidate)
-                else:
-                    # fallback: build safe path using sanitized item
-                    safe_item = _sanitize_token(item)[:80]
-                    txt_path = os.path.join(base_dir, "txt", safe_item, f"{safe_item}_{procid}.txt")
-        
-            # Derive log_token and dataset_token robustly & sanitized
-            log_token = _derive_log_token(args_str, item, procid)
-
-            # Use the basename of the expected txt file (if any) as the primary hint
-            txt_basename = os.path.basename(txt_path) if txt_path else ""
-            dataset_token = _derive_dataset_token(item, args_str=args_str, txt_token=txt_basename)
-            
-            # out_path (prefer template)
-            if output_template:
-                out_path = expand_template(output_template, item, procid, cwd_replacement=cwd)
-            else:
-                out_path = os.path.join(base_dir, "out", dataset_token, f"{log_token}.out")
-            
-            # err_path
-            if error_template:
-                err_path = expand_template(error_template, item, procid, cwd_replacement=cwd)
+        submit_paths = inventory_condor_tree(opts.root_dir)
+
+    return submit_paths
+
+
+def empty_result(submit_path: str) -> dict:
+    return {"submit": submit_path, "passed": 0, "failed": 0, "pending": 0, "exhausted": 0, "cached": 0, "checked": 0,
+            "resubmitted": 0, "clusters": [], "error": False}
+
+def process_submission(submit_path: str, opts) -> dict:
+    """Check one submission and write/submit its resubmit files. Returns counts for the summary."""
+    result = empty_result(submit_path)
+    print("\n" + "="*80)
+    print(f"[checkJobs] Processing submit: {submit_path}", flush=True)
+    print("="*80 + "\n", flush=True)
+
+    # Determine base_dir as the parent of the 'src' directory containing submit
+    submit_dir = os.path.dirname(submit_path)
+    base_dir = os.path.normpath(os.path.join(submit_dir, ".."))
+
+    if not os.path.isdir(base_dir):
+        print(f"[checkJobs] ERROR: derived submission directory not found for {submit_path}: {base_dir}", file=sys.stderr)
+        result["error"] = True
+        return result
+
+    submit_content = read_file(submit_path) or ""
+    args_template, transfer_remap, output_template, error_template, items, row_vars = build_jobs_from_submit(submit_path)
+
+    if not items:
+        print(f"[checkJobs] ERROR: could not parse any items from the submit listfile for {submit_path}. Skipping.", file=sys.stderr)
+        result["error"] = True
+        return result
+
+    print(f"[checkJobs] Found {len(items)} items from listfile (submit: {submit_path})", flush=True)
+
+    failed_entries = []
+    failed_by_cause: Dict[str, List[Tuple[int, str, str]]] = {}
+    failed_logs: Dict[int, dict] = {}
+    lost_files: List[str] = []
+    passed_count = 0
+    pending_count = 0
+    exhausted_count = 0
+
+    # Use cwd replacement for $ENV(PWD)
+    cwd = os.getcwd()
+    log_template = extract_line_value(submit_content, "log")
+    index = DirIndex()
+    state = JobStateCache(base_dir, submit_path)
+    if opts.no_cache:
+        state.jobs = {}
+    stem = os.path.splitext(os.path.basename(submit_path))[0]
+    logs = None if opts.no_logs else CondorLogParser(os.path.join(base_dir, "state", f"{stem}.logs.json"))
+
+    # Whether the clusters of earlier resubmissions are still queued, for jobs whose log does not show them
+    in_queue = {} if opts.no_logs else clusters_in_queue(base_dir, state.resubmitted_clusters())
+
+    # Passed jobs with unchanged outputs are settled here; only the rest go to the thread pool
+    cached = {procid for procid, _, _ in items if state.passed_unchanged(procid, index)}
+    cached_count = len(cached)
+    passed_count += cached_count
+    to_check = [job for job in items if job[0] not in cached]
+
+    def check(job):
+        procid, item, args_str = job
+        txt_path, out_path, err_path, log_path = job_paths(procid, item, args_str, submit_path, base_dir,
+                                                           transfer_remap, output_template, error_template, cwd, log_template,
+                                                           row_vars.get(procid))
+        reasons = check_job(txt_path, out_path, err_path, index)
+        status = "passed"
+        log_job = None
+        if reasons:
+            # Outputs are incomplete: the user log tells a job still in the queue from a failed one
+            log_job = logs.latest_job(log_path) if logs else None
+            if log_job and log_job["state"] in CondorLogParser.IN_FLIGHT:
+                status = "pending"
+                reasons = [log_job["state"]]
+            elif logs and state.awaiting_resubmission(procid, log_job, in_queue):
+                status = "pending"
+                reasons = ["resubmitted"]
             else:
-                err_path = os.path.join(base_dir, "err", dataset_token, f"{log_token}.err")
-        
-            txt_ok = _file_nonzero(txt_path)
-            err_ok = True # err_file_ok(err_path) # Err file not worth checking at this stage from verbose output
-            out_ok = out_file_ok(out_path)
-        
-            if txt_ok and err_ok and out_ok:
+                status = "failed"
+                reasons += log_reasons(log_job)
+        state.set(procid, txt_path, out_path, status, index)
+        if status != "failed":
+            return status, reasons, None, log_job
+        return status, reasons, classify_failure(log_job, err_path), log_job
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, opts.workers)) as executor:
+        results = executor.map(check, to_check)
+        for (procid, item, args_str), (status, reasons, cause, log_job) in zip(to_check, results):
+            if status == "passed":
                 passed_count += 1
+            elif status == "pending":
+                pending_count += 1
+            elif opts.max_retries is not None and state.retries(procid) >= opts.max_retries:
+                exhausted_count += 1
+                lost_files.extend(item.split(","))
+                print(f"[checkJobs] FAIL (proc {procid}) [{cause}, {state.retries(procid)} retries used, giving up]: "
+                      f"item='{describe_item(item)}' -> reasons: {', '.join(reasons)}", flush=True)
             else:
                 failed_entries.append((procid, item, args_str))
-                reasons = []
-                if not txt_ok:
-                    reasons.append("missing/empty txt")
-                if not err_ok:
-                    reasons.append("err has content")
-                if not out_ok:
-                    reasons.append("out missing or missing marker")
-                print(f"[checkJobs] FAIL (proc {procid}): item='{item}' -> reasons: {', '.join(reasons)}", flush=True)
-
-        print(f"[checkJobs] Summary for {os.path.basename(base_dir)}: passed={passed_count}, failed={len(failed_entries)}", flush=True)
-
-        if not failed_entries:
-            print(f"[checkJobs] No failed jobs to resubmit for {os.path.basename(base_dir)}.", flush=True)
-            continue
+                failed_by_cause.setdefault(cause, []).append((procid, item, args_str))
+                if log_job:
+                    failed_logs[procid] = log_job
+                print(f"[checkJobs] FAIL (proc {procid}) [{cause}]: item='{describe_item(item)}' -> reasons: {', '.join(reasons)}", flush=True)
+
+    try:
+        state.save()
+        if logs:
+            logs.save()
+    except Exception as e:
+        print(f"[checkJobs] Warning: could not save job state under {os.path.dirname(state.path)}: {e}", file=sys.stderr)
+
+    result.update(passed=passed_count, failed=len(failed_entries) + exhausted_count, pending=pending_count,
+                  exhausted=exhausted_count, cached=cached_count, checked=len(items) - cached_count)
+    print(f"[checkJobs] Summary for {os.path.basename(base_dir)}: passed={passed_count}, failed={len(failed_entries) + exhausted_count}, "
+          f"in-flight={pending_count}" + (f", out of retries={exhausted_count}" if exhausted_count else "")
+          + f" (cached={cached_count}, checked={len(items) - cached_count})", flush=True)
+    # Input files no output will cover, so the efficiencies of their datasets can be judged
+    lost_path = os.path.join(base_dir, f"lost_files_{stem}.txt")
+    if not lost_files and os.path.exists(lost_path):
+        os.remove(lost_path)
+    if lost_files:
+        try:
+            with open(lost_path, "w") as f:
+                f.writelines(url + "\n" for url in lost_files)
+            print(f"[checkJobs] {len(lost_files)} input files of jobs out of retries listed in {lost_path}", flush=True)
+        except OSError as e:
+            print(f"[checkJobs] Warning: could not write {lost_path}: {e}", file=sys.stderr)
+    if failed_by_cause:
+        print("[checkJobs] Failures by cause: " + ", ".join(f"{c}={len(e)}" for c, e in sorted(failed_by_cause.items())), flush=True)
 
-        # Compute a single forced_dataset based on the first failed entry so all resubmitted jobs
-        # write back into the same directory (avoid per-entry numeric-suffixed dataset dirs).
+    if not failed_entries:
+        print(f"[checkJobs] No failed jobs to resubmit for {os.path.basename(base_dir)}.", flush=True)
+        return result
+
+    # Dataset of every failed job: the Dataset column of a campaign submit (several datasets in one
+    # queue table), else derived once from the first failed entry so all resubmitted jobs write back
+    # into the same directory (avoid per-entry numeric-suffixed dataset dirs).
+    datasets: Dict[int, str] = {procid: row_vars[procid]["Dataset"] for procid, _, _ in failed_entries
+                                if row_vars.get(procid, {}).get("Dataset")}
+    if len(datasets) == len(failed_entries) and len(set(datasets.values())) > 1:
+        forced_dataset = None
+    elif datasets:
+        forced_dataset = next(iter(datasets.values()))
+    else:
         first_procid, first_item, first_args = failed_entries[0]
         txt_candidate = None
         try:
@@ -513,44 +951,65 @@ def main():
             pass
         forced_dataset = _derive_dataset_token(first_item, args_str=first_args, txt_token=txt_candidate)
 
-        # Ensure directories exist for resubmit header expectations (use forced_dataset)
-        for s in ("out", "err", "log", "txt"):
+    # Ensure directories exist for resubmit header expectations
+    for s in ("out", "err", "log", "txt"):
+        for dataset in ([forced_dataset] if forced_dataset else sorted(set(datasets.values()))):
             try:
-                os.makedirs(os.path.join(base_dir, s, forced_dataset), exist_ok=True)
+                os.makedirs(os.path.join(base_dir, s, dataset), exist_ok=True)
             except Exception:
                 pass
 
-        resubmit_name = f"resubmit_failed_{os.path.basename(base_dir)}.sub"
+    # One resubmit file per failure cause: OOM jobs get more memory, xrootd failures another redirector
+    submit_mem_mb = parse_memory_mb(extract_line_value(submit_content, "request_memory") or "2 GB") or 2048
+    max_mem_mb = parse_memory_mb(opts.max_memory) or 8192
+    for cause, entries in sorted(failed_by_cause.items()):
+        request_memory = None
+        if cause == CAUSE_OOM:
+            logged = [failed_logs[p] for p, _, _ in entries if p in failed_logs]
+            current_mb = max([submit_mem_mb] + [j["request_memory_mb"] or 0 for j in logged])
+            peak_mb = max([j["memory_mb"] or 0 for j in logged] or [0])
+            request_memory = f"{escalate_memory(current_mb, peak_mb, opts.memory_factor, max_mem_mb)} MB"
+        elif cause == CAUSE_XROOTD:
+            entries = [(procid, item, switch_redirector(args)) for procid, item, args in entries]
+
+        # Named per submit file and retry round, so neither other datasets nor earlier rounds are overwritten
+        suffix = "" if cause == CAUSE_OTHER else f"_{cause}"
+        retry_round = 1 + max(state.retries(procid) for procid, _, _ in entries)
+        resubmit_name = f"resubmit_failed_{stem}{suffix}_r{retry_round}.sub"
         resubmit_path = os.path.join(base_dir, resubmit_name)
+        label = f"{os.path.basename(base_dir)} [{cause}]"
 
         if opts.dry_run:
-            print(f"[checkJobs] Dry run for {os.path.basename(base_dir)}: would write resubmit file with the following failed entries:", flush=True)
-            for procid, item, args in failed_entries:
-                print(f"   proc={procid}, item='{item}', args='{args}'", flush=True)
-            print(f"[checkJobs] Dry-run complete for {os.path.basename(base_dir)}. (would write to: {resubmit_path})", flush=True)
+            print(f"[checkJobs] Dry run for {label}: would write resubmit file with the following failed entries"
+                  + (f" (request_memory = {request_memory})" if request_memory else "") + ":", flush=True)
+            for procid, item, args in entries:
+                print(f"   proc={procid}, item='{describe_item(item)}', args='{args}'", flush=True)
+            print(f"[checkJobs] Dry-run complete for {label}. (would write to: {resubmit_path})", flush=True)
             continue
 
         try:
-            write_resubmit_file(resubmit_path, os.path.basename(base_dir), submit_content, failed_entries, forced_dataset=forced_dataset)
-            print(f"[checkJobs] Resubmit file written: {resubmit_path}", flush=True)
+            write_resubmit_file(resubmit_path, os.path.basename(base_dir), submit_content, entries,
+                                forced_dataset=forced_dataset, request_memory=request_memory, datasets=datasets)
+            print(f"[checkJobs] Resubmit file written: {resubmit_path}"
+                  + (f" (request_memory = {request_memory})" if request_memory else ""), flush=True)
         except Exception as e:
-            print(f"[checkJobs] ERROR: failed to write resubmit file for {os.path.basename(base_dir)}: {e}", file=sys.stderr)
-            any_failures = True
+            print(f"[checkJobs] ERROR: failed to write resubmit file for {label}: {e}", file=sys.stderr)
+            result["error"] = True
             continue
 
         if opts.no_submit:
-            print(f"[checkJobs] --no-submit specified: not running condor_submit for {os.path.basename(base_dir)}.", flush=True)
+            print(f"[checkJobs] --no-submit specified: not running condor_submit for {label}.", flush=True)
             continue
 
         # submit
         submit_cmd = f"source {CMS_ENV} && condor_submit {resubmit_path}"
-        print(f"[checkJobs] Submitting resubmit file for {os.path.basename(base_dir)} with:\n  {submit_cmd}\n", flush=True)
+        print(f"[checkJobs] Submitting resubmit file for {label} with:\n  {submit_cmd}\n", flush=True)
         proc = subprocess.run(submit_cmd, shell=True, executable="/bin/bash", capture_output=True, text=True)
         if proc.returncode != 0:
-            print(f"[checkJobs] condor_submit failed for {os.path.basename(base_dir)} with exit code {proc.returncode}", file=sys.stderr)
+            print(f"[checkJobs] condor_submit failed for {label} with exit code {proc.returncode}", file=sys.stderr)
             print(proc.stdout, file=sys.stderr)
             print(proc.stderr, file=sys.stderr)
-            any_failures = True
+            result["error"] = True
             continue
 
         # parse cluster id (best-effort)
@@ -558,14 +1017,137 @@ def main():
         m = re.search(r"submitted to cluster\s+(\d+)", stdout)
         if m:
             cluster = m.group(1)
-            per_sub_file = os.path.join(base_dir, "submitted_clusters.txt")
             try:
-                with open(per_sub_file, "a") as cf:
-                    cf.write(f"{cluster}\n")
+                CondorJobCountMonitor.record_cluster(cluster, condor_dir=base_dir)
             except Exception:
                 pass
+            state.mark_resubmitted([procid for procid, _, _ in entries], cluster)
+            result["clusters"].append(cluster)
+        result["resubmitted"] += len(entries)
+
+        print(f"[checkJobs] Resubmit submitted successfully for {label}", flush=True)
+
+    try:
+        state.save()
+    except Exception as e:
+        print(f"[checkJobs] Warning: could not save job state {state.path}: {e}", file=sys.stderr)
+    return result
+
+def _process_submission_captured(submit_path: str, opts) -> Tuple[dict, str]:
+    """process_submission in a worker process: its output is returned instead of interleaved with other workers."""
+    buf = io.StringIO()
+    with contextlib.redirect_stdout(buf), contextlib.redirect_stderr(buf):
+        try:
+            result = process_submission(submit_path, opts)
+        except Exception as e:
+            print(f"[checkJobs] ERROR: processing {submit_path} failed: {e}")
+            result = empty_result(submit_path)
+            result["error"] = True
+    return result, buf.getvalue()
+
+def run_submissions(submit_paths: List[str], opts) -> List[dict]:
+    """Process submissions in parallel worker processes; each one's output is printed as a block when it finishes."""
+    n_jobs = min(opts.jobs or os.cpu_count() or 1, len(submit_paths))
+    if n_jobs <= 1:
+        return [process_submission(submit_path, opts) for submit_path in submit_paths]
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        futures = [executor.submit(_process_submission_captured, submit_path, opts) for submit_path in submit_paths]
+        for future in concurrent.futures.as_completed(futures):
+            result, output = future.result()
+            sys.stdout.write(output)
+            sys.stdout.flush()
+            results.append(result)
+    return results
+
+def print_summary_table(results: List[dict]):
+    """One line per submission, most failures first."""
+    def label(r):
+        base_dir = os.path.basename(os.path.normpath(os.path.join(os.path.dirname(r["submit"]), "..")))
+        return f"{base_dir}/{os.path.splitext(os.path.basename(r['submit']))[0]}"
+    rows = sorted(results, key=lambda r: (-r["failed"], -r["pending"], label(r)))
+    width = max([len(label(r)) for r in rows] + [10])
+    cols = ("passed", "failed", "pending", "exhausted", "resubmitted", "cached", "checked")
+    print("\n" + "=" * 80)
+    print(f"[checkJobs] Summary of {len(rows)} submission(s)")
+    print(f"{'submission':<{width}} " + " ".join(f"{c:>11}" for c in cols))
+    for r in rows:
+        print(f"{label(r):<{width}} " + " ".join(f"{r[c]:>11}" for c in cols) + ("  ERROR" if r["error"] else ""))
+    print(f"{'total':<{width}} " + " ".join(f"{sum(r[c] for r in rows):>11}" for c in cols))
+    print("=" * 80, flush=True)
+
+def watch(submit_paths: List[str], opts) -> bool:
+    """
+    Check and resubmit in rounds until every job has passed or used up --max-retries.
+    A submission drops out once it has nothing in flight and no failed job with retries left; one
+    whose resubmission fails WATCH_MAX_ERROR_ROUNDS rounds in a row is given up with an error.
+    Returns True on errors.
+    """
+    # Held jobs never finish on their own: release transient holds, remove the rest so the next round resubmits them
+    monitor = CondorJobCountMonitor(threshold=1, verbose=False, hold_policy=HoldPolicy(max_releases=3))
+    active = list(submit_paths)
+    error_rounds: Dict[str, int] = {}
+    given_up: List[str] = []
+    any_failures = False
+    round_no = 0
+    while active:
+        round_no += 1
+        print(f"\n[checkJobs] Watch round {round_no}: {len(active)} submission(s) with unfinished jobs", flush=True)
+        still_active = []
+        results = run_submissions(active, opts)
+        print_summary_table(results)
+        for result in results:
+            any_failures = any_failures or result["error"]
+            retriable = result["failed"] - result["exhausted"]
+            # Jobs with retries left that were not resubmitted (condor_submit failed) are tried again next round
+            if result["error"] and retriable > result["resubmitted"]:
+                error_rounds[result["submit"]] = error_rounds.get(result["submit"], 0) + 1
+            else:
+                error_rounds[result["submit"]] = 0
+            if error_rounds[result["submit"]] >= WATCH_MAX_ERROR_ROUNDS:
+                print(f"[checkJobs] ERROR: giving up on {result['submit']}: resubmitting its {retriable} failed job(s) "
+                      f"failed {WATCH_MAX_ERROR_ROUNDS} rounds in a row", file=sys.stderr, flush=True)
+                given_up.append(result["submit"])
+            elif result["pending"] or result["resubmitted"] or retriable > 0:
+                still_active.append(result["submit"])
+        active = sorted(still_active)
+        if not active:
+            break
+
+        clusters = []
+        for submit_path in active:
+            base_dir = os.path.normpath(os.path.join(os.path.dirname(submit_path), ".."))
+            clusters.extend(CondorJobCountMonitor.load_submitted_clusters(condor_dir=base_dir))
+        if clusters:
+            monitor.handle_held(clusters)
+        queued = monitor.get_total_jobs(clusters=clusters) if clusters else -1
+        print(f"[checkJobs] {len(active)} submission(s) unfinished"
+              + (f", {queued} job(s) of resubmitted clusters in the queue" if queued >= 0 else "")
+              + f"; next check in {opts.interval}s", flush=True)
+        time.sleep(opts.interval)
+    if given_up:
+        print(f"[checkJobs] Watch stopped after {round_no} round(s) with failed jobs not resubmitted in: {', '.join(given_up)}", file=sys.stderr, flush=True)
+        return True
+    print(f"[checkJobs] Watch finished after {round_no} round(s): every job passed or used up its {opts.max_retries} retries.", flush=True)
+    return any_failures
+
+
+def main():
+    opts = parse_args()
 
-        print(f"[checkJobs] Resubmit submitted successfully for {os.path.basename(base_dir)}", flush=True)
+    submit_paths = list(dict.fromkeys(resolve_submit_paths(opts)))
+
+    if not submit_paths:
+        print("[checkJobs] No submit files found to process.", file=sys.stderr)
+        sys.exit(1)
+
+    # Process the submit files independently, in parallel
+    if opts.watch:
+        any_failures = watch(submit_paths, opts)
+    else:
+        results = run_submissions(submit_paths, opts)
+        print_summary_table(results)
+        any_failures = any(result["error"] for result in results)
 
     # exit with non-zero if any submission processing failed
     if any_failures:
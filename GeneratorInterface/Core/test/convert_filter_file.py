@@ -1,10 +1,26 @@
 import os, glob
+from JobPlanner import load_job_files
 
 path_to_MINI = "../../../samples/MINI/"
 dir_list = [os.path.basename(d) + "/" for d in glob.glob(path_to_MINI + "*X_SMS")]
 dir_list = [idir for idir in dir_list if not "102X" in idir] # preUL minis are not on disk so we just use existing outputs
 for directory in dir_list:
+    # Jobs packed by make_filter_file.py --pack-events/--pack-bytes read several files: report the input files no output covers
+    job_files = load_job_files("condor_"+directory)
     for filename in os.listdir("condor_"+directory+"/txt/"):
+        jobs = {index: files for (dataset, index), files in job_files.items() if dataset == filename}
+        if jobs:
+            missing = []
+            for index in sorted(jobs):
+                txtfile = "condor_"+directory+"/txt/"+filename+"/"+filename+"_"+str(index)+".txt"
+                if not os.path.exists(txtfile) or os.path.getsize(txtfile) == 0:
+                    missing += jobs[index]
+            n_files = sum(len(files) for files in jobs.values())
+            print(filename+": "+str(n_files-len(missing))+"/"+str(n_files)+" input files in "+str(len(jobs))+" jobs have outputs")
+            if missing:
+                with open("condor_"+directory+"missing_"+filename+".txt","w") as fmissing:
+                    fmissing.writelines(url+"\n" for url in missing)
+                print("  files without output listed in condor_"+directory+"missing_"+filename+".txt")
         os.system("cat condor_"+directory+"/txt/"+filename+"/*.txt > condor_"+directory+"/txt/"+filename+".txt")
         if not os.path.isdir(directory):
             os.system("mkdir "+directory)
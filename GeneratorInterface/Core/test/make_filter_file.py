@@ -1,5 +1,8 @@
-import os, glob
-from CondorJobCountMonitor import CondorJobCountMonitor
+import os, re, glob, argparse, subprocess
+import concurrent.futures
+from CondorJobCountMonitor import CondorJobCountMonitor, HoldPolicy
+from SubmissionScheduler import SubmissionScheduler
+from JobPlanner import FileMetadata, pack_files, parse_bytes, write_job_files
 
 def make_submit_sh(srcfile,year,dataset):
     fsrc = open(srcfile,'w')
@@ -27,23 +30,144 @@ def make_submit_sh(srcfile,year,dataset):
     fsrc.write('queue $(Item) from '+path_to_MINI+year+'/'+dataset+'.txt \n')
     fsrc.close()
 
-path_to_MINI = "../../../samples/MINI/"
-dir_list = [os.path.basename(d) + "/" for d in glob.glob(path_to_MINI + "*X_SMS")]
-dir_list = [idir for idir in dir_list if not "102X" in idir] # preUL minis are not on disk so we just use existing outputs
-for directory in dir_list:
-    files = [f for f in os.listdir(path_to_MINI+directory) if f.endswith(".txt")]
-    os.system("ls "+path_to_MINI+directory+" > lists_"+directory.replace('/','')+".txt")
-    os.system("rm -rf condor_"+directory)
-    monitor = CondorJobCountMonitor(threshold=90000, verbose=False)
-    for file in files:
-        dataset = file.replace('.txt','')
-        os.system("mkdir -p condor_"+directory+'src/')
+def read_campaign(year,datasets):
+    # Input files of every dataset, in list order (blank and comment lines are skipped like condor does)
+    dataset_items = {}
+    for dataset in datasets:
+        with open(path_to_MINI+year+'/'+dataset+'.txt') as flist:
+            dataset_items[dataset] = [ln.strip() for ln in flist if ln.strip() and not ln.strip().startswith('#')]
+    return dataset_items
+
+def plan_campaign(year,datasets):
+    # Input files of every dataset packed into jobs of about --pack-events events (or --pack-bytes of input);
+    # a job reads its files comma-joined through inputFiles. Returns the job items and the files of each job
+    dataset_items = read_campaign(year,datasets)
+    if not args.pack_events and not pack_bytes:
+        return dataset_items, None
+    key, budget = ("events", args.pack_events) if args.pack_events else ("size", pack_bytes)
+    metadata = FileMetadata("file_metadata.json", source=args.metadata)
+    dataset_jobs, meta = {}, {}
+    for dataset, files in dataset_items.items():
+        meta.update(metadata.lookup(files))
+        dataset_jobs[dataset] = pack_files(files, meta, budget, key, max_files=args.max_files_per_job)
+        print(year+": "+dataset+": "+str(len(files))+" files in "+str(len(dataset_jobs[dataset]))+" jobs")
+    return {dataset: [','.join(files) for files in jobs] for dataset, jobs in dataset_jobs.items()}, (dataset_jobs, meta)
+
+def make_campaign_submit(srcfile,tablefile,year):
+    # Same job description as make_submit_sh, for the "Dataset Index Item" rows of tablefile
+    fsrc = open(srcfile,'w')
+    fsrc.write('universe = vanilla \n') 
+    fsrc.write('executable = execute_script.sh \n')
+    fsrc.write('use_x509userproxy = true \n')
+    fsrc.write('Arguments = $(Item) $(Dataset)_$(Index).txt ')
+    if "130X" in year:
+        fsrc.write('Run3\n')
+    else:
+        fsrc.write('UL\n')
+    fsrc.write('output = $ENV(PWD)/condor_'+year+'/out/$(Dataset)/$(Dataset)_$(Index).out \n')
+    fsrc.write('error = $ENV(PWD)/condor_'+year+'/err/$(Dataset)/$(Dataset)_$(Index).err \n')
+    fsrc.write('log = $ENV(PWD)/condor_'+year+'/log/$(Dataset)/$(Dataset)_$(Index).log \n')
+    fsrc.write('request_memory = 2 GB \n')
+    fsrc.write('transfer_input_files = runGenFilterEfficiencyAnalyzer_cfg.py\n')
+    fsrc.write('should_transfer_files = YES \n')
+    fsrc.write('when_to_transfer_output = ON_EXIT \n')
+    fsrc.write('transfer_output_files = $(Dataset)_$(Index).txt \n')
+    fsrc.write('transfer_output_remaps = "$(Dataset)_$(Index).txt=$ENV(PWD)/condor_'+year+'/txt/$(Dataset)/$(Dataset)_$(Index).txt" \n')
+    if "130X" in year:
+        fsrc.write('+DesiredOS="EL9"\n')
+    else:
+        fsrc.write('+DesiredOS="SL7"\n')
+    fsrc.write('queue Dataset, Index, Item from '+tablefile+' \n')
+    fsrc.close()
+
+def submit(srcfile,condor_dir):
+    print("condor_submit "+srcfile)
+    proc = subprocess.run(["condor_submit", srcfile], capture_output=True, text=True)
+    print(proc.stdout, end="")
+    if proc.returncode != 0:
+        print("condor_submit failed for "+srcfile+": "+proc.stderr.strip())
+        return None
+    m = re.search(r"submitted to cluster\s+(\d+)", proc.stdout)
+    if m:
+        CondorJobCountMonitor.record_cluster(m.group(1), condor_dir=condor_dir)
+        return m.group(1)
+    return None
+
+parser = argparse.ArgumentParser(description="Write and submit the condor jobs computing the filter efficiencies of the SMS samples.")
+parser.add_argument("--per-dataset", action="store_true", help="One submit file (and cluster) per dataset instead of chunks of the whole campaign.")
+parser.add_argument("--threshold", type=int, default=90000, help="Keep at most this many of your jobs in the queue (default: 90000).")
+parser.add_argument("--min-chunk", type=int, default=500, help="Wait until at least this many jobs fit before submitting a chunk (default: 500).")
+parser.add_argument("--max-chunk", type=int, default=20000, help="Largest cluster submitted at once (default: 20000).")
+parser.add_argument("--restart", action="store_true", help="Start campaigns over even if an earlier run submitted (part of) them.")
+parser.add_argument("--pack-events", type=int, default=0, help="Pack input files into jobs of about this many events (default: one file per job).")
+parser.add_argument("--pack-bytes", default=None, help="Pack input files into jobs of about this much input, e.g. '10 GB' (default: one file per job).")
+parser.add_argument("--metadata", default="das", choices=["das", "xrdfs"], help="Where file event counts and sizes for packing come from (xrdfs stat gives sizes only; default: das).")
+parser.add_argument("--max-files-per-job", type=int, default=0, help="At most this many input files in a packed job (default: no limit).")
+args = parser.parse_args()
+pack_bytes = parse_bytes(args.pack_bytes) if args.pack_bytes else None
+if args.pack_bytes and not pack_bytes:
+    parser.error("could not parse --pack-bytes "+args.pack_bytes)
+if args.pack_events and args.pack_bytes:
+    parser.error("use either --pack-events or --pack-bytes")
+if args.pack_events and args.metadata == "xrdfs":
+    parser.error("xrdfs stat gives file sizes only, use --pack-bytes with --metadata xrdfs")
+if args.per_dataset and (args.pack_events or pack_bytes):
+    parser.error("packing files into jobs needs the campaign submission, drop --per-dataset")
+
+def new_monitor(directory):
+    # Queue counts over the submission go to telemetry.csv (see CondorJobCountMonitor.py status) to tune the threshold.
+    # Held jobs would keep the count up: transient holds are released, the rest removed (listed in held_jobs.jsonl) for checkJobs.py to resubmit
+    return CondorJobCountMonitor(threshold=args.threshold, verbose=False, telemetry="condor_"+directory+"telemetry.csv",
+                                 hold_policy=HoldPolicy(max_releases=3, report_path="condor_"+directory+"held_jobs.jsonl"))
+
+def make_dirs(directory,datasets):
+    os.system("mkdir -p condor_"+directory+'src/')
+    for dataset in datasets:
         os.system("mkdir -p condor_"+directory+'out/'+dataset+'/')
         os.system("mkdir -p condor_"+directory+'err/'+dataset+'/')
         os.system("mkdir -p condor_"+directory+'log/'+dataset+'/')
         os.system("mkdir -p condor_"+directory+'txt/'+dataset+'/')
-        srcfile = "condor_"+directory+"src/"+dataset+".submit"
-        make_submit_sh(srcfile,directory.replace('/',''),dataset)
-        monitor.wait_until_jobs_below()
-        print("condor_submit "+srcfile)
-        os.system("condor_submit "+srcfile)
+
+path_to_MINI = "../../../samples/MINI/"
+dir_list = [os.path.basename(d) + "/" for d in glob.glob(path_to_MINI + "*X_SMS")]
+dir_list = [idir for idir in dir_list if not "102X" in idir] # preUL minis are not on disk so we just use existing outputs
+campaign_datasets = {directory: sorted(f.replace('.txt','') for f in os.listdir(path_to_MINI+directory) if f.endswith(".txt")) for directory in dir_list}
+
+if args.per_dataset:
+    for directory in dir_list:
+        os.system("ls "+path_to_MINI+directory+" > lists_"+directory.replace('/','')+".txt")
+        os.system("rm -rf condor_"+directory)
+        monitor = new_monitor(directory)
+        make_dirs(directory,campaign_datasets[directory])
+        for dataset in campaign_datasets[directory]:
+            srcfile = "condor_"+directory+"src/"+dataset+".submit"
+            make_submit_sh(srcfile,directory.replace('/',''),dataset)
+            monitor.wait_until_jobs_below()
+            submit(srcfile,"condor_"+directory)
+else:
+    # Input lists of the next campaigns are read while the current one waits for room in the queue
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as reader:
+        pending = {directory: reader.submit(plan_campaign, directory.replace('/',''), campaign_datasets[directory]) for directory in dir_list}
+        for directory in dir_list:
+            campaign = directory.replace('/','')
+            os.system("ls "+path_to_MINI+directory+" > lists_"+campaign+".txt")
+            scheduler = SubmissionScheduler("condor_"+directory, campaign, None, None)
+            if scheduler.finished() and not args.restart:
+                print(campaign+": already submitted (see condor_"+directory+"state/submission.json), use --restart to submit it again")
+                continue
+            if args.restart or not scheduler.in_progress():
+                os.system("rm -rf condor_"+directory)
+            else:
+                print(campaign+": resuming an interrupted submission")
+            make_dirs(directory,campaign_datasets[directory])
+            scheduler = SubmissionScheduler("condor_"+directory, campaign, new_monitor(directory),
+                                            lambda srcfile, tablefile, year=campaign: make_campaign_submit(srcfile,tablefile,year),
+                                            min_chunk=args.min_chunk, max_chunk=args.max_chunk)
+            dataset_items, packing = pending[directory].result()
+            new_campaign = scheduler.state is None
+            scheduler.prepare(dataset_items)
+            if new_campaign and packing:
+                # Which input files each $(Dataset)_$(Index) job read, for checkJobs.py and convert_filter_file.py
+                write_job_files("condor_"+directory, *packing)
+            print(campaign+": "+str(len(dataset_items))+" datasets, "+str(scheduler.state["rows"])+" jobs")
+            scheduler.run()
@@ -0,0 +1,1115 @@
+import os
+import re
+import json
+import time
+import types
+import random
+import argparse
+import functools
+import subprocess
+
+import pytest
+
+from CondorLogParser import CondorLogParser
+import CondorJobCountMonitor as monitor_module
+from CondorJobCountMonitor import (CondorJobCountMonitor, CondorQBackend, HTCondorBindingsBackend, HoldPolicy, JobTelemetry,
+                                   PollSchedule)
+import SubmissionScheduler as scheduler_module
+from SubmissionScheduler import SubmissionScheduler
+from JobPlanner import pack_files, parse_bytes, write_job_files, load_job_files
+import checkJobs
+from checkJobs import (DirIndex, JobStateCache, XROOTD_REDIRECTORS, build_jobs_from_submit, classify_failure,
+                       escalate_memory, extract_queue_vars, parse_memory_mb, split_queue_row, switch_redirector,
+                       write_resubmit_file)
+
+# Synthetic-log, fake-schedd and simulated-queue checks of the condor tooling; run with
+# python3 -m pytest GeneratorInterface/Core/test/test_condor_tools.py
+
+SUBMIT = "000 ({cluster:03d}.{proc:03d}.000) {stamp} Job submitted from host: <131.225.1.1:9618>\n...\n"
+EXECUTE = "001 ({cluster:03d}.{proc:03d}.000) {stamp} Job executing on host: <10.0.0.7:9618?addrs=10.0.0.7-9618>\n...\n"
+IMAGE_SIZE = ("006 ({cluster:03d}.{proc:03d}.000) {stamp} Image size of job updated: 1800000\n"
+              "\t1700  -  MemoryUsage of job (MB)\n\t1650000  -  ResidentSetSize of job (KB)\n...\n")
+TERMINATED = ("005 ({cluster:03d}.{proc:03d}.000) {stamp} Job terminated.\n"
+              "\t{how}\n"
+              "\t\tUsr 0 00:10:00, Sys 0 00:00:30  -  Run Remote Usage\n"
+              "\t\tUsr 0 00:00:00, Sys 0 00:00:00  -  Run Local Usage\n"
+              "\tPartitionable Resources :    Usage  Request Allocated\n"
+              "\t   Memory (MB)          :     1900     2048      2048\n...\n")
+EVICTED = "004 ({cluster:03d}.{proc:03d}.000) {stamp} Job was evicted.\n\t(0) Job was not checkpointed.\n...\n"
+HELD = ("012 ({cluster:03d}.{proc:03d}.000) {stamp} Job was held.\n"
+        "\t{reason}\n\tCode {code} Subcode {subcode}\n...\n")
+RELEASED = "013 ({cluster:03d}.{proc:03d}.000) {stamp} Job was released.\n\tvia condor_release (by user me)\n...\n"
+
+def event(template, cluster=1234, proc=0, stamp="2024-05-01 12:00:00", **kw):
+    return template.format(cluster=cluster, proc=proc, stamp=stamp, **kw)
+
+def write_log(tmp_path, text, name="job_0.log", mode="w"):
+    path = os.path.join(str(tmp_path), name)
+    with open(path, mode) as f:
+        f.write(text)
+    return path
+
+# ---------------------------
+# CondorLogParser
+# ---------------------------
+def test_log_completed_job(tmp_path):
+    path = write_log(tmp_path, event(SUBMIT) + event(EXECUTE, stamp="2024-05-01 12:01:00")
+                     + event(IMAGE_SIZE, stamp="2024-05-01 12:05:00")
+                     + event(TERMINATED, stamp="2024-05-01 12:11:00", how="(1) Normal termination (return value 0)"))
+    job = CondorLogParser().latest_job(path)
+    assert job["job_id"] == "1234.0"
+    assert job["state"] == "completed"
+    assert job["return_value"] == 0 and job["signal"] is None
+    assert job["memory_mb"] == 1900 and job["request_memory_mb"] == 2048
+    assert job["runtime_s"] == 600
+    assert job["cpu_s"] == 630
+    assert job["host"].startswith("<10.0.0.7")
+
+def test_log_timestamp_formats():
+    new = CondorLogParser._timestamp("2024-05-01 12:00:00")
+    old = CondorLogParser._timestamp("05/01 12:00:30")
+    assert new is not None and old is not None
+    assert CondorLogParser._timestamp("not a time") is None
+
+def test_log_old_timestamp_format(tmp_path):
+    path = write_log(tmp_path, event(SUBMIT, stamp="05/01 12:00:00") + event(EXECUTE, stamp="05/01 12:01:00")
+                     + event(TERMINATED, stamp="05/01 12:03:00", how="(1) Normal termination (return value 1)"))
+    job = CondorLogParser().latest_job(path)
+    assert job["state"] == "failed"
+    assert job["return_value"] == 1
+    assert job["runtime_s"] == 120
+
+def test_log_abnormal_termination(tmp_path):
+    path = write_log(tmp_path, event(SUBMIT) + event(EXECUTE)
+                     + event(TERMINATED, how="(0) Abnormal termination (signal 9)"))
+    job = CondorLogParser().latest_job(path)
+    assert job["state"] == "failed"
+    assert job["signal"] == 9 and job["return_value"] is None
+
+def test_log_eviction_and_hold(tmp_path):
+    path = write_log(tmp_path, event(SUBMIT) + event(EXECUTE) + event(EVICTED) + event(EXECUTE)
+                     + event(HELD, reason="Error from slot1: memory limit of 2048 megabytes exceeded", code=34, subcode=0))
+    parser = CondorLogParser()
+    job = parser.latest_job(path)
+    assert job["evictions"] == 1
+    assert job["state"] == "held" and job["state"] in CondorLogParser.IN_FLIGHT
+    assert (job["hold_code"], job["hold_subcode"]) == (34, 0)
+    assert job["hold_reason"].startswith("Error from slot1")
+    assert job["request_memory_mb"] == 2048
+
+    write_log(tmp_path, event(RELEASED), mode="a")
+    assert parser.latest_job(path)["state"] == "idle"
+
+def test_log_partial_event_read_again(tmp_path):
+    parser = CondorLogParser()
+    path = write_log(tmp_path, event(SUBMIT) + event(EXECUTE))
+    terminated = event(TERMINATED, stamp="2024-05-01 12:10:00", how="(1) Normal termination (return value 0)")
+    half = len(terminated) // 2
+    write_log(tmp_path, terminated[:half], mode="a")
+    assert parser.latest_job(path)["state"] == "running"
+    write_log(tmp_path, terminated[half:], mode="a")
+    assert parser.latest_job(path)["state"] == "completed"
+
+def test_log_resubmitted_cluster_is_latest(tmp_path):
+    path = write_log(tmp_path, event(SUBMIT) + event(EXECUTE)
+                     + event(TERMINATED, how="(1) Normal termination (return value 85)")
+                     + event(SUBMIT, cluster=1300, proc=7, stamp="2024-05-01 13:00:00"))
+    job = CondorLogParser().latest_job(path)
+    assert job["job_id"] == "1300.7"
+    assert job["state"] == "idle"
+
+def test_log_state_file_and_rewritten_log(tmp_path):
+    state = os.path.join(str(tmp_path), "state", "logs.json")
+    path = write_log(tmp_path, event(SUBMIT) + event(EXECUTE))
+    parser = CondorLogParser(state)
+    assert parser.latest_job(path)["state"] == "running"
+    parser.save()
+
+    # A new parser resumes from the saved offset
+    write_log(tmp_path, event(TERMINATED, how="(1) Normal termination (return value 0)"), mode="a")
+    assert CondorLogParser(state).latest_job(path)["state"] == "completed"
+
+    # A log replaced by a shorter one is read from the start
+    write_log(tmp_path, event(SUBMIT, cluster=99))
+    job = CondorLogParser(state).latest_job(path)
+    assert job["job_id"] == "99.0" and job["state"] == "idle"
+
+# ---------------------------
+# HoldPolicy and handle_held against a fake schedd
+# ---------------------------
+class FakeSchedd:
+    """Backend standing in for condor_q/condor_release/condor_rm: held jobs per schedd, actions recorded."""
+    def __init__(self, held, act_ok=True):
+        self.held = held            # schedd -> [held job dicts]
+        self.act_ok = act_ok
+        self.actions = []           # (action, schedd, job_ids)
+
+    def held_jobs(self, schedd, cluster_ids):
+        return [job for job in self.held.get(schedd, []) if cluster_ids is None or job["job_id"].split(".")[0] in cluster_ids]
+
+    def act(self, action, schedd, job_ids):
+        self.actions.append((action, schedd, sorted(job_ids)))
+        return self.act_ok
+
+def held(job_id, code, num_holds=1, reason="", subcode=0):
+    return {"job_id": job_id, "code": code, "subcode": subcode, "num_holds": num_holds, "reason": reason}
+
+def test_hold_policy_decide():
+    policy = HoldPolicy(max_releases=3)
+    assert policy.decide(held("1.0", 1, reason="via condor_hold (by user me)"), 0) == "keep"
+    assert policy.decide(held("1.0", 13, reason="Transfer input files failure"), 0) == "release"
+    assert policy.decide(held("1.0", 13), 2) == "release"
+    assert policy.decide(held("1.0", 13), 3) == "remove"
+    assert policy.decide(held("1.0", 0, reason="Error: Connection timed out while transferring"), 0) == "release"
+    assert policy.decide(held("1.0", 34, reason="memory limit exceeded"), 0) == "remove"
+    assert HoldPolicy(remove_permanent=False).decide(held("1.0", 34), 0) == "keep"
+
+def test_handle_held_uses_num_holds(tmp_path):
+    report_path = os.path.join(str(tmp_path), "held_jobs.jsonl")
+    schedd = FakeSchedd({"schedd1": [
+        held("100.0", 13, num_holds=1, reason="Transfer input files failure"),
+        held("100.1", 13, num_holds=4, reason="Transfer input files failure"),   # released 3 times by earlier runs
+        held("100.2", 34, num_holds=1, reason="memory limit exceeded"),
+        held("100.3", 1, num_holds=1, reason="via condor_hold (by user me)"),
+    ]})
+    monitor = CondorJobCountMonitor(threshold=1, backend=schedd, hold_policy=HoldPolicy(max_releases=3, report_path=report_path))
+    counts = monitor.handle_held([("100", "schedd1")])
+    assert counts == {"held": 4, "released": 1, "removed": 2}
+    assert ("release", "schedd1", ["100.0"]) in schedd.actions
+    assert ("remove", "schedd1", ["100.1", "100.2"]) in schedd.actions
+    assert monitor.releases[("schedd1", "100.0")] == 1
+    assert sorted(job["job_id"] for job in monitor.removed_held) == ["100.1", "100.2"]
+    with open(report_path) as f:
+        report = [json.loads(line) for line in f]
+    assert sorted((entry["job_id"], entry["action"]) for entry in report) == [("100.0", "release"), ("100.1", "remove"), ("100.2", "remove")]
+
+def test_handle_held_counts_releases_of_this_process():
+    schedd = FakeSchedd({None: [held("7.0", 12, num_holds=1, reason="Failed to open input file")]})
+    monitor = CondorJobCountMonitor(threshold=1, backend=schedd, hold_policy=HoldPolicy(max_releases=2))
+    # The schedd keeps reporting NumHolds=1 (stale ad): the monitor's own count still caps the releases
+    assert [monitor.handle_held()["released"] for _ in range(3)] == [1, 1, 0]
+    assert schedd.actions[-1] == ("remove", None, ["7.0"])
+
+def test_handle_held_failed_action_not_reported(tmp_path):
+    report_path = os.path.join(str(tmp_path), "held_jobs.jsonl")
+    schedd = FakeSchedd({None: [held("8.0", 34, reason="memory limit exceeded")]}, act_ok=False)
+    monitor = CondorJobCountMonitor(threshold=1, backend=schedd, hold_policy=HoldPolicy(report_path=report_path))
+    assert monitor.handle_held() == {"held": 1, "released": 0, "removed": 0}
+    assert monitor.removed_held == []
+    assert not os.path.exists(report_path)
+
+# ---------------------------
+# SubmissionScheduler against a simulated queue
+# ---------------------------
+class SimulatedQueue:
+    """
+    Stands in for the monitor and condor_submit: wait_until_jobs_below returns the queued count
+    (jobs finish drain_per_wait at a time), condor_submit writes the submit event of every job to
+    its user log like the real one. crash_on makes the n-th submission die right after queueing.
+    """
+    def __init__(self, threshold, queued=0, drain_per_wait=0, crash_on=None):
+        self.threshold = threshold
+        self.queued = queued
+        self.drain_per_wait = drain_per_wait
+        self.crash_on = crash_on
+        self.next_cluster = 1000
+        self.submissions = []       # (cluster, [(dataset, index, item), ...])
+
+    def wait_until_jobs_below(self, threshold=None):
+        self.queued = max(0, self.queued - self.drain_per_wait)
+        return self.queued
+
+    def run(self, cmd, capture_output=True, text=True):
+        with open(cmd[1]) as f:
+            content = f.read()
+        with open(re.search(r"^queue .* from (\S+)", content, re.M).group(1)) as f:
+            rows = [line.split(None, 2) for line in f if line.strip()]
+        log_template = re.search(r"^log = (\S+)", content, re.M).group(1)
+        cluster = self.next_cluster
+        self.next_cluster += 1
+        for proc, (dataset, index, _) in enumerate(rows):
+            log_path = log_template.replace("$(Dataset)", dataset).replace("$(Index)", index)
+            os.makedirs(os.path.dirname(log_path), exist_ok=True)
+            with open(log_path, "a") as f:
+                f.write(event(SUBMIT, cluster=cluster, proc=proc, stamp=time.strftime("%Y-%m-%d %H:%M:%S")))
+        self.submissions.append((cluster, [(d, int(i), item.strip()) for d, i, item in rows]))
+        self.queued += len(rows)
+        if self.crash_on == len(self.submissions):
+            raise KeyboardInterrupt("killed between condor_submit and the state update")
+        return subprocess.CompletedProcess(cmd, 0, f"{len(rows)} job(s) submitted to cluster {cluster}.\n", "")
+
+def make_scheduler(tmp_path, queue, **kw):
+    condor_dir = os.path.join(str(tmp_path), "condor_Test/")
+    os.makedirs(os.path.join(condor_dir, "src"), exist_ok=True)
+    log_dir = os.path.join(condor_dir, "log")
+
+    def write_submit(srcfile, tablefile):
+        with open(srcfile, "w") as f:
+            f.write(f"log = {log_dir}/$(Dataset)/$(Dataset)_$(Index).log\nqueue Dataset, Index, Item from {tablefile}\n")
+    return SubmissionScheduler(condor_dir, "Test", queue, write_submit, **kw)
+
+def submitted_rows(queue):
+    return [row for _, rows in queue.submissions for row in rows]
+
+DATASET_ITEMS = {"big": [f"/store/big/{i}.root" for i in range(7)], "small": [f"/store/small/{i}.root" for i in range(3)]}
+
+def test_scheduler_order_rows():
+    rows = SubmissionScheduler.order_rows(DATASET_ITEMS)
+    assert [d for d, _, _ in rows] == ["small"] * 3 + ["big"] * 7
+    assert rows[3] == ("big", 0, "/store/big/0.root")
+
+def test_scheduler_chunks_fit_headroom(tmp_path, monkeypatch):
+    queue = SimulatedQueue(threshold=6, queued=2, drain_per_wait=3)
+    monkeypatch.setattr(scheduler_module.subprocess, "run", queue.run)
+    scheduler = make_scheduler(tmp_path, queue, min_chunk=2, max_chunk=3)
+    scheduler.prepare(DATASET_ITEMS)
+    assert scheduler.run()
+    assert submitted_rows(queue) == SubmissionScheduler.order_rows(DATASET_ITEMS)
+    assert all(2 <= len(rows) <= 3 for _, rows in queue.submissions[:-1])
+    assert scheduler.finished()
+    assert [c for c, _ in CondorJobCountMonitor.load_submitted_clusters(scheduler.condor_dir)] == [str(c) for c, _ in queue.submissions]
+
+def test_scheduler_settles_submitted_intent_after_crash(tmp_path, monkeypatch):
+    queue = SimulatedQueue(threshold=100, crash_on=2)
+    monkeypatch.setattr(scheduler_module.subprocess, "run", queue.run)
+    scheduler = make_scheduler(tmp_path, queue, min_chunk=4, max_chunk=4)
+    scheduler.prepare(DATASET_ITEMS)
+    with pytest.raises(KeyboardInterrupt):
+        scheduler.run()
+    assert [c["status"] for c in scheduler.state["chunks"]] == ["submitted", "intent"]
+
+    # A new run finds the submit event of the crashed chunk in its first job's log: not submitted again
+    queue.crash_on = None
+    resumed = make_scheduler(tmp_path, queue, min_chunk=4, max_chunk=4)
+    assert resumed.in_progress()
+    assert resumed.run()
+    assert submitted_rows(queue) == SubmissionScheduler.order_rows(DATASET_ITEMS)
+    assert [c["cluster"] for c in resumed.state["chunks"]] == ["1000", "1001", "1002"]
+
+def test_scheduler_requeues_intent_that_never_reached_the_schedd(tmp_path, monkeypatch):
+    queue = SimulatedQueue(threshold=100)
+    monkeypatch.setattr(scheduler_module.subprocess, "run", queue.run)
+    scheduler = make_scheduler(tmp_path, queue, min_chunk=4, max_chunk=4)
+    scheduler.prepare(DATASET_ITEMS)
+
+    def crash_before_submit(cmd, **kw):
+        raise KeyboardInterrupt("killed before condor_submit")
+    monkeypatch.setattr(scheduler_module.subprocess, "run", crash_before_submit)
+    with pytest.raises(KeyboardInterrupt):
+        scheduler.run()
+    assert [c["status"] for c in scheduler.state["chunks"]] == ["intent"]
+
+    monkeypatch.setattr(scheduler_module.subprocess, "run", queue.run)
+    resumed = make_scheduler(tmp_path, queue, min_chunk=4, max_chunk=4)
+    assert resumed.run()
+    assert submitted_rows(queue) == SubmissionScheduler.order_rows(DATASET_ITEMS)
+    assert resumed.finished()
+
+def test_scheduler_failed_submit_keeps_rows_pending(tmp_path, monkeypatch):
+    queue = SimulatedQueue(threshold=100)
+    monkeypatch.setattr(scheduler_module.subprocess, "run",
+                        lambda cmd, **kw: subprocess.CompletedProcess(cmd, 1, "", "ERROR: Failed to connect to local queue manager"))
+    scheduler = make_scheduler(tmp_path, queue, min_chunk=4, max_chunk=4)
+    scheduler.prepare(DATASET_ITEMS)
+    assert not scheduler.run()
+    assert scheduler.state["next_row"] == 0 and scheduler.state["chunks"] == []
+    assert scheduler.in_progress()
+
+# ---------------------------
+# JobPlanner packing
+# ---------------------------
+def packing_input(events):
+    files = [f"root://cmsxrootd.fnal.gov//store/mc/f{i}.root" for i in range(len(events))]
+    meta = {f: {"events": n, "size": n * 1000 if n else None} for f, n in zip(files, events)}
+    return files, meta
+
+def job_loads(jobs, meta, key="events"):
+    return [sum(meta[f][key] for f in job) for job in jobs]
+
+def test_pack_events_balanced():
+    files, meta = packing_input([1000, 2000, 3000, 4000, 5000, 6000, 7000] * 4)
+    jobs = pack_files(files, meta, 100000, "events")
+    # 112k events under a 100k budget: two jobs of about half each, no small straggler
+    assert job_loads(jobs, meta) == [56000, 56000]
+    assert [f for job in jobs for f in job] == files
+
+def test_pack_respects_budget_and_order():
+    files, meta = packing_input([1000, 2000, 3000, 4000, 5000, 6000, 7000] * 4)
+    jobs = pack_files(files, meta, 10000, "events")
+    assert [f for job in jobs for f in job] == files
+    assert len(jobs) >= -(-112000 // 10000)
+    assert max(job_loads(jobs, meta)) <= 1.5 * 10000
+
+def test_pack_bytes_and_large_files():
+    files, meta = packing_input([500, 500, 50000, 500, 500])
+    jobs = pack_files(files, meta, parse_bytes("2 MB"), "size")
+    assert [files[2]] in jobs
+    assert [f for job in jobs for f in job] == files
+
+def test_pack_max_files_and_fallbacks():
+    files, meta = packing_input([100] * 10)
+    assert [len(job) for job in pack_files(files, meta, 10 ** 6, "events", max_files=4)] == [4, 4, 2]
+    # Without metadata, or without a budget, every file is its own job
+    assert pack_files(files, {}, 1000, "events") == [[f] for f in files]
+    assert pack_files(files, meta, 0, "events") == [[f] for f in files]
+    # A file without metadata weighs the median of the others
+    files, meta = packing_input([100, None, 100, 100])
+    assert len(pack_files(files, meta, 200, "events")) == 2
+    assert pack_files([], meta, 200) == []
+
+def test_parse_bytes():
+    assert parse_bytes("10 GB") == 10 * 1024 ** 3
+    assert parse_bytes("500MB") == 500 * 1024 ** 2
+    assert parse_bytes("1.5k") == 1536
+    assert parse_bytes("123") == 123
+    assert parse_bytes("ten GB") is None
+
+def test_job_files_round_trip(tmp_path):
+    files, meta = packing_input([100, 200, 300])
+    write_job_files(str(tmp_path), {"SMS-A": [files[:2], files[2:]]}, meta)
+    assert load_job_files(str(tmp_path)) == {("SMS-A", 0): files[:2], ("SMS-A", 1): files[2:]}
+    assert load_job_files(os.path.join(str(tmp_path), "missing")) == {}
+
+# ---------------------------
+# checkJobs job-state cache
+# ---------------------------
+DATASET = "SMS-T1tttt_TuneCP5_13p6TeV-madgraphMLM-pythia8"
+
+def make_submission(root, n_jobs, passing):
+    """condor_Test_130X_SMS/ as make_submit_sh writes it; jobs in passing get their txt and .out marker."""
+    base = os.path.join(str(root), "condor_Test_130X_SMS")
+    for sub in ("src", "out/" + DATASET, "err/" + DATASET, "log/" + DATASET, "txt/" + DATASET):
+        os.makedirs(os.path.join(base, sub), exist_ok=True)
+    listfile = os.path.join(str(root), DATASET + ".txt")
+    with open(listfile, "w") as f:
+        f.writelines(f"root://cmsxrootd.fnal.gov//store/mc/Run3/{DATASET}/{i}.root\n" for i in range(n_jobs))
+    submit = os.path.join(base, "src", DATASET + ".submit")
+    with open(submit, "w") as f:
+        f.write(f"universe = vanilla \nexecutable = execute_script.sh \nArguments = $(Item) {DATASET}_$(ProcId).txt Run3\n"
+                f"output = $ENV(PWD)/condor_Test_130X_SMS/out/{DATASET}/{DATASET}_$(ProcId).out \n"
+                f"error = $ENV(PWD)/condor_Test_130X_SMS/err/{DATASET}/{DATASET}_$(ProcId).err \n"
+                f"log = $ENV(PWD)/condor_Test_130X_SMS/log/{DATASET}/{DATASET}_$(ProcId).log \n"
+                "request_memory = 2 GB \n"
+                f'transfer_output_remaps = "{DATASET}_$(ProcId).txt=$ENV(PWD)/condor_Test_130X_SMS/txt/{DATASET}/{DATASET}_$(ProcId).txt" \n'
+                f"queue $(Item) from {listfile} \n")
+    for procid in passing:
+        write_outputs(base, procid)
+    return base, submit
+
+def write_outputs(base, procid, txt="N total = 10 N passed = 5\n"):
+    with open(os.path.join(base, "txt", DATASET, f"{DATASET}_{procid}.txt"), "w") as f:
+        f.write(txt)
+    with open(os.path.join(base, "out", DATASET, f"{DATASET}_{procid}.out"), "w") as f:
+        f.write(f"Wrote output to: {DATASET}_{procid}.txt\n")
+
+def check_opts(**kw):
+    opts = dict(no_cache=False, no_logs=True, workers=2, max_retries=None, dry_run=True, no_submit=False,
+                max_memory="8 GB", memory_factor=2.0)
+    opts.update(kw)
+    return argparse.Namespace(**opts)
+
+def test_state_cache_skips_unchanged_passed_jobs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    base, submit = make_submission(tmp_path, 4, passing=[0, 1, 2])
+    first = checkJobs.process_submission(submit, check_opts())
+    assert (first["passed"], first["failed"], first["cached"], first["checked"]) == (3, 1, 0, 4)
+    again = checkJobs.process_submission(submit, check_opts())
+    assert (again["passed"], again["failed"], again["cached"], again["checked"]) == (3, 1, 3, 1)
+    assert checkJobs.process_submission(submit, check_opts(no_cache=True))["cached"] == 0
+
+def test_state_cache_rechecks_changed_outputs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    base, submit = make_submission(tmp_path, 3, passing=[0, 1, 2])
+    checkJobs.process_submission(submit, check_opts())
+
+    # Rewritten txt (other size), touched out (same content, new mtime), emptied txt
+    write_outputs(base, 0, txt="N total = 10 N passed = 7 (rerun)\n")
+    out_1 = os.path.join(base, "out", DATASET, f"{DATASET}_1.out")
+    st = os.stat(out_1)
+    os.utime(out_1, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    open(os.path.join(base, "txt", DATASET, f"{DATASET}_2.txt"), "w").close()
+    result = checkJobs.process_submission(submit, check_opts())
+    assert (result["cached"], result["checked"]) == (0, 3)
+    assert (result["passed"], result["failed"]) == (2, 1)
+
+def test_state_cache_invalidation(tmp_path):
+    base, submit = make_submission(tmp_path, 2, passing=[0, 1])
+    txt = [os.path.join(base, "txt", DATASET, f"{DATASET}_{i}.txt") for i in range(2)]
+    out = [os.path.join(base, "out", DATASET, f"{DATASET}_{i}.out") for i in range(2)]
+    cache = JobStateCache(base, submit)
+    for procid in range(2):
+        cache.set(procid, txt[procid], out[procid], "passed", DirIndex())
+    cache.save()
+    assert all(JobStateCache(base, submit).passed_unchanged(procid, DirIndex()) for procid in range(2))
+
+    # Resubmitted to a new cluster: pending until checked again
+    cache = JobStateCache(base, submit)
+    cache.mark_resubmitted([1], "4242")
+    cache.save()
+    cache = JobStateCache(base, submit)
+    assert cache.passed_unchanged(0, DirIndex()) and not cache.passed_unchanged(1, DirIndex())
+    assert cache.retries(1) == 1 and cache.resubmitted_clusters() == ["4242"]
+
+    # Output removed since the check
+    os.remove(txt[0])
+    assert not JobStateCache(base, submit).passed_unchanged(0, DirIndex())
+
+    # Another submit file: the whole cache is dropped
+    with open(submit, "a") as f:
+        f.write("# edited\n")
+    assert JobStateCache(base, submit).jobs == {}
+
+# ---------------------------
+# checkJobs failure classification
+# ---------------------------
+def log_job(hold_reason=None, hold_code=None, signal=None, memory_mb=None, request_memory_mb=None, return_value=None):
+    return {"hold_reason": hold_reason, "hold_code": hold_code, "signal": signal, "memory_mb": memory_mb,
+            "request_memory_mb": request_memory_mb, "return_value": return_value}
+
+@pytest.mark.parametrize("job, err, cause", [
+    (None, "terminate called after throwing an instance of 'std::bad_alloc'\n", "oom"),
+    (None, "Killed process 4242 (cmsRun) total-vm:9000000kB\n", "oom"),
+    (log_job(hold_code=34, hold_reason="Error from slot1: peak usage exceeded request"), "", "oom"),
+    (log_job(hold_code=26, hold_reason="Job has gone over memory limit of 2048 megabytes."), "", "oom"),
+    (log_job(signal=9, memory_mb=1990, request_memory_mb=2048), "", "oom"),
+    (log_job(signal=9, memory_mb=800, request_memory_mb=2048), "", "other"),
+    (log_job(signal=9), "", "other"),
+    (None, "%MSG-s FileOpenError:  PostModule 01-Jan-2025\n[ERROR] Server responded with an error: [3011]\n", "xrootd"),
+    (None, "XrdCl: Operation expired\n", "xrootd"),
+    (log_job(return_value=84), "", "xrootd"),
+    (log_job(return_value=92), "", "xrootd"),
+    (log_job(return_value=1), "", "other"),
+    (log_job(hold_code=13, hold_reason="Transfer input files failure"), "", "held"),
+    (None, "", "other"),
+])
+def test_classify_failure(tmp_path, job, err, cause):
+    err_path = tmp_path / "job_0.err"
+    err_path.write_text("%MSG-w XrdAdaptor: file open\n" + err)
+    assert classify_failure(job, str(err_path)) == cause
+
+def test_classify_failure_without_err_file(tmp_path):
+    assert classify_failure(log_job(hold_code=34, hold_reason=""), str(tmp_path / "missing.err")) == "oom"
+    assert classify_failure(None, str(tmp_path / "missing.err")) == "other"
+
+@pytest.mark.parametrize("value, mb", [
+    ("2 GB", 2048), ("2048", 2048), ("4096MB", 4096), ("1.5G", 1536), ("512 mb", 512), ("1 TB", 1024 * 1024),
+    ("", None), ("lots", None), (None, None),
+])
+def test_parse_memory_mb(value, mb):
+    assert parse_memory_mb(value) == mb
+
+@pytest.mark.parametrize("current, peak, factor, max_mb, expected", [
+    (2048, None, 2.0, 8192, 4096),
+    (2048, 3900, 1.5, 8192, 5120),     # 1.25 x peak wins, rounded up to 512
+    (2000, None, 1.5, 8192, 3072),     # rounded up to 512
+    (6144, None, 2.0, 8192, 8192),     # capped
+    (8192, 9000, 2.0, 8192, 8192),     # already at the cap
+    (10240, None, 2.0, 8192, 10240),   # never lowered below the last request
+])
+def test_escalate_memory(current, peak, factor, max_mb, expected):
+    assert escalate_memory(current, peak, factor, max_mb) == expected
+
+def test_escalate_memory_repeated_stops_at_max():
+    requests = [2048]
+    for _ in range(5):
+        requests.append(escalate_memory(requests[-1], None, 2.0, parse_memory_mb("12 GB")))
+    assert requests == [2048, 4096, 8192, 12288, 12288, 12288]
+
+def test_switch_redirector_rotates():
+    path = "/store/mc/Run3/SMS-A/MINIAODSIM/000001.root"
+    args = XROOTD_REDIRECTORS[0] + path
+    seen = [args]
+    for _ in range(len(XROOTD_REDIRECTORS)):
+        seen.append(switch_redirector(seen[-1]))
+    assert [s[:-len(path)] for s in seen] == list(XROOTD_REDIRECTORS) + [XROOTD_REDIRECTORS[0]]
+    # Every input file of a multi-file job moves together; unknown redirectors go to the first one
+    two = f"{XROOTD_REDIRECTORS[1]}{path},{XROOTD_REDIRECTORS[1]}{path}"
+    assert switch_redirector(two) == f"{XROOTD_REDIRECTORS[2]}{path},{XROOTD_REDIRECTORS[2]}{path}"
+    assert switch_redirector("root://eoscms.cern.ch/" + path) == XROOTD_REDIRECTORS[0] + path
+    assert switch_redirector("/local/file.root out.txt") == "/local/file.root out.txt"
+
+# ---------------------------
+# checkJobs queue tables
+# ---------------------------
+PACKED_ITEMS = {
+    "SMS-A": ["root://cmsxrootd.fnal.gov//store/a/0.root,root://cmsxrootd.fnal.gov//store/a/1.root",
+              "root://cmsxrootd.fnal.gov//store/a/2.root, root://cmsxrootd.fnal.gov//store/a/3.root"],
+    "SMS-B": ["root://cmsxrootd.fnal.gov//store/b/0.root"],
+}
+
+@pytest.mark.parametrize("line, queue_vars, expected", [
+    ("/store/a/0.root", ["Item"], {"Item": "/store/a/0.root"}),
+    ("SMS-A 3 /store/a/0.root,/store/a/1.root", ["Dataset", "Index", "Item"],
+     {"Dataset": "SMS-A", "Index": "3", "Item": "/store/a/0.root,/store/a/1.root"}),
+    ("SMS-A, 3, /store/a/0.root, /store/a/1.root", ["Dataset", "Index", "Item"],
+     {"Dataset": "SMS-A", "Index": "3", "Item": "/store/a/0.root, /store/a/1.root"}),
+    ("  SMS-A_0 SMS-A SMS-A_0.txt /store/a/0.root /store/a/1.root  ", ["LogFile", "Dataset", "TxtFile", "Args"],
+     {"LogFile": "SMS-A_0", "Dataset": "SMS-A", "TxtFile": "SMS-A_0.txt", "Args": "/store/a/0.root /store/a/1.root"}),
+    ("SMS-A 3", ["Dataset", "Index", "Item"], {"Dataset": "SMS-A", "Index": "3", "Item": ""}),
+])
+def test_split_queue_row(line, queue_vars, expected):
+    assert split_queue_row(line, queue_vars) == expected
+
+def campaign_submit(tmp_path):
+    """A make_filter_file.py campaign submit over the job table of a SubmissionScheduler."""
+    scheduler = make_scheduler(tmp_path, SimulatedQueue(threshold=100))
+    scheduler.prepare(PACKED_ITEMS)
+    submit = os.path.join(scheduler.condor_dir, "src", "Test_0.submit")
+    with open(submit, "w") as f:
+        f.write("universe = vanilla \nexecutable = execute_script.sh \nArguments = $(Item) $(Dataset)_$(Index).txt Run3\n"
+                "output = $ENV(PWD)/condor_Test_130X_SMS/out/$(Dataset)/$(Dataset)_$(Index).out \n"
+                "request_memory = 2 GB \n"
+                "queue Dataset, Index, Item from " + scheduler.table_path + " \n")
+    return scheduler, submit
+
+def test_queue_table_round_trip(tmp_path):
+    scheduler, submit = campaign_submit(tmp_path)
+    assert extract_queue_vars(open(submit).read()) == ["Dataset", "Index", "Item"]
+    _, _, _, _, items, row_vars = build_jobs_from_submit(submit)
+    rows = SubmissionScheduler.order_rows(PACKED_ITEMS)
+    assert [item for _, item, _ in items] == [item for _, _, item in rows]
+    assert [(row_vars[procid]["Dataset"], int(row_vars[procid]["Index"])) for procid, _, _ in items] == \
+        [(dataset, index) for dataset, index, _ in rows]
+    assert [args for _, _, args in items] == [f"{item} {dataset}_{index}.txt Run3" for dataset, index, item in rows]
+
+def test_resubmit_file_keeps_args_last(tmp_path):
+    _, submit = campaign_submit(tmp_path)
+    _, _, _, _, items, row_vars = build_jobs_from_submit(submit)
+    resubmit = os.path.join(str(tmp_path), "resubmit_failed_Test_0_r1.sub")
+    write_resubmit_file(resubmit, "condor_Test_130X_SMS", open(submit).read(), items,
+                        datasets={procid: v["Dataset"] for procid, v in row_vars.items()})
+    content = open(resubmit).read()
+    assert "Arguments = $(Args) $(TxtFile) Run3" in content
+    queue_vars = extract_queue_vars(content)
+    assert queue_vars[-1] == "Args"
+    table = content.split("from (\n", 1)[1].rsplit(")", 1)[0].splitlines()
+    assert len(table) == len(items)
+    for (procid, item, _), line in zip(items, table):
+        row = split_queue_row(line, queue_vars)
+        dataset, index = row_vars[procid]["Dataset"], row_vars[procid]["Index"]
+        assert row == {"LogFile": f"{dataset}_{index}", "Dataset": dataset, "TxtFile": f"{dataset}_{index}.txt", "Args": item}
+
+    forced = os.path.join(str(tmp_path), "resubmit_forced.sub")
+    write_resubmit_file(forced, "condor_Test_130X_SMS", open(submit).read(), items[:1], forced_dataset="SMS-B")
+    content = open(forced).read()
+    assert extract_queue_vars(content) == ["LogFile", "TxtFile", "Args"]
+    line = content.split("from (\n", 1)[1].splitlines()[0]
+    assert split_queue_row(line, ["LogFile", "TxtFile", "Args"])["Args"] == items[0][1]
+
+# ---------------------------
+# Status histograms against a scripted backend
+# ---------------------------
+class ScriptedBackend:
+    """
+    Backend whose queue moves one step per monitor sleep: steps is a list of {schedd: {cluster_id:
+    histogram}} snapshots, a schedd mapped to None cannot be queried. The last step stays.
+    """
+    def __init__(self, steps):
+        self.steps = steps
+        self.step = 0
+        self.queries = []           # (step, schedd, cluster_ids)
+
+    def advance(self, delay=None):
+        self.step = min(self.step + 1, len(self.steps) - 1)
+
+    def query_status(self, schedd, cluster_ids):
+        self.queries.append((self.step, schedd, cluster_ids))
+        snapshot = self.steps[self.step].get(schedd)
+        if snapshot is None:
+            return None
+        return {c: dict(h) for c, h in snapshot.items() if cluster_ids is None or c in cluster_ids}
+
+    def held_jobs(self, schedd, cluster_ids):
+        return []
+
+    def total_user_jobs(self):
+        self.queries.append((self.step, None, None))
+        if self.steps[self.step].get(None) is None:
+            raise RuntimeError("condor_q failed")
+        return sum(sum(h.values()) for h in (self.steps[self.step].get(None) or {}).values())
+
+AF_OUTPUT = """
+-- Schedd: lpcschedd3.fnal.gov : <131.225.188.57:9618?... @ 05/01/24 12:00:00
+
+76596545 1
+76596545 2
+76596545 2
+76596545 6
+76596546 5
+76596546 9
+not a job line
+76596547
+76596547.0 1
+Total for query: 6 jobs; 0 completed, 0 removed, 1 idle, 3 running, 1 held, 0 suspended
+"""
+
+def test_parse_af_output():
+    assert CondorQBackend._parse_af_output(AF_OUTPUT) == {
+        "76596545": {"idle": 1, "running": 2, "transferring_output": 1},
+        "76596546": {"held": 1, "unknown": 1},
+    }
+    assert CondorQBackend._parse_af_output("") == {}
+
+def test_histograms():
+    pairs = [("1", 1), ("1", 1), ("2", 4), ("1", 5), ("3", 0)]
+    assert monitor_module._histograms(pairs) == {"1": {"idle": 2, "held": 1}, "2": {"completed": 1}, "3": {"unknown": 1}}
+    assert monitor_module._histograms(iter([])) == {}
+
+def test_group_by_schedd():
+    clusters = [("100", "schedd1"), (100, "schedd1"), ("200", None), ("300", "schedd2"), ("101", "schedd1"), ("200", None)]
+    assert CondorJobCountMonitor.group_by_schedd(clusters) == {"schedd1": ["100", "101"], None: ["200"], "schedd2": ["300"]}
+    assert CondorJobCountMonitor.group_by_schedd([]) == {}
+
+def test_status_histograms():
+    backend = ScriptedBackend([{
+        "schedd1": {"100": {"idle": 3, "running": 1}, "999": {"running": 5}},
+        "schedd2": None,
+        None: {"300": {"held": 2}},
+    }])
+    monitor = CondorJobCountMonitor(threshold=1, backend=backend)
+    clusters = [("100", "schedd1"), ("101", "schedd1"), ("200", "schedd2"), ("300", None), ("100", "schedd1")]
+    assert monitor.status_histograms(clusters) == {
+        ("100", "schedd1"): {"idle": 3, "running": 1},
+        ("101", "schedd1"): {},                 # left the queue
+        ("200", "schedd2"): None,               # schedd not reachable
+        ("300", None): {"held": 2},
+    }
+    # One query per schedd, with the deduplicated clusters of that schedd
+    assert sorted(backend.queries, key=lambda q: q[1] or "") == [(0, None, ["300"]), (0, "schedd1", ["100", "101"]), (0, "schedd2", ["200"])]
+    assert monitor.get_total_jobs(clusters) == 6
+    assert monitor.status_histograms([]) == {}
+
+    # All of $USER's jobs on the local schedd
+    assert monitor.status_histograms() == {("300", None): {"held": 2}}
+    backend.steps[0][None] = None
+    with pytest.raises(RuntimeError):
+        monitor.status_histograms()
+
+# ---------------------------
+# condor_q and htcondor bindings backends against one fake pool
+# ---------------------------
+def ad(cluster, proc, status, owner="me", code=None, subcode=None, num_holds=None, reason=None):
+    job = {"ClusterId": cluster, "ProcId": proc, "JobStatus": status, "Owner": owner}
+    for key, value in (("HoldReasonCode", code), ("HoldReasonSubCode", subcode), ("NumHolds", num_holds), ("HoldReason", reason)):
+        if value is not None:
+            job[key] = value
+    return job
+
+USER_CONSTRAINT = 'Owner == "me"'
+
+class FakePool:
+    """Job ads per schedd (None: the local one), served to the bindings and to condor_q alike."""
+    def __init__(self, jobs):
+        self.jobs = jobs
+        self.down = {}              # schedd -> number of queries/actions that fail next
+        self.located = []
+        self.actions = []           # (action, schedd, job_ids)
+
+    def _contact(self, schedd):
+        if self.down.get(schedd):
+            self.down[schedd] -= 1
+            raise RuntimeError(f"Failed to connect to {schedd or 'local schedd'}")
+
+    def select(self, schedd, constraint):
+        self._contact(schedd)
+        expr = constraint.replace("||", " or ").replace("&&", " and ")
+        return [job for job in self.jobs.get(schedd, []) if eval(expr, {}, dict(job))]
+
+    def act(self, action, schedd, job_ids):
+        self._contact(schedd)
+        self.actions.append((action, schedd, sorted(job_ids)))
+        for job in self.jobs.get(schedd, []):
+            if f"{job['ClusterId']}.{job['ProcId']}" in job_ids:
+                job["JobStatus"] = 1 if action == "release" else 3
+
+    def htcondor_module(self, xquery=True):
+        """Stand-in for the htcondor bindings module: Schedd, Collector, DaemonTypes, JobAction."""
+        pool = self
+
+        class Schedd:
+            def __init__(self, location=None):
+                self.name = location["Name"] if location else None
+
+            def query(self, constraint="true", projection=()):
+                return [{k: job[k] for k in projection if k in job} for job in pool.select(self.name, constraint)]
+
+            def act(self, action, job_ids):
+                pool.act({"JobAction.Release": "release", "JobAction.Remove": "remove"}[action], self.name, job_ids)
+
+        class StreamingSchedd(Schedd):
+            def xquery(self, requirements="true", projection=()):
+                return iter(self.query(requirements, projection))
+
+        class Collector:
+            def locate(self, daemon_type, name):
+                assert daemon_type == "DaemonTypes.Schedd"
+                pool.located.append(name)
+                return {"Name": name}
+
+        return types.SimpleNamespace(
+            Schedd=StreamingSchedd if xquery else Schedd, Collector=Collector,
+            DaemonTypes=types.SimpleNamespace(Schedd="DaemonTypes.Schedd"),
+            JobAction=types.SimpleNamespace(Release="JobAction.Release", Remove="JobAction.Remove"))
+
+    def check_output(self, cmd, text=True, stderr=None, shell=False):
+        """condor_q as the CLI backend runs it: -af ClusterId JobStatus, the held -af:j listing or -total."""
+        if shell:
+            assert cmd == "condor_q $USER -total"
+            total = len(self.select(None, USER_CONSTRAINT))
+            return (f"Total for query: {total} jobs; 0 completed, 0 removed, 1 idle, {total - 2} running, 1 held, 0 suspended\n"
+                    f"Total for me: {total} jobs; 0 completed, 0 removed, 1 idle, {total - 2} running, 1 held, 0 suspended\n"
+                    "Total for all users: 5 jobs; 0 completed, 0 removed, 1 idle, 3 running, 1 held, 0 suspended\n")
+        args = list(cmd[1:])
+        schedd = None
+        if args[0] == "-name":
+            schedd, args = args[1], args[2:]
+        clusters = [a for a in args[:args.index("-af" if "-af" in args else "-af:j")] if a.isdigit()]
+        constraint = " || ".join(f"ClusterId == {c}" for c in clusters) or USER_CONSTRAINT
+        if "-constraint" in args:
+            constraint = f"({constraint}) && {args[args.index('-constraint') + 1]}"
+        try:
+            jobs = self.select(schedd, constraint)
+        except RuntimeError as e:
+            raise subprocess.CalledProcessError(1, cmd, output=f"-- {e}\n")
+        if "-af:j" in args:
+            attrs = args[args.index("-af:j") + 1:]
+            return "".join(f"{job['ClusterId']}.{job['ProcId']} " + " ".join(str(job.get(a, "undefined")) for a in attrs) + "\n"
+                           for job in jobs)
+        return "".join(f"{job['ClusterId']} {job['JobStatus']}\n" for job in jobs)
+
+    def run(self, cmd, capture_output=True, text=True):
+        args = list(cmd[1:])
+        schedd = None
+        if args[0] == "-name":
+            schedd, args = args[1], args[2:]
+        self.act({"condor_release": "release", "condor_rm": "remove"}[cmd[0]], schedd, args)
+        return subprocess.CompletedProcess(cmd, 0, "", "")
+
+def fake_pool():
+    return FakePool({
+        None: [ad(100, 0, 1), ad(100, 1, 2), ad(100, 2, 6), ad(101, 0, 5, code=13, subcode=2, num_holds=1,
+               reason="Transfer input files failure at execution point slot1@node"), ad(500, 0, 2, owner="other")],
+        "schedd2": [ad(200, 0, 2), ad(200, 1, 5, code=34, num_holds=2, reason="Error from slot1: memory usage exceeded"),
+                    ad(201, 0, 4)],
+    })
+
+@pytest.fixture
+def backends(monkeypatch):
+    """(pool, CLI backend, bindings backend) over the same fake pool."""
+    monkeypatch.setenv("USER", "me")
+    pool = fake_pool()
+    monkeypatch.setattr(monitor_module.subprocess, "check_output", pool.check_output)
+    monkeypatch.setattr(monitor_module.subprocess, "run", pool.run)
+    return pool, CondorQBackend(), HTCondorBindingsBackend(htcondor_module=pool.htcondor_module())
+
+def test_backends_agree(backends):
+    pool, cli, bindings = backends
+    queries = [(None, None), (None, ["100"]), (None, ["100", "101", "999"]), ("schedd2", ["200", "201"]), ("schedd2", None)]
+    for schedd, cluster_ids in queries:
+        assert cli.query_status(schedd, cluster_ids) == bindings.query_status(schedd, cluster_ids)
+        assert cli.held_jobs(schedd, cluster_ids) == bindings.held_jobs(schedd, cluster_ids)
+    assert bindings.query_status(None, None) == {"100": {"idle": 1, "running": 1, "transferring_output": 1}, "101": {"held": 1}}
+    assert bindings.held_jobs("schedd2", ["200"]) == [{"job_id": "200.1", "code": 34, "subcode": None, "num_holds": 2,
+                                                        "reason": "Error from slot1: memory usage exceeded"}]
+    assert cli.total_user_jobs() == bindings.total_user_jobs() == 4
+
+    # Same answers through the monitor, whichever backend it uses
+    clusters = [("100", None), ("101", None), ("200", "schedd2"), ("201", "schedd2")]
+    results = []
+    for backend in (cli, bindings):
+        monitor = CondorJobCountMonitor(threshold=1, backend=backend)
+        results.append((monitor.status_histograms(clusters), monitor.held_jobs(clusters)))
+    assert results[0] == results[1]
+
+def test_backends_act(backends):
+    pool, cli, bindings = backends
+    assert cli.act("release", None, ["101.0"])
+    assert bindings.act("remove", "schedd2", ["200.1"])
+    assert pool.actions == [("release", None, ["101.0"]), ("remove", "schedd2", ["200.1"])]
+    assert cli.held_jobs(None, None) == bindings.held_jobs("schedd2", None) == []
+
+def test_bindings_query_without_xquery(backends):
+    pool, cli, _ = backends
+    bindings = HTCondorBindingsBackend(htcondor_module=pool.htcondor_module(xquery=False))
+    assert bindings.query_status("schedd2", None) == cli.query_status("schedd2", None)
+
+def test_bindings_drop_failed_schedd_handle(backends):
+    pool, _, bindings = backends
+    assert bindings.query_status("schedd2", ["200"]) == {"200": {"running": 1, "held": 1}}
+    assert bindings.query_status("schedd2", ["200"]) is not None
+    assert pool.located == ["schedd2"]          # the handle is kept between polls
+
+    pool.down["schedd2"] = 1
+    assert bindings.query_status("schedd2", ["200"]) is None
+    assert "schedd2" not in bindings._schedds
+    assert bindings.query_status("schedd2", ["200"]) == {"200": {"running": 1, "held": 1}}
+    assert pool.located == ["schedd2", "schedd2"]   # located again after the failure
+
+    pool.down["schedd2"] = 1
+    assert bindings.held_jobs("schedd2", None) is None and "schedd2" not in bindings._schedds
+    pool.down[None] = 1
+    assert not bindings.act("release", None, ["101.0"]) and None not in bindings._schedds
+
+def test_cli_retries_unreachable_schedd(backends, monkeypatch):
+    pool, cli, _ = backends
+    sleeps = []
+    monkeypatch.setattr(monitor_module.time, "sleep", sleeps.append)
+    pool.down["schedd2"] = 1
+    assert cli.query_status("schedd2", ["200"]) == {"200": {"running": 1, "held": 1}}
+    pool.down["schedd2"] = 5
+    assert cli.query_status("schedd2", ["200"]) is None
+    assert sleeps == [2, 2, 4, 6, 8, 10]
+
+def test_make_backend(monkeypatch):
+    pool = fake_pool()
+    monkeypatch.setattr(monitor_module, "htcondor", None)
+    assert isinstance(monitor_module.make_backend("auto"), CondorQBackend)
+    assert isinstance(monitor_module.make_backend("cli"), CondorQBackend)
+    with pytest.raises(ImportError):
+        monitor_module.make_backend("bindings")
+    with pytest.raises(ValueError):
+        monitor_module.make_backend("condor_status")
+
+    monkeypatch.setattr(monitor_module, "htcondor", pool.htcondor_module())
+    assert isinstance(monitor_module.make_backend("auto"), HTCondorBindingsBackend)
+    assert CondorJobCountMonitor(threshold=1).backend.name == "bindings"
+
+    # Bindings that import but cannot be used
+    def broken(verbose=False):
+        raise RuntimeError("no condor configuration")
+    monkeypatch.setattr(monitor_module, "HTCondorBindingsBackend", broken)
+    assert isinstance(monitor_module.make_backend("auto", verbose=True), CondorQBackend)
+
+# ---------------------------
+# PollSchedule and the wait loops
+# ---------------------------
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def run_schedule(schedule, clock, counts, target=0):
+    """Delays of schedule for counts seen one query apart, the clock moving by each delay."""
+    delays = []
+    for count in counts:
+        delays.append(schedule.next_delay(count, target))
+        clock.now += delays[-1]
+    return delays
+
+def test_poll_schedule_backs_off_while_static():
+    clock = FakeClock()
+    schedule = PollSchedule(5.0, 60.0, factor=2.0, jitter=0.0, clock=clock)
+    assert run_schedule(schedule, clock, [100] * 6 + [None, None]) == [5.0, 10.0, 20.0, 40.0, 60.0, 60.0, 60.0, 60.0]
+
+def test_poll_schedule_resets_on_movement():
+    clock = FakeClock()
+    schedule = PollSchedule(5.0, 60.0, factor=2.0, jitter=0.0, clock=clock)
+    # More jobs (new submissions): back to min_interval, then back off again
+    assert run_schedule(schedule, clock, [100, 100, 100, 120, 120, None, 120]) == [5.0, 10.0, 20.0, 5.0, 10.0, 20.0, 40.0]
+
+def test_poll_schedule_follows_eta():
+    clock = FakeClock()
+    schedule = PollSchedule(5.0, 300.0, jitter=0.0, eta_fraction=0.5, clock=clock)
+    start = clock.now
+    delays, counts = [], []
+    count = 2000
+    while count > 0:
+        counts.append(count)
+        delays.append(schedule.next_delay(count, 0))
+        clock.now += delays[-1]
+        count = max(0, int(2000 - 2 * (clock.now - start)))     # 2 jobs/s
+    # Far from the end: capped at max_interval; then half the time left, down to min_interval
+    assert delays[1] == 300.0
+    for count, delay in zip(counts[2:], delays[2:]):
+        assert delay == pytest.approx(min(300.0, max(5.0, count / 2.0 * 0.5)), rel=0.01)
+    assert delays[1:] == sorted(delays[1:], reverse=True)
+    assert delays[-1] == 5.0
+
+def test_poll_schedule_static_count_while_draining():
+    clock = FakeClock()
+    schedule = PollSchedule(5.0, 300.0, factor=2.0, jitter=0.0, clock=clock)
+    delays = run_schedule(schedule, clock, [100, 90, 90, 90], target=0)
+    # 10 jobs in 5 s: half of the 45 s left; then backing off again while the measured rate falls
+    assert delays == [5.0, 22.5, 45.0, 90.0]
+
+    # Close to the end the back-off is capped by the time left
+    clock = FakeClock()
+    schedule = PollSchedule(5.0, 300.0, factor=4.0, jitter=0.0, clock=clock)
+    assert run_schedule(schedule, clock, [100, 20, 20, 20], target=0) == [5.0, 5.0, 5.0, 5.0]
+
+def test_poll_schedule_jitter():
+    clock = FakeClock()
+    delays = run_schedule(PollSchedule(5.0, 60.0, factor=2.0, jitter=0.2, clock=clock, rng=random.Random(7)), clock, [100] * 50)
+    again = run_schedule(PollSchedule(5.0, 60.0, factor=2.0, jitter=0.2, clock=clock, rng=random.Random(7)), clock, [100] * 50)
+    base = [5.0, 10.0, 20.0, 40.0] + [60.0] * 46
+    assert delays == again
+    assert all(0.8 * b <= d <= 1.2 * b for d, b in zip(delays, base))
+    assert len(set(delays[4:])) > 1
+
+@pytest.fixture
+def no_jitter(monkeypatch):
+    monkeypatch.setattr(monitor_module, "PollSchedule", functools.partial(PollSchedule, jitter=0.0))
+
+def scripted_monitor(steps, **kw):
+    """Monitor over a ScriptedBackend; every sleep is recorded, moves the clock and advances the queue."""
+    backend = ScriptedBackend(steps)
+    monitor = CondorJobCountMonitor(backend=backend, min_interval=5.0, max_interval=60.0, **kw)
+    clock = FakeClock()
+    monitor.clock = clock
+    monitor.delays = []
+
+    def sleep(delay):
+        monitor.delays.append(delay)
+        clock.now += delay
+        backend.advance()
+    monitor.sleep = sleep
+    return monitor, backend
+
+def test_wait_until_jobs_below_backoff(no_jitter):
+    steps = [{"s1": {"100": {"idle": 30, "running": 20}}}] * 3 + [{"s1": {"100": {"idle": 40, "running": 20}}}] * 2
+    steps.append({"s1": {"100": {"running": 5}}})
+    monitor, backend = scripted_monitor(steps, threshold=10)
+    assert monitor.wait_until_jobs_below(clusters=[("100", "s1")]) == 5
+    assert monitor.delays == [5.0, 7.5, 11.25, 5.0, 7.5]
+    assert len(backend.queries) == 6
+
+def test_wait_until_jobs_below_global_failed_queries(no_jitter):
+    steps = [{None: {"100": {"running": 50}}}, {}, {}, {None: {"100": {"running": 50}}}, {None: {}}]
+    monitor, backend = scripted_monitor(steps, threshold=1)
+    assert monitor.wait_until_jobs_below() == 0
+    # A failed query counts as no movement: the delay keeps growing
+    assert monitor.delays == [5.0, 7.5, 11.25, 16.875]
+
+def test_wait_until_jobs_below_cluster_left(no_jitter):
+    steps = [{"s1": {"100": {"running": 2}, "101": {"idle": 3}}}, {"s1": {"101": {"idle": 3}}}, {"s1": {}}]
+    monitor, backend = scripted_monitor(steps, threshold=1)
+    assert monitor.wait_until_jobs_below(clusters=[("100", "s1"), ("101", "s1")]) == 0
+    # Clusters that left the queue are not queried again
+    assert [ids for _, _, ids in backend.queries] == [["100", "101"], ["100", "101"], ["101"]]
+
+def test_wait_until_no_idle_jobs(no_jitter):
+    steps = [{"s1": {"100": {"idle": 8, "running": 2}, "101": {"idle": 1}}}] * 3
+    steps += [{"s1": {"100": {"idle": 4, "running": 6}, "101": {"running": 1}}}, {"s1": {"100": {"running": 10}, "101": {"running": 1}}}]
+    monitor, backend = scripted_monitor(steps, threshold=1)
+    monitor.wait_until_no_idle_jobs(clusters=[("100", "s1"), ("101", "s1")])
+    assert len(monitor.delays) == 4
+    assert monitor.delays[:3] == [5.0, 7.5, 11.25]
+    assert backend.queries[-1] == (4, "s1", ["100"])
+
+    monitor, backend = scripted_monitor([{None: {"100": {"idle": 3}}}] * 2 + [{None: {"100": {"running": 3}}}], threshold=1)
+    monitor.wait_until_no_idle_jobs()
+    assert monitor.delays == [5.0, 7.5]
+
+def test_wait_on_logs_never_queries_the_schedd(tmp_path, no_jitter):
+    log_dir = tmp_path / "log" / "SMS-A"
+    log_dir.mkdir(parents=True)
+    for proc in range(3):
+        write_log(log_dir, event(SUBMIT, proc=proc), name=f"SMS-A_{proc}.log")
+    monitor, backend = scripted_monitor([{}], threshold=1, log_interval=1.0)
+    terminated = [(proc, event(TERMINATED, proc=proc, how="(1) Normal termination (return value 0)")) for proc in range(3)]
+    appended = iter([[(0, event(EXECUTE, proc=0))], [(1, event(EXECUTE, proc=1))], [(2, event(EXECUTE, proc=2))], terminated])
+
+    def sleep(delay):
+        monitor.delays.append(delay)
+        monitor.clock.now += delay
+        for proc, text in next(appended):
+            write_log(log_dir, text, name=f"SMS-A_{proc}.log", mode="a")
+    monitor.sleep = sleep
+
+    # Idle until the third execute event, in flight until the terminate events
+    monitor.wait_until_no_idle_jobs(logs=[str(tmp_path / "log")])
+    assert monitor.delays == [1.0, 1.0, 1.0]
+    assert monitor.wait_until_jobs_below(logs=[str(tmp_path / "log")], clusters=[("1234", None)]) is None
+    assert len(monitor.delays) == 4
+    assert backend.queries == []
+
+# ---------------------------
+# JobTelemetry
+# ---------------------------
+def zeros(**counts):
+    return dict(dict.fromkeys(("idle", "running", "held", "completed", "other"), 0), **counts)
+
+def test_telemetry_record_changes_only():
+    telemetry = JobTelemetry()
+    rows = telemetry.record({("100", "s1"): {"idle": 10}, ("200", None): {"running": 5, "transferring_output": 1, "suspended": 2}}, now=0.0)
+    assert sorted((row["cluster"], row["schedd"]) for row in rows) == [("100", "s1"), ("200", "")]
+    assert telemetry.counts[("200", None)] == zeros(running=6, other=2)
+    assert telemetry.record({("100", "s1"): {"idle": 10}, ("200", None): {"running": 6, "suspended": 2}}, now=60.0) == []
+
+    # An unreachable schedd keeps the last counts
+    rows = telemetry.record({("100", "s1"): {"idle": 4, "running": 6}, ("200", None): None}, now=120.0)
+    assert rows == [dict({"time": 120.0, "cluster": "100", "schedd": "s1"}, **zeros(idle=4, running=6))]
+    assert telemetry.counts[("200", None)] == zeros(running=6, other=2)
+    assert telemetry.last_change == {("100", "s1"): 120.0, ("200", None): 0.0}
+
+    # Without complete=True a missing cluster is not taken as gone; with it, it gets a row of zeros
+    assert telemetry.record({("100", "s1"): {"idle": 4, "running": 6}}, now=180.0) == []
+    rows = telemetry.record({("100", "s1"): {"idle": 4, "running": 6}}, complete=True, now=240.0)
+    assert rows == [dict({"time": 240.0, "cluster": "200", "schedd": ""}, **zeros())]
+    assert telemetry.queued() == 10 and telemetry.queued(("idle",)) == 4
+
+def test_telemetry_done_and_throughput():
+    telemetry = JobTelemetry(window_s=300.0)
+    assert telemetry.throughput() is None and telemetry.progress(10) == ""
+    telemetry.record({("100", None): {"idle": 10}, ("200", None): {"running": 4}}, now=0.0)
+    telemetry.record({("100", None): {"idle": 4, "running": 3, "completed": 1}, ("200", None): {"running": 4}}, now=60.0)
+    # done = peak - in the queue + completed: 10 - 8 + 1 for cluster 100, 0 for cluster 200
+    assert telemetry.samples[-1] == (60.0, 3)
+    assert telemetry.throughput() == pytest.approx(3.0)
+    assert telemetry.eta(9) == pytest.approx(180.0) and telemetry.eta(0) == 0.0
+    assert telemetry.progress(9) == ", 3.0 jobs/min, ETA 3m00s"
+
+    telemetry.record({("100", None): {"running": 2}, ("200", None): {}}, now=120.0)
+    assert telemetry.samples[-1] == (120.0, 12)
+    assert telemetry.throughput() == pytest.approx(6.0)
+
+    # Nothing moves for longer than the window: throughput drops to zero, no ETA
+    for now in range(180, 1200, 60):
+        telemetry.record({("100", None): {"running": 2}, ("200", None): {}}, now=float(now))
+    assert telemetry.samples[0][0] <= 1140.0 - 300.0 < telemetry.samples[1][0]
+    assert telemetry.throughput() == 0.0 and telemetry.eta(2) is None
+    assert telemetry.progress(2) == ", 0.0 jobs/min, no progress"
+
+    # One sample at or before the start of the window is kept
+    telemetry.record({("100", None): {}, ("200", None): {}}, now=1200.0)
+    assert telemetry.samples[0][0] <= 900.0 and telemetry.throughput() == pytest.approx(2 * 60.0 / (1200.0 - telemetry.samples[0][0]))
+
+@pytest.mark.parametrize("name", ["telemetry.csv", "telemetry.jsonl"])
+def test_telemetry_replay(tmp_path, name):
+    path = os.path.join(str(tmp_path), "condor", name)
+    telemetry = JobTelemetry(path, window_s=600.0)
+    steps = [
+        {("100", "s1"): {"idle": 10}, ("200", None): {"idle": 5}},
+        {("100", "s1"): {"idle": 5, "running": 5}, ("200", None): {"running": 5}},
+        {("100", "s1"): {"running": 3, "held": 1}, ("200", None): None},
+        {("100", "s1"): {"running": 1}, ("200", None): {"completed": 2}},
+    ]
+    for i, histograms in enumerate(steps):
+        telemetry.record(histograms, now=100.0 + 30.5 * i)
+    telemetry.record({("100", "s1"): {"running": 1}}, complete=True, now=300.0)
+
+    replayed = JobTelemetry.replay(path, window_s=600.0)
+    assert replayed.counts == telemetry.counts
+    assert replayed.peak == telemetry.peak == {("100", "s1"): 10, ("200", None): 5}
+    assert replayed.last_change == telemetry.last_change
+    assert list(replayed.samples) == list(telemetry.samples)
+    assert replayed.throughput() == pytest.approx(telemetry.throughput())
+
+    # Further samples go to the same file
+    replayed.record({("100", "s1"): {}}, now=330.0)
+    assert JobTelemetry.replay(path).counts[("100", "s1")] == zeros()
+    if name.endswith(".csv"):
+        with open(path) as f:
+            assert f.readline().strip() == ",".join(JobTelemetry.COLUMNS)
+    assert JobTelemetry.replay(os.path.join(str(tmp_path), "missing.csv")).counts == {}
+
+def test_monitor_records_telemetry(tmp_path, no_jitter):
+    path = os.path.join(str(tmp_path), "telemetry.jsonl")
+    steps = [{"s1": {"100": {"idle": 6}}}, {"s1": {"100": {"idle": 2, "running": 4}}}, {"s1": {"100": {"running": 1}}}]
+    monitor, _ = scripted_monitor(steps, threshold=2, telemetry=path)
+    assert monitor.wait_until_jobs_below(clusters=[("100", "s1")]) == 1
+    with open(path) as f:
+        rows = [json.loads(line) for line in f]
+    assert [(row["idle"], row["running"]) for row in rows] == [(6, 0), (2, 4), (0, 1)]
@@ -1,6 +1,7 @@
-import os, time, argparse, json
+import os, argparse, json, queue, threading, textwrap
+import concurrent.futures
 from tqdm import tqdm
-from bs4 import BeautifulSoup
+from html.parser import HTMLParser
 from getpass import getpass
 from datetime import datetime
 from selenium import webdriver
@@ -10,9 +11,31 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from json_updater import JSONUpdater
+from xsdb_api_client import XSDBAPIClient, XSDB_API_URL
+from xsection_store import XSectionStore
+from eos_sync import EOSSync, EOS_XSECTION_DIR
 
 current_time = datetime.now().strftime("%Y-%m-%d_%H-%M")
+failed_file_lock = threading.Lock()
+
+XSDB_URL = 'https://xsecdb-xsdb-official.app.cern.ch/xsdb/'
+# CHANGE ChromeDriver to YOUR_PATH
+CHROMEDRIVER_PATH = '/ospool/cms-user/zflowers/public/chromedriver-linux64/chromedriver'
+
+XSDB_COLUMNS = [
+    'process_name', 'cross_section', 'total_uncertainty', 'other_uncertainty',
+    'accuracy', 'DAS', 'energy', 'createdBy', 'status', 'MCM',
+    'equivalent_lumi', 'fraction_negative_weight', 'reweighting', 'kFactor',
+    'shower', 'matrix_generator', 'isValid', 'comments', 'refs',
+    'discussion', 'modifiedOn', 'createdOn', 'modifiedBy', 'approvedBy',
+    'contact', 'cuts'
+]
+
+WANTED = {'process_name', 'cross_section', 'total_uncertainty',
+          'other_uncertainty', 'accuracy', 'DAS', 'MCM', 'kFactor', 'energy',
+          'modifiedOn'}
 
 def get_chrome_options():
     # Set up Chrome options
@@ -81,9 +104,133 @@ def is_float(value):
     except (ValueError, TypeError):
         return False
 
+# Text XSDB's result table shows instead of rows when a search found nothing
+NO_RESULTS_TEXTS = ("No data available", "No matching records found", "There are no records to show")
+
+# Returns the cell texts of every row of the first tbody mentioning arguments[0]; [] if there is
+# none but the page shows one of the no-results texts in arguments[1]; null otherwise.
+# Cell text is the concatenation of its stripped text nodes (same as get_text(strip=True)).
+EXTRACT_ROWS_JS = """
+const name = arguments[0];
+const cellText = (td) => {
+    const walker = document.createTreeWalker(td, NodeFilter.SHOW_TEXT);
+    let text = '';
+    while (walker.nextNode()) text += walker.currentNode.nodeValue.trim();
+    return text;
+};
+for (const tbody of document.querySelectorAll('tbody')) {
+    if (!tbody.textContent.includes(name)) continue;
+    return Array.from(tbody.children)
+        .filter((tr) => tr.tagName === 'TR')
+        .map((tr) => Array.from(tr.querySelectorAll('td')).map(cellText));
+}
+const shown = document.body.innerText;
+return arguments[1].some((text) => shown.includes(text)) ? [] : null;
+"""
+
+class ResultRowParser(HTMLParser):
+    """
+    Fallback for EXTRACT_ROWS_JS working on driver.page_source: collects the cells of the
+    direct rows of a tbody. Stops at the first row whose process_name is match, or with prefix
+    at the end of the first tbody mentioning match (a whole process family).
+    """
+    def __init__(self, match, prefix=False):
+        super().__init__()
+        self.match = match
+        self.prefix = prefix
+        self.rows = None
+        self.done = False
+        self._depth = 0
+        self._rows = []
+        self._text = []
+        self._row = None
+        self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == 'tbody':
+            if self._depth == 0:
+                self._rows, self._text = [], []
+            self._depth += 1
+        elif self._depth == 1 and tag == 'tr' and self._row is None:
+            self._row = []
+        elif self._row is not None and tag == 'td' and self._cell is None:
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        if self.done:
+            return
+        if tag == 'td' and self._cell is not None:
+            self._row.append(''.join(self._cell))
+            self._cell = None
+        elif tag == 'tr' and self._row is not None and self._depth == 1:
+            if not self.prefix and self._row and self._row[0] == self.match:
+                self.rows = [self._row]
+                self.done = True
+            self._rows.append(self._row)
+            self._row = None
+        elif tag == 'tbody' and self._depth:
+            self._depth -= 1
+            if self.prefix and self._depth == 0 and self.match in ''.join(self._text):
+                self.rows = self._rows
+                self.done = True
+
+    def handle_data(self, data):
+        if self.done:
+            return
+        if self._depth:
+            self._text.append(data)
+        if self._cell is not None:
+            self._cell.append(data.strip())
+
+def _open_tag_before(page_source, idx, tag):
+    """Offset of the <tag> enclosing position idx of page_source, -1 if idx is not inside one."""
+    start = page_source.rfind('<' + tag, 0, idx)
+    while start != -1 and page_source[start + len(tag) + 1:start + len(tag) + 2] not in ('>', ' ', '\t', '\r', '\n'):
+        start = page_source.rfind('<' + tag, 0, start)
+    if start == -1 or start < page_source.rfind('</' + tag + '>', 0, idx):
+        return -1
+    return start
+
+def parse_result_rows(page_source, match, prefix=False):
+    """
+    The row whose process_name is match, as [cells], or with prefix the rows of the first tbody
+    mentioning match; None if there is none. Only the slice of page_source around an occurrence
+    of match is parsed: the enclosing row (the rest of a large result table is skipped), or
+    with prefix the enclosing tbody.
+    """
+    tag, close = ('tbody', '</tbody>') if prefix else ('tr', '</tr>')
+    idx = page_source.find(match)
+    while idx != -1:
+        start = _open_tag_before(page_source, idx, tag)
+        if start != -1 and _open_tag_before(page_source, idx, 'tbody') != -1:
+            end = page_source.find(close, idx)
+            end = len(page_source) if end == -1 else end + len(close)
+            parser = ResultRowParser(match, prefix)
+            parser.feed(page_source[start:end] if prefix else '<tbody>' + page_source[start:end] + '</tbody>')
+            parser.close()
+            if parser.done:
+                return parser.rows
+        idx = page_source.find(match, idx + len(match))
+    return None
+
+def rows_to_info(rows):
+    dataset_info = []
+    for cells in rows or []:
+        if len(cells) < len(XSDB_COLUMNS):
+            continue
+        row_dict = {
+            col: cells[i]
+            for i, col in enumerate(XSDB_COLUMNS)
+            if col in WANTED
+        }
+        if row_dict:
+            dataset_info.append(row_dict)
+    return dataset_info
+
 def set_search_field(driver, search_field, search_string):
     search_field.clear()
-    time.sleep(0.1)
 
     driver.execute_script(
         "arguments[0].value = arguments[1];",
@@ -101,15 +248,35 @@ def set_search_field(driver, search_field, search_string):
     search_field.send_keys(Keys.SPACE)
     search_field.send_keys(Keys.BACKSPACE)
 
-    # Debug: see what the field actually contains
-    actual = driver.execute_script("return arguments[0].value;", search_field)
-    time.sleep(0.2)
+    # Wait until the field actually holds the search string
+    WebDriverWait(driver, 5, poll_frequency=0.05).until(
+        lambda d: d.execute_script("return arguments[0].value;", search_field) == search_string
+    )
 
-def get_XSDB_Info(dataset_name="", search_field=None, driver=None, repeat=0, max_repeat=3):
-    if max_repeat < 0: max_repeat = 0
-    # Type dataset_name into search_field
-    dataset_name = dataset_name.replace('\n', '').replace('\r', '').strip()
-    search_string = "process_name="+dataset_name
+def wait_for_result_rows(driver, match, process_name=None, timeout=2, prefix=False):
+    """
+    Wait until the result table has a row for process_name (default: match) and return that row
+    as [cells], or with prefix wait for a row whose process_name starts with it and return the rows
+    of its tbody. Returns [] as soon as XSDB shows that nothing was found, None on timeout.
+    """
+    process_name = process_name or match
+    def rows_ready(d):
+        rows = d.execute_script(EXTRACT_ROWS_JS, match, list(NO_RESULTS_TEXTS))
+        if rows is None:
+            return False
+        if not rows:
+            # Wrapped, WebDriverWait only returns truthy values
+            return ([],)
+        matching = [cells for cells in rows if cells and (cells[0].startswith(process_name) if prefix else cells[0] == process_name)]
+        if not matching:
+            return False
+        return (rows if prefix else matching[:1],)
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=0.05).until(rows_ready)[0]
+    except TimeoutException:
+        return None
+
+def search_XSDB(driver, search_field, search_string):
     set_search_field(driver, search_field, search_string)    
     search_button = WebDriverWait(driver, 10).until(
         EC.element_to_be_clickable(
@@ -118,59 +285,31 @@ def get_XSDB_Info(dataset_name="", search_field=None, driver=None, repeat=0, max
     )
     search_button.click()
 
-    # Wait for page to load after searching for dataset
-    time.sleep(0.5+repeat/max(1,max_repeat))
-    
-    # Scrape the page for info
-    page_source = driver.page_source
-    # Use BeautifulSoup to parse the page
-    soup = BeautifulSoup(page_source, 'html.parser')
-    
-    tbodies = soup.find_all("tbody")
-    selected_tbody = None
-    for tbody in tbodies:
-        if dataset_name in str(tbody.text):
-            selected_tbody = tbody
-            break
+def is_valid_info(dataset_name, dataset_info):
+    return bool(
+        dataset_info
+        and dataset_info[0]['process_name'] == dataset_name
+        and is_float(dataset_info[0]['cross_section'])
+        and is_float(dataset_info[0]['total_uncertainty'])
+    )
 
-    dataset_info = []
+def get_XSDB_Info(dataset_name="", search_field=None, driver=None, repeat=0, max_repeat=3):
+    if max_repeat < 0: max_repeat = 0
+    # Type dataset_name into search_field
+    dataset_name = dataset_name.replace('\n', '').replace('\r', '').strip()
+    search_XSDB(driver, search_field, "process_name="+dataset_name)
 
-    XSDB_COLUMNS = [
-        'process_name', 'cross_section', 'total_uncertainty', 'other_uncertainty',
-        'accuracy', 'DAS', 'energy', 'createdBy', 'status', 'MCM',
-        'equivalent_lumi', 'fraction_negative_weight', 'reweighting', 'kFactor',
-        'shower', 'matrix_generator', 'isValid', 'comments', 'refs',
-        'discussion', 'modifiedOn', 'createdOn', 'modifiedBy', 'approvedBy',
-        'contact', 'cuts'
-    ]
-    
-    WANTED = {'process_name', 'cross_section', 'total_uncertainty',
-              'other_uncertainty', 'accuracy', 'DAS', 'MCM', 'kFactor', 'energy'}
-    
-    if selected_tbody:
-        rows = selected_tbody.find_all("tr", recursive=False)
-        for row in rows:
-            cells = row.find_all('td')
-            if len(cells) < len(XSDB_COLUMNS):
-                continue
-            row_dict = {
-                col: cells[i].get_text(strip=True)
-                for i, col in enumerate(XSDB_COLUMNS)
-                if col in WANTED
-            }
-            if row_dict:
-                dataset_info.append(row_dict)
+    # Wait for the result row in the DOM and pull the cells in one script call,
+    # falling back to parsing the row out of the page source. A search XSDB answered with
+    # "no results" returns at once, a retry searches again.
+    rows = wait_for_result_rows(driver, dataset_name, timeout=1+repeat)
+    if rows is None:
+        rows = parse_result_rows(driver.page_source, dataset_name)
+
+    dataset_info = rows_to_info(rows)
     
     # Retry if nothing valid was found
-    if (
-        repeat < max_repeat
-        and (
-            not dataset_info
-            or dataset_info[0]['process_name'] != dataset_name
-            or not is_float(dataset_info[0]['cross_section'])
-            or not is_float(dataset_info[0]['total_uncertainty'])
-        )
-    ):
+    if repeat < max_repeat and not is_valid_info(dataset_name, dataset_info):
         return get_XSDB_Info(
             dataset_name,
             search_field,
@@ -180,22 +319,113 @@ def get_XSDB_Info(dataset_name="", search_field=None, driver=None, repeat=0, max
         )
     
     if not dataset_info:
-        with open(f"failed_XSDB_datasets_{current_time}.txt", 'a') as f:
-            f.write(f"{dataset_name}\n")
+        record_failed_dataset(dataset_name)
     
     return dataset_info    
 
-def user_setup():
+def get_XSDB_Info_prefix(prefix, search_field, driver, timeout=3):
+    """Rows of every process whose name contains prefix (one search for a whole process family)."""
+    search_XSDB(driver, search_field, "process_name="+prefix)
+    rows = wait_for_result_rows(driver, prefix, timeout=timeout, prefix=True)
+    if rows is None:
+        rows = parse_result_rows(driver.page_source, prefix, prefix=True)
+    return rows_to_info(rows)
+
+def group_by_prefix(dataset_names, max_group=20, min_prefix=6):
+    """
+    Group dataset names into process families (e.g. QCD_HT*, WJetsToLNu_HT-*) sharing a common
+    prefix of at least min_prefix characters, at most max_group names each.
+    Returns [(prefix, [names])]; names without a family get prefix None.
+    """
+    groups = []
+    current = []
+    for name in sorted(set(dataset_names)):
+        candidate = current + [name]
+        if current and (len(candidate) > max_group or len(os.path.commonprefix(candidate)) < min_prefix):
+            groups.append(current)
+            current = [name]
+        else:
+            current = candidate
+    if current:
+        groups.append(current)
+    return [(os.path.commonprefix(names) if len(names) > 1 else None, names) for names in groups]
+
+def lookup_group(prefix, names, search_prefix, lookup_exact):
+    """
+    Yield (name, rows) for a family of datasets: one search_prefix(prefix) call whose rows are
+    demultiplexed by process_name, falling back to lookup_exact(name) for names it did not cover.
+    """
+    found = {}
+    if prefix:
+        for row in search_prefix(prefix):
+            found.setdefault(row['process_name'], []).append(row)
+    for name in names:
+        info = found.get(name, [])
+        if not is_valid_info(name, info):
+            info = lookup_exact(name)
+        yield name, info
+
+def make_groups(dataset_names, batch_size):
+    # Without batching every dataset is its own group and gets an exact search
+    if batch_size > 1:
+        return group_by_prefix(dataset_names, max_group=batch_size)
+    return [(None, [name]) for name in dataset_names]
+
+def record_failed_dataset(dataset_name):
+    with failed_file_lock:
+        with open(f"failed_XSDB_datasets_{current_time}.txt", 'a') as f:
+            f.write(f"{dataset_name}\n")
+
+def get_XSDB_Info_API(dataset_names, driver, on_result, url=XSDB_API_URL, max_workers=16, batch_size=1):
+    # Reuse the logged-in browser session for direct HTTP queries to the XSDB search endpoint
+    client = XSDBAPIClient(driver.get_cookies(), WANTED, url=url, max_workers=max_workers)
+    index = {name: i for i, name in enumerate(dataset_names)}
+    lock = threading.Lock()
+    with tqdm(total=len(dataset_names), desc="Getting XSDB info for datasets", unit="dataset") as pbar:
+        def callback(i, info):
+            if not info:
+                record_failed_dataset(dataset_names[i])
+            with lock:
+                on_result(i, info)
+                pbar.update(1)
+        if batch_size <= 1:
+            client.get_info_many(dataset_names, callback=callback)
+            return
+        def safe(lookup):
+            # A failing request only costs the datasets it covers, like in get_info_many
+            def wrapped(name):
+                try:
+                    return lookup(name)
+                except PermissionError:
+                    raise
+                except Exception as e:
+                    print(f"[XSDBAPIClient] lookup failed for {name}: {e}", flush=True)
+                    return []
+            return wrapped
+        def run_group(group):
+            prefix, names = group
+            for name, info in lookup_group(prefix, names, safe(client.get_info_matching), safe(client.get_info)):
+                callback(index[name], info)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=client.max_workers) as executor:
+            for future in concurrent.futures.as_completed([executor.submit(run_group, g) for g in make_groups(dataset_names, batch_size)]):
+                try:
+                    future.result()
+                except PermissionError:
+                    # Same as in get_info_many: the queued groups would only be rejected too
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise
+
+def new_driver():
     # Get Chrome Options
     chrome_options = get_chrome_options()
-    # CHANGE ChromeDriver to YOUR_PATH
-    service = Service('/ospool/cms-user/zflowers/public/chromedriver-linux64/chromedriver')
-    
+    service = Service(CHROMEDRIVER_PATH)
     # Initialize WebDriver
-    driver = webdriver.Chrome(service=service, options=chrome_options)
+    return webdriver.Chrome(service=service, options=chrome_options)
+
+def user_setup(url=XSDB_URL):
+    driver = new_driver()
     
     # Open the XSDB page
-    url = 'https://xsecdb-xsdb-official.app.cern.ch/xsdb/'
     driver.get(url)
     CERN_login(driver)
     
@@ -211,7 +441,182 @@ def user_setup():
 
     return driver, search_field
 
+def get_all_cookies(driver):
+    # CDP returns cookies for every domain (XSDB and the CERN SSO), not only the current page
+    return driver.execute_cdp_cmd('Network.getAllCookies', {})['cookies']
+
+def clone_session(cookies, url=XSDB_URL):
+    """
+    Open another browser that is already logged in by copying the cookies of the
+    CERN_login session into it, so no extra 2FA prompt is needed.
+    """
+    driver = new_driver()
+    try:
+        keep = ('name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'sameSite', 'expires')
+        params = []
+        for cookie in cookies:
+            param = {k: v for k, v in cookie.items() if k in keep}
+            if cookie.get('session'):
+                param.pop('expires', None)
+            params.append(param)
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setCookies', {'cookies': params})
+        driver.get(url)
+        WebDriverWait(driver, 30).until(EC.presence_of_element_located((By.ID, "searchField")))
+        return driver, driver.find_element(By.ID, "searchField")
+    except Exception:
+        driver.quit()
+        raise
+
+def scrape_parallel(dataset_names, driver, search_field, on_result, n_workers=4, url=XSDB_URL, max_retries=2, batch_size=1):
+    """
+    Scrape XSDB with a pool of n_workers browsers sharing the cookies of the logged-in driver.
+    Workers pull dataset groups (see make_groups) from a common queue and hand each result to
+    on_result(index, rows). If the wait is interrupted (Ctrl-C) the workers finish the dataset they
+    are on and close their browsers before this returns, so the login driver outlives them.
+    """
+    cookies = get_all_cookies(driver)
+    index = {name: i for i, name in enumerate(dataset_names)}
+    jobs = queue.Queue()
+    for group in make_groups(dataset_names, batch_size):
+        jobs.put(group)
+    pbar = tqdm(total=len(dataset_names), desc="Getting XSDB info for datasets", unit="dataset")
+    pbar_lock = threading.Lock()
+    stop = threading.Event()
+
+    def worker(worker_id):
+        # Worker 0 reuses the logged-in browser, the others get a cloned session
+        if worker_id == 0:
+            wdriver, wfield = driver, search_field
+        else:
+            try:
+                wdriver, wfield = clone_session(cookies, url)
+            except Exception as e:
+                print(f"[worker {worker_id}] could not open a browser session, leaving work to the others: {e}", flush=True)
+                return
+        try:
+            while not stop.is_set():
+                try:
+                    prefix, names = jobs.get_nowait()
+                except queue.Empty:
+                    return
+                remaining = list(names)
+                for attempt in range(max_retries + 1):
+                    try:
+                        for name, info in lookup_group(
+                            prefix, list(remaining),
+                            lambda p: get_XSDB_Info_prefix(p, wfield, wdriver),
+                            lambda n: get_XSDB_Info(n, wfield, wdriver),
+                        ):
+                            with pbar_lock:
+                                on_result(index[name], info)
+                                pbar.update(1)
+                            remaining.remove(name)
+                            if stop.is_set():
+                                return
+                        break
+                    except WebDriverException as e:
+                        if attempt == max_retries:
+                            print(f"[worker {worker_id}] giving up on {len(remaining)} dataset(s) starting with {remaining[0]}: {e.msg}", flush=True)
+                            for name in remaining:
+                                record_failed_dataset(name)
+                                with pbar_lock:
+                                    on_result(index[name], [])
+                                    pbar.update(1)
+                            break
+                        # Reload the page and look the search field up again before retrying
+                        try:
+                            wdriver.get(url)
+                            wfield = WebDriverWait(wdriver, 30).until(EC.presence_of_element_located((By.ID, "searchField")))
+                        except WebDriverException:
+                            pass
+        finally:
+            if wdriver is not driver:
+                wdriver.quit()
+
+    threads = [threading.Thread(target=worker, args=(w,), daemon=True) for w in range(max(1, n_workers))]
+    for t in threads:
+        t.start()
+    try:
+        for t in threads:
+            t.join()
+    finally:
+        # Also on Ctrl-C: no browser may be quit while a worker still drives it
+        stop.set()
+        for t in threads:
+            t.join()
+        pbar.close()
+
+class ScrapeCheckpoint:
+    """
+    Append-only JSONL record of finished datasets ({"process_name": ..., "rows": [...]} per line),
+    flushed as each dataset finishes so an interrupted scrape can be resumed. Only datasets with
+    rows count as done: a lookup that failed or timed out is looked up again on --resume.
+    """
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.lock = threading.Lock()
+        if not resume and os.path.exists(path):
+            os.remove(path)
+        if os.path.exists(path):
+            # Drop a partially written last line left by a crash
+            with open(path, 'rb+') as f:
+                data = f.read()
+                f.truncate(data.rfind(b'\n') + 1)
+        self.done = {name for name, (_, has_rows) in self._index().items() if has_rows}
+        self.file = open(path, 'a')
+
+    def _index(self):
+        """Map process_name -> (byte offset, has rows) of its latest line, skipping a truncated last line."""
+        index = {}
+        if not os.path.exists(self.path):
+            return index
+        with open(self.path, 'rb') as f:
+            offset = 0
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    index[entry['process_name']] = (offset, bool(entry.get('rows')))
+                except (ValueError, KeyError):
+                    pass
+                offset += len(line)
+        return index
+
+    def write(self, process_name, rows):
+        with self.lock:
+            self.file.write(json.dumps({'process_name': process_name, 'rows': rows}, sort_keys=True) + '\n')
+            self.file.flush()
+            if rows:
+                self.done.add(process_name)
+
+    def close(self):
+        self.file.close()
+
+    def iter_rows(self, process_names):
+        """Yield (process_name, rows) in the order of process_names, reading one line at a time."""
+        self.file.flush()
+        index = self._index()
+        with open(self.path, 'rb') as f:
+            for name in process_names:
+                if name not in index:
+                    continue
+                f.seek(index[name][0])
+                yield name, json.loads(f.readline())['rows']
+
+def write_json_stream(path, entries):
+    # Same layout as json.dump(indent=4, sort_keys=True) without holding the list in memory
+    with open(path, 'w') as json_file:
+        json_file.write('[')
+        first = True
+        for entry in entries:
+            json_file.write('\n' if first else ',\n')
+            json_file.write(textwrap.indent(json.dumps(entry, indent=4, sort_keys=True), '    '))
+            first = False
+        json_file.write(']' if first else '\n]')
+
 def update_failed_processes_file(failed_processes_file, info_file):
+    if not os.path.exists(failed_processes_file):
+        return
     # Read the list of process names
     with open(failed_processes_file, 'r') as f:
         processes = [line.strip() for line in f if line.strip()]
@@ -235,31 +640,71 @@ def update_failed_processes_file(failed_processes_file, info_file):
         for proc in filtered_processes:
             f.write(proc + '\n')
 
-def updateJSON(jsonfile, output, failed_list, update_eos):
+def updateJSON(jsonfile, output, failed_list, update_eos, store=None, eos_dir=EOS_XSECTION_DIR):
     updater = JSONUpdater(jsonfile)
-    os.system('xrdcp -sfr root://cmseos.fnal.gov//store/user/z374f439/XSectionJSONs/ ./')
+    # Only fetch JSONs that changed on EOS; XSectionJSONs/ is kept locally between runs
+    sync = EOSSync(eos_dir, 'XSectionJSONs')
+    sync.pull()
     update_files = updater.get_json_files_from_directory('XSectionJSONs/')
     updater.update_with(update_files)
+    updater.report()
     updater.save(output)
+    lookup = output.replace('.json','.sqlite')
+    updater.export_lookup(lookup)
+    if store:
+        # Remember everything we now know locally so the next run can skip it
+        store.seed_from_json([output])
     update_failed_processes_file(failed_list, output)
     print("Failed to find xsections for:")
-    os.system(f'cat {failed_list}')
+    os.system(f'cat {failed_list} 2>/dev/null')
     print("")
-    os.system(f'mv {output} {failed_list} XSectionJSONs/')
+    os.system(f'mv {output} {lookup} {failed_list} XSectionJSONs/')
     os.system(f'rm {jsonfile}')
     if update_eos:
-        os.system('xrdcp -sf XSectionJSONs/* root://cmseos.fnal.gov//store/user/z374f439/XSectionJSONs/')
-        os.system('rm -r XSectionJSONs/')
+        sync.push()
         print('Updated XSectionJSONs in EOS!')
 
-def main(driver, search_field):
-    # Loop over datasets and pull XSDB info
+def parse_args():
     parser = argparse.ArgumentParser(description="List of dataset names to process")
     parser.add_argument("--ifile", dest="dataset_list", default=None, help="Input dataset_list (.txt) containing datasets.")
     parser.add_argument("--idir", dest="dataset_list_folder", default=None, help="Input folder of dataset lists containing datasets.")
     parser.add_argument("-o", "--ofile", dest="json_output", default='info_XSDB.json', help="Output file (.json) with XSDB info.")
     parser.add_argument("-m", dest="manual_json", default='ManualRecords_XSDB.json', help="Input manual json records (for datasets known to be missing in XSDB).")
-    args = parser.parse_args()
+    parser.add_argument("--backend", choices=["html", "api"], default="html", help="Scrape the XSDB web page (html) or query the XSDB search endpoint over HTTP (api). Selenium is used for login either way.")
+    parser.add_argument("--api-url", default=XSDB_API_URL, help="XSDB search endpoint used by --backend api (point at a local stand-in server for testing).")
+    parser.add_argument("--workers", type=int, default=None, help="Number of concurrent XSDB requests for --backend api (default 16) or browser sessions for --backend html (default 1).")
+    parser.add_argument("--xsdb-url", default=XSDB_URL, help="XSDB page to open (point at a local copy of the results page for testing).")
+    parser.add_argument("--store", default='xsection_store.sqlite', help="Local cross-section store; only missing or stale processes are looked up in XSDB.")
+    parser.add_argument("--max-age", type=float, default=90, help="Days after which a stored XSDB record is looked up again.")
+    parser.add_argument("--refresh", action="store_true", help="Ignore the local store and look up every dataset in XSDB.")
+    parser.add_argument("--checkpoint", default=None, help="JSONL file results are appended to as they finish (default: <ofile>_checkpoint.jsonl).")
+    parser.add_argument("--eos-dir", default=EOS_XSECTION_DIR, help="EOS location of XSectionJSONs (a local directory can stand in for testing).")
+    parser.add_argument("--batch", type=int, default=1, help="Look up process families (e.g. QCD_HT*) with one prefix search for up to this many datasets, falling back to exact searches for misses.")
+    parser.add_argument("--resume", action="store_true", help="Resume an interrupted run, skipping datasets already in the checkpoint with results (failed or empty lookups are retried).")
+    return parser.parse_args()
+
+def scrape(dataset_names, args, on_result):
+    """Log in to XSDB and hand each dataset's rows to on_result(index, rows). Returns False if login failed."""
+    driver, search_field = user_setup(args.xsdb_url)
+    if not driver:
+        return False
+    print("Successfully connected to XSDB!")
+    try:
+        if args.backend == "api":
+            get_XSDB_Info_API(dataset_names, driver, on_result, url=args.api_url, max_workers=args.workers or 16, batch_size=args.batch)
+        elif (args.workers and args.workers > 1) or args.batch > 1:
+            scrape_parallel(dataset_names, driver, search_field, on_result, n_workers=args.workers or 1, url=args.xsdb_url, batch_size=args.batch)
+        else:
+            # Loop over dataset names with tqdm for progress bar
+            for i, dataset_name in enumerate(tqdm(dataset_names, desc="Getting XSDB info for datasets", unit="dataset")):
+                on_result(i, get_XSDB_Info(dataset_name, search_field, driver))
+        return True
+    finally:
+        # Close the browser
+        driver.quit()
+
+def main(args):
+    # Loop over datasets and pull XSDB info
     if not args.dataset_list and not args.dataset_list_folder:
         print("Need to supply either input dataset list or folder of dataset lists!")
         return
@@ -281,6 +726,9 @@ def main(driver, search_field):
             with open(file, "r") as f:
                 dataset_names += f.readlines()
 
+    dataset_names = [dataset.replace('\n', '').replace('\r', '').strip() for dataset in dataset_names]
+    dataset_names = [dataset for dataset in dataset_names if dataset]
+
     # Load in data from manually created json (for datasets known to be missing from XSDB)
     dataset_info = []
     if os.path.exists(args.manual_json):
@@ -289,7 +737,7 @@ def main(driver, search_field):
         # Extract dataset names from manual json
         manual_dataset_names = {entry["process_name"] for entry in dataset_info}
         # Remove datasets that were in manual json from list to be used with XSDB
-        dataset_names = [dataset for dataset in dataset_names if dataset.replace('\n', '').replace('\r', '').strip() not in manual_dataset_names]
+        dataset_names = [dataset for dataset in dataset_names if dataset not in manual_dataset_names]
 
     # Sort list of dataset names and preserve order
     if len(dataset_names) > 1:
@@ -298,25 +746,64 @@ def main(driver, search_field):
         print("No dataset names in supplied input!") 
         return
 
-    # Loop over dataset names with tqdm for progress bar
-    for dataset_name in tqdm(dataset_names, desc="Getting XSDB info for datasets", unit="dataset"):
-        dataset_info.extend(get_XSDB_Info(dataset_name, search_field, driver))
+    # Only look up processes that are missing from (or stale in) the local store
+    store = XSectionStore(args.store, max_age_days=args.max_age)
+    store.seed_manual(dataset_info)
+    if os.path.isdir('XSectionJSONs/'):
+        store.seed_from_json(JSONUpdater.get_json_files_from_directory('XSectionJSONs/'))
+    if args.refresh:
+        cached, to_query = {}, dataset_names
+    else:
+        cached, to_query = store.split(dataset_names)
+    print(f"{len(cached)} dataset(s) found in {args.store}, {len(to_query)} to look up in XSDB")
+
+    # Every finished dataset goes to the checkpoint right away, so a crash loses at most one dataset
+    checkpoint_path = args.checkpoint or args.json_output.replace('.json','')+'_checkpoint.jsonl'
+    checkpoint = ScrapeCheckpoint(checkpoint_path, resume=args.resume)
+    if args.resume:
+        print(f"Resuming from {checkpoint_path}: {len(checkpoint.done)} dataset(s) already done")
+    for dataset_name, info in cached.items():
+        if dataset_name not in checkpoint.done:
+            checkpoint.write(dataset_name, info)
+    to_query = [dataset_name for dataset_name in to_query if dataset_name not in checkpoint.done]
+
+    if to_query:
+        try:
+            logged_in = scrape(to_query, args, lambda i, info: checkpoint.write(to_query[i], info))
+        except KeyboardInterrupt:
+            print(f"Interrupted, rerun with --resume to continue from {checkpoint_path}")
+            raise
+        if not logged_in:
+            checkpoint.close()
+            store.close()
+            return
+
+    # Update the store from the checkpoint (also covers datasets done before a --resume)
+    for dataset_name, info in checkpoint.iter_rows([name for name in dataset_names if name not in cached]):
+        store.put(dataset_name, info)
+    store.commit()
+
+    def all_rows():
+        yield from dataset_info
+        looked_up = set(to_query)
+        for dataset_name, info in checkpoint.iter_rows(dataset_names):
+            if not info and dataset_name not in looked_up:
+                # Known miss (from the store or a previous attempt), still report it
+                record_failed_dataset(dataset_name)
+            yield from info
 
     # file name:
     filename = args.json_output.replace('.json','')+"_"+current_time+'.json'
-    # Write output to temp file
-    with open(f'temp_{filename}', 'w') as json_file:
-        json.dump(dataset_info, json_file, indent=4, sort_keys=True)
+    # Write output to temp file, streaming the checkpoint
+    write_json_stream(f'temp_{filename}', all_rows())
+    checkpoint.close()
     print("Finished getting info from XSDB!")
 
     # Read in previous jsons for final catch (also writes output)
-    updateJSON(f'temp_{filename}',filename,f'failed_XSDB_datasets_{current_time}.txt',True)
+    updateJSON(f'temp_{filename}',filename,f'failed_XSDB_datasets_{current_time}.txt',True,store,args.eos_dir)
+    store.close()
+    os.remove(checkpoint_path)
 
 if __name__ == "__main__":
-    driver, search_field = user_setup()
-    if driver:
-        print("Successfully connected to XSDB!")
-        main(driver, search_field)
-        # Close the browser
-        driver.quit()
+    main(parse_args())
 
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Time compare_samples.py on two generated samples/-like trees: the default sorted-line comparison
+against --digest (with -j workers), checking that both report the same files as differing.
+
+python3 bench_compare_samples.py --files 10000 --lines 200 -j 8
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+
+COMPARE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "compare_samples.py")
+
+
+def make_trees(root, n_files, n_lines, changed_fraction, seed=1):
+    # Same lines in shuffled order in both trees; a fraction of the files gets one line changed
+    rng = random.Random(seed)
+    changed = set()
+    for i in range(n_files):
+        relpath = os.path.join(f"Summer23_{i % 20}", f"Dataset_{i}.txt")
+        lines = [f"root://cmsxrootd.fnal.gov//store/mc/Run3/Dataset_{i}/MINIAODSIM/{j:06d}.root\n" for j in range(n_lines)]
+        for tree in ("a", "b"):
+            rng.shuffle(lines)
+            out = list(lines)
+            if tree == "b" and rng.random() < changed_fraction:
+                out[0] = out[0].replace(".root", "_v2.root")
+                changed.add(relpath)
+            path = os.path.join(root, tree, relpath)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.writelines(out)
+    return changed
+
+
+def run(args):
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, COMPARE] + args, capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - start
+    differ = {line.split()[1] for line in proc.stdout.splitlines() if line.startswith("DIFFER:")}
+    return elapsed, differ
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark compare_samples.py sorted vs --digest mode.")
+    ap.add_argument("--files", type=int, default=10000, help="Files per tree.")
+    ap.add_argument("--lines", type=int, default=200, help="Lines per file.")
+    ap.add_argument("--changed", type=float, default=0.01, help="Fraction of files with a changed line.")
+    ap.add_argument("-j", "--workers", type=int, default=os.cpu_count(), help="Workers for --digest.")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        changed = make_trees(root, args.files, args.lines, args.changed)
+        a, b = os.path.join(root, "a"), os.path.join(root, "b")
+        print(f"2 x {args.files} files x {args.lines} lines, {len(changed)} changed, {os.cpu_count()} CPU(s)")
+        t_sorted, differ_sorted = run([a, b])
+        t_digest, differ_digest = run([a, b, "--digest", "-j", str(args.workers)])
+        assert differ_sorted == differ_digest == changed, "modes disagree on the differing files"
+        print(f"  sorted lines:        {t_sorted:6.2f} s")
+        print(f"  --digest -j {args.workers:<3d}:     {t_digest:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
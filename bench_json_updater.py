@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Time JSONUpdater merging many synthetic XSDB json files into a base file, per conflict policy,
+and the time spent only decoding the same files (which bounds what the merge itself can save).
+
+python3 bench_json_updater.py --files 200 --records 5000
+"""
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+
+from json_updater import JSONUpdater, POLICIES
+
+
+def make_files(directory, n_files, n_records, overlap, seed=1):
+    # Every file holds n_records processes; a fraction overlap of them is shared with other files
+    rng = random.Random(seed)
+    shared = max(1, int(n_records * overlap))
+    paths = []
+    for i in range(n_files + 1):
+        rows = []
+        for j in range(n_records):
+            name = f"Shared_{rng.randrange(shared * 4)}" if j < shared else f"Process_{i}_{j}"
+            rows.append({"process_name": name, "cross_section": str(rng.random()), "total_uncertainty": "0.1",
+                         "DAS": f"/{name}/RunIISummer20UL18MiniAODv2/MINIAODSIM", "modifiedOn": f"2024-0{1 + i % 9}-01T00:00:00Z"})
+        path = os.path.join(directory, "base.json" if i == 0 else f"update_{i}.json")
+        with open(path, "w") as f:
+            json.dump(rows, f)
+        paths.append(path)
+    return paths[0], paths[1:]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark JSONUpdater merges.")
+    ap.add_argument("--files", type=int, default=200, help="Update files to merge.")
+    ap.add_argument("--records", type=int, default=5000, help="Records per file.")
+    ap.add_argument("--overlap", type=float, default=0.2, help="Fraction of each file's processes also present in other files.")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        base, updates = make_files(directory, args.files, args.records, args.overlap)
+        start = time.perf_counter()
+        for path in [base] + updates:
+            with open(path) as f:
+                json.load(f)
+        print(f"{args.files} files x {args.records} records, json decoding only: {time.perf_counter() - start:6.2f} s")
+        for policy in POLICIES:
+            start = time.perf_counter()
+            updater = JSONUpdater(base, policy=policy, manual_files=updates[:1])
+            updater.update_with(updates)
+            elapsed = time.perf_counter() - start
+            print(f"  {policy:14s}: {elapsed:6.2f} s, {len(updater.processes)} processes, {len(updater.changes)} change(s) recorded")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Time the XSDB result-row fallback parser on synthetic pages: parse_result_rows (only the row
+around the dataset name) against feeding the whole page to the row parser (which stops at the
+matching row). Two layouts: the dataset's rows in a small table of a large page, and the dataset's
+row at the end of one big table.
+
+python3 bench_xsdb_rows.py --rows 3000
+"""
+import time
+import argparse
+
+from XSDB_HTML_Scraper import ResultRowParser, parse_result_rows, XSDB_COLUMNS
+
+
+def make_page(n_rows, match, small_table):
+    # n_rows rows of other processes; match either in a table of its own (2 rows) or in the last row of the big one
+    cells = "".join(f"<td><span>{col}_value</span></td>" for col in XSDB_COLUMNS)
+    parts = ["<html><head>", "<script>var x = 1;</script>" * 2000, "</head><body>", "<table><tbody>"]
+    parts += [f"<tr><td>Process_{i}</td>{cells}</tr>" for i in range(n_rows)]
+    if small_table:
+        parts += ["</tbody></table>", "<table><tbody>"] + [f"<tr><td>{match}</td>{cells}</tr>"] * 2
+    else:
+        parts += [f"<tr><td>{match}</td>{cells}</tr>"]
+    parts += ["</tbody></table>", "<div>footer</div>" * 2000, "</body></html>"]
+    return "".join(parts)
+
+
+def best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def whole_page(page, match):
+    parser = ResultRowParser(match)
+    parser.feed(page)
+    parser.close()
+    return parser.rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the XSDB result-row fallback parser.")
+    ap.add_argument("--rows", type=int, default=3000, help="Rows of other processes on the synthetic page.")
+    ap.add_argument("--repeat", type=int, default=5, help="Take the best of this many runs.")
+    args = ap.parse_args()
+
+    match = "SMS-T1tttt_TuneCP5_13p6TeV-madgraphMLM-pythia8"
+    for small_table in (True, False):
+        page = make_page(args.rows, match, small_table)
+        print(f"{'match in its own table' if small_table else 'match in the big table'}: "
+              f"page {len(page) / 1e6:.1f} MB, {args.rows} other rows")
+        t_slice, rows_slice = best_of(lambda: parse_result_rows(page, match), args.repeat)
+        t_whole, rows_whole = best_of(lambda: whole_page(page, match), args.repeat)
+        assert rows_slice == rows_whole, "slice and whole-page parsing disagree"
+        print(f"  parse_result_rows (row slice):   {t_slice * 1e3:8.1f} ms")
+        print(f"  whole page through the parser:   {t_whole * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,13 @@
 
 import os
 import sys
+import json
+import hashlib
+import argparse
+import concurrent.futures
+from collections import Counter
+
+MASK128 = (1 << 128) - 1
 
 
 def get_relative_files(directory):
@@ -17,26 +24,120 @@ def get_relative_files(directory):
 
 
 def sorted_file_contents(path):
-    with open(path, "r") as f:
-        return sorted(f.readlines())
+    # Lines split on \n and stripped of their endings like file_digest does, so both modes agree
+    # on CRLF vs LF and on a missing final newline
+    with open(path, "rb") as f:
+        return sorted(line.rstrip(b"\r\n") for line in f)
+
+
+def file_digest(path, chunk_bytes=1 << 24):
+    """
+    Order-independent digest of a file's lines in one streaming pass: the sum (mod 2^128)
+    of a hash of every line, plus the line count. Equal for files holding the same lines
+    in any order, like comparing sorted contents.
+    """
+    total = 0
+    count = 0
+    from_bytes = int.from_bytes
+    blake2b = hashlib.blake2b
+    with open(path, "rb") as f:
+        while True:
+            lines = f.readlines(chunk_bytes)
+            if not lines:
+                break
+            count += len(lines)
+            total += sum(from_bytes(blake2b(line.rstrip(b"\r\n"), digest_size=16).digest(), "little") for line in lines)
+    return f"{count}:{total & MASK128:032x}"
+
+
+def digest_pair(args):
+    file1, file2 = args
+    try:
+        return file_digest(file1), file_digest(file2), None
+    except Exception as e:
+        return None, None, str(e)
+
+
+def line_counts(path):
+    with open(path, "rb") as f:
+        return Counter(line.rstrip(b"\r\n").decode(errors="replace") for line in f)
+
+
+def line_diff(file1, file2):
+    """Lines added in file2 / removed from file1, with multiplicities."""
+    counts1 = line_counts(file1)
+    counts2 = line_counts(file2)
+    return {"added": dict(counts2 - counts1), "removed": dict(counts1 - counts2)}
+
+
+def compare_digests(dir1, dir2, common_files, workers=None):
+    """
+    Digest every common file pair in a process pool and run full line diffs only for the
+    pairs whose digests differ. Returns (differ, errors): {relpath: diff}, {relpath: message}.
+    """
+    pairs = [(os.path.join(dir1, rel), os.path.join(dir2, rel)) for rel in common_files]
+    differ = {}
+    errors = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        digests = executor.map(digest_pair, pairs, chunksize=max(1, len(pairs) // (8 * (workers or os.cpu_count() or 1))))
+        changed = []
+        for relpath, (digest1, digest2, error) in zip(common_files, digests):
+            if error:
+                errors[relpath] = error
+            elif digest1 != digest2:
+                changed.append(relpath)
+        diffs = executor.map(line_diff, [os.path.join(dir1, rel) for rel in changed], [os.path.join(dir2, rel) for rel in changed])
+        for relpath, diff in zip(changed, diffs):
+            differ[relpath] = diff
+    return differ, errors
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare two samples/ trees file by file, ignoring line order.")
+    parser.add_argument("dir1")
+    parser.add_argument("dir2")
+    parser.add_argument("--digest", action="store_true", help="Compare order-independent per-file digests in parallel; line diffs only for files that differ.")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Worker processes for --digest (default: number of CPUs).")
+    parser.add_argument("--json", dest="json_output", default=None, help="Write a machine-readable report to this file ('-' for stdout). Implies --digest.")
+    return parser.parse_args()
 
 
 def main():
 
-    if len(sys.argv) != 3:
-        print(f"Usage: {sys.argv[0]} DIR1 DIR2")
-        sys.exit(1)
+    args = parse_args()
 
-    dir1 = sys.argv[1].rstrip("/")
-    dir2 = sys.argv[2].rstrip("/")
+    dir1 = args.dir1.rstrip("/")
+    dir2 = args.dir2.rstrip("/")
 
     files1 = get_relative_files(dir1)
     files2 = get_relative_files(dir2)
 
-    print("=== Checking file lists ===")
-
     only_in_dir1 = sorted(files1 - files2)
     only_in_dir2 = sorted(files2 - files1)
+    common_files = sorted(files1 & files2)
+
+    if args.digest or args.json_output:
+        differ, errors = compare_digests(dir1, dir2, common_files, args.workers)
+        if args.json_output:
+            report = {
+                "dir1": dir1,
+                "dir2": dir2,
+                "only_in_dir1": only_in_dir1,
+                "only_in_dir2": only_in_dir2,
+                "n_common": len(common_files),
+                "differ": differ,
+                "errors": errors,
+            }
+            if args.json_output == "-":
+                json.dump(report, sys.stdout, indent=2, sort_keys=True)
+                print()
+            else:
+                with open(args.json_output, "w") as f:
+                    json.dump(report, f, indent=2, sort_keys=True)
+                print(f"Report written to {args.json_output}")
+            return
+
+    print("=== Checking file lists ===")
 
     for f in only_in_dir1:
         print(f"Only in {dir1}: {f}")
@@ -47,7 +148,16 @@ def main():
     print()
     print("=== Checking file contents (sorted) ===")
 
-    common_files = sorted(files1 & files2)
+    if args.digest:
+        for relpath in common_files:
+            if relpath in errors:
+                print(f"ERROR reading {relpath}: {errors[relpath]}")
+            elif relpath in differ:
+                added = sum(differ[relpath]["added"].values())
+                removed = sum(differ[relpath]["removed"].values())
+                print(f"DIFFER: {relpath} (+{added} -{removed} lines)")
+        print("Done.")
+        return
 
     for relpath in common_files:
 
@@ -0,0 +1,191 @@
+import os
+import uuid
+import shutil
+import hashlib
+import argparse
+import subprocess
+import tempfile
+
+EOS_XSECTION_DIR = "root://cmseos.fnal.gov//store/user/z374f439/XSectionJSONs/"
+# sha256sum format ("<digest>  <name>"), and not .json so it is never merged as XSDB data
+MANIFEST = "MANIFEST.sha256"
+
+class EOSSync:
+    """
+    Content-addressed sync of a flat directory (XSectionJSONs/) with EOS.
+
+    A manifest (file name -> sha256) is kept next to the files on EOS. pull() downloads only
+    files whose hash differs from the local copy, push() uploads only new or changed files and
+    then the manifest. The manifest is merged with the one on EOS right before it is replaced
+    (through a temporary name and a rename), so concurrent pushes keep each other's entries.
+    The local directory is kept between runs as a cache.
+
+    remote may be an xrootd URL or a plain directory (used as a stand-in for EOS when testing).
+
+    Usage:
+        sync = EOSSync(EOS_XSECTION_DIR, "XSectionJSONs")
+        sync.pull()
+        ...  # add or update files in XSectionJSONs/
+        sync.push()
+    """
+    def __init__(self, remote: str = EOS_XSECTION_DIR, local_dir: str = "XSectionJSONs", verbose: bool = True):
+        self.remote = remote.rstrip("/") + "/"
+        self.local_dir = local_dir
+        self.verbose = verbose
+        self.is_xrootd = remote.startswith("root://")
+        os.makedirs(local_dir, exist_ok=True)
+
+    # ---------------------------
+    # Remote primitives
+    # ---------------------------
+    def _run(self, cmd):
+        return subprocess.run(cmd, capture_output=True, text=True)
+
+    def _download(self, name: str, dest: str) -> bool:
+        if self.is_xrootd:
+            return self._run(["xrdcp", "-sf", self.remote + name, dest]).returncode == 0
+        src = os.path.join(self.remote, name)
+        if not os.path.isfile(src):
+            return False
+        shutil.copy2(src, dest)
+        return True
+
+    def _upload(self, src: str, name: str) -> bool:
+        if self.is_xrootd:
+            return self._run(["xrdcp", "-sf", src, self.remote + name]).returncode == 0
+        os.makedirs(self.remote, exist_ok=True)
+        shutil.copy2(src, os.path.join(self.remote, name))
+        return True
+
+    def _rename(self, src: str, dest: str) -> bool:
+        if self.is_xrootd:
+            # root://host//path/name -> xrdfs root://host mv /path/src /path/dest
+            host, _, path = self.remote[len("root://"):].partition("/")
+            path = "/" + path.lstrip("/")
+            return self._run(["xrdfs", "root://" + host, "mv", path + src, path + dest]).returncode == 0
+        os.replace(os.path.join(self.remote, src), os.path.join(self.remote, dest))
+        return True
+
+    def _download_all(self):
+        # Legacy layout without a manifest: copy the whole directory once
+        if self.is_xrootd:
+            parent = os.path.dirname(os.path.abspath(self.local_dir.rstrip("/")))
+            self._run(["xrdcp", "-sfr", self.remote, parent + "/"])
+        elif os.path.isdir(self.remote):
+            shutil.copytree(self.remote, self.local_dir, dirs_exist_ok=True)
+
+    # ---------------------------
+    # Manifests
+    # ---------------------------
+    @staticmethod
+    def file_hash(path: str) -> str:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    @staticmethod
+    def read_manifest(path: str) -> dict:
+        manifest = {}
+        with open(path, "r") as f:
+            for line in f:
+                parts = line.strip().split(None, 1)
+                if len(parts) == 2:
+                    manifest[parts[1]] = parts[0]
+        return manifest
+
+    @staticmethod
+    def write_manifest(path: str, manifest: dict):
+        with open(path, "w") as f:
+            for name in sorted(manifest):
+                f.write(f"{manifest[name]}  {name}\n")
+
+    def publish_manifest(self, entries: dict, max_attempts: int = 3) -> bool:
+        """
+        Add entries (file name -> sha256) to the manifest on EOS. The remote manifest is read again
+        just before it is replaced and merged with entries, then written under a temporary name and
+        renamed over the old one. If it is read back without entries (another push replaced it in
+        between), the merge is repeated.
+        """
+        manifest_path = os.path.join(self.local_dir, MANIFEST)
+        tmp_name = f"{MANIFEST}.{uuid.uuid4().hex[:12]}.tmp"
+        for _ in range(max_attempts):
+            merged = self.remote_manifest() or {}
+            merged.update(entries)
+            self.write_manifest(manifest_path, merged)
+            if not (self._upload(manifest_path, tmp_name) and self._rename(tmp_name, MANIFEST)):
+                return False
+            current = self.remote_manifest() or {}
+            if all(current.get(name) == digest for name, digest in entries.items()):
+                return True
+        return False
+
+    def local_manifest(self) -> dict:
+        manifest = {}
+        for entry in os.scandir(self.local_dir):
+            if entry.is_file() and entry.name != MANIFEST and not entry.name.endswith(".tmp"):
+                manifest[entry.name] = self.file_hash(entry.path)
+        return manifest
+
+    def remote_manifest(self):
+        """Remote manifest dict, or None if EOS has none yet."""
+        with tempfile.TemporaryDirectory() as tmp:
+            dest = os.path.join(tmp, MANIFEST)
+            if not self._download(MANIFEST, dest):
+                return None
+            return self.read_manifest(dest)
+
+    # ---------------------------
+    # Public API
+    # ---------------------------
+    def pull(self) -> int:
+        """Download files that are missing or different locally. Returns the number downloaded."""
+        remote = self.remote_manifest()
+        if remote is None:
+            if self.verbose:
+                print(f"[EOSSync] No {MANIFEST} in {self.remote}, copying the whole directory once")
+            self._download_all()
+            return -1
+        local = self.local_manifest()
+        todo = [name for name, digest in remote.items() if local.get(name) != digest]
+        for name in todo:
+            tmp = os.path.join(self.local_dir, name + ".tmp")
+            if self._download(name, tmp):
+                os.replace(tmp, os.path.join(self.local_dir, name))
+            else:
+                print(f"[EOSSync] Failed to download {name}")
+        if self.verbose:
+            print(f"[EOSSync] Pulled {len(todo)} of {len(remote)} file(s) from {self.remote}")
+        return len(todo)
+
+    def push(self) -> int:
+        """Upload new or changed files, then the manifest. Returns the number uploaded."""
+        remote = self.remote_manifest() or {}
+        local = self.local_manifest()
+        todo = [name for name, digest in local.items() if remote.get(name) != digest]
+        uploaded = {}
+        for name in todo:
+            if self._upload(os.path.join(self.local_dir, name), name):
+                uploaded[name] = local[name]
+            else:
+                print(f"[EOSSync] Failed to upload {name}")
+        # Manifest last, so it never lists content that is not on EOS yet
+        if not self.publish_manifest(uploaded):
+            print(f"[EOSSync] Failed to update {MANIFEST}")
+        if self.verbose:
+            print(f"[EOSSync] Pushed {len(todo)} of {len(local)} file(s) to {self.remote}")
+        return len(todo)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delta-sync a local directory with EOS using a hash manifest.")
+    parser.add_argument("action", choices=["pull", "push", "sync"], help="pull: EOS -> local, push: local -> EOS, sync: both.")
+    parser.add_argument("--remote", "-r", default=EOS_XSECTION_DIR, help="EOS xrootd URL or a local directory standing in for EOS.")
+    parser.add_argument("--local", "-l", default="XSectionJSONs", help="Local directory (kept as a cache between runs).")
+    args = parser.parse_args()
+
+    sync = EOSSync(args.remote, args.local)
+    if args.action in ("pull", "sync"):
+        sync.pull()
+    if args.action in ("push", "sync"):
+        sync.push()
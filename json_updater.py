@@ -1,13 +1,61 @@
 import json
 import argparse
 import os
-from deepdiff import DeepDiff
+import sqlite3
+from datetime import datetime, timezone
+
+POLICIES = ("keep-first", "newest", "prefer-manual")
+
+def modified_on_timestamp(rows):
+    """Latest XSDB 'modifiedOn' of rows as a unix time, None if absent or unparsable."""
+    latest = None
+    for row in rows:
+        value = str(row.get("modifiedOn") or "").strip()
+        if not value:
+            continue
+        try:
+            dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            continue
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        latest = max(latest or 0, dt.timestamp())
+    return latest
 
 class JSONUpdater:
-    def __init__(self, base_file):
+    """
+    Merge XSDB json files (lists of records keyed by process_name) into a base file.
+
+    Records are indexed by process_name once, so merging many files costs time linear in the
+    total number of records instead of rebuilding the index per file. When a process is already known the
+    conflict policy decides which rows win:
+        keep-first     the first rows seen for a process are kept (base file first)
+        newest         rows with the latest modifiedOn win
+        prefer-manual  rows from manual files always win, otherwise like newest
+
+    Every addition and replacement is recorded in self.changes for report().
+    """
+    def __init__(self, base_file, policy="keep-first", manual_files=()):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy {policy}, choose from {POLICIES}")
         self.base_file = base_file
-        self.data = self._load_json(base_file)
-    
+        self.policy = policy
+        self.manual_files = {os.path.abspath(f) for f in manual_files}
+        self.processes = {}  # process_name -> (rows, source_is_manual, latest modifiedOn)
+        self.unnamed = []
+        self.changes = []
+        self._merge_data(self._load_json(base_file), self._is_manual(base_file), record=False)
+
+    @property
+    def data(self):
+        rows = []
+        for process_rows, _, _ in self.processes.values():
+            rows.extend(process_rows)
+        return rows + self.unnamed
+
+    def _is_manual(self, file_path):
+        return os.path.abspath(file_path) in self.manual_files
+
     def _load_json(self, file_path):
         try:
             with open(file_path, "r", encoding="utf-8") as file:
@@ -15,24 +63,117 @@ class JSONUpdater:
         except Exception as e:
             print(f"Error loading {file_path}: {e}")
             return []
-    
+
     def update_with(self, other_files):
         for file in other_files:
             other_data = self._load_json(file)
-            self._merge_data(other_data)
-    
-    def _merge_data(self, new_data):
-        existing_processes = {entry["process_name"]: entry for entry in self.data}
+            self._merge_data(other_data, self._is_manual(file), source=file)
+
+    def _wins(self, new_manual, new_time, old_manual, old_time):
+        if self.policy == "keep-first":
+            return False
+        if self.policy == "prefer-manual" and new_manual != old_manual:
+            return new_manual
+        return new_time is not None and (old_time is None or new_time > old_time)
+
+    def _merge_data(self, new_data, manual=False, source=None, record=True):
+        # Group the file's rows per process first: a process can have several rows (e.g. per DAS path)
+        grouped = {}
         for entry in new_data:
-            if entry["process_name"] not in existing_processes:
-                self.data.append(entry)
-    
+            if "process_name" not in entry:
+                self.unnamed.append(entry)
+                continue
+            grouped.setdefault(entry["process_name"], []).append(entry)
+
+        for process_name, rows in grouped.items():
+            existing = self.processes.get(process_name)
+            if existing is None:
+                self.processes[process_name] = (rows, manual, modified_on_timestamp(rows))
+                if record:
+                    self.changes.append({"process_name": process_name, "action": "added", "source": source})
+                continue
+            if self.policy == "keep-first":
+                continue
+            new_time = modified_on_timestamp(rows)
+            if self._wins(manual, new_time, existing[1], existing[2]):
+                fields = self._changed_fields(existing[0], rows)
+                self.processes[process_name] = (rows, manual, new_time)
+                if fields:
+                    self.changes.append({"process_name": process_name, "action": "replaced", "source": source, "fields": fields})
+
+    @staticmethod
+    def _changed_fields(old_rows, new_rows):
+        """{field: [old, new]} for fields that differ, comparing rows pairwise in order."""
+        fields = {}
+        for i in range(max(len(old_rows), len(new_rows))):
+            old = old_rows[i] if i < len(old_rows) else {}
+            new = new_rows[i] if i < len(new_rows) else {}
+            for key in set(old) | set(new):
+                if old.get(key) != new.get(key):
+                    name = key if i == 0 else f"{key}[{i}]"
+                    fields[name] = [old.get(key), new.get(key)]
+        return fields
+
+    def report(self, report_file=None):
+        added = sum(1 for c in self.changes if c["action"] == "added")
+        replaced = [c for c in self.changes if c["action"] == "replaced"]
+        print(f"Merge summary ({self.policy}): {added} process(es) added, {len(replaced)} replaced")
+        for change in replaced:
+            diffs = ", ".join(f"{k}: {v[0]!r} -> {v[1]!r}" for k, v in sorted(change["fields"].items()))
+            print(f"  {change['process_name']}: {diffs}")
+        if report_file:
+            with open(report_file, "w", encoding="utf-8") as file:
+                json.dump(self.changes, file, indent=4, sort_keys=True)
+            print(f"Merge report saved to {report_file}")
+
     def save(self, output_file=None):
         output_path = output_file if output_file else self.base_file
         with open(output_path, "w", encoding="utf-8") as file:
             json.dump(self.data, file, indent=4, sort_keys=True)
         print(f"Updated JSON saved to {output_path}")
 
+    @staticmethod
+    def _to_float(value):
+        try:
+            return float(value)
+        except (ValueError, TypeError):
+            return None
+
+    def export_lookup(self, lookup_file):
+        """
+        Write a compiled lookup table (SQLite, indexed by process_name and DAS) with the numbers
+        already parsed to floats, for xsection_lookup.XSectionLookup. Written to a temp file and
+        moved into place so readers never see a partial table.
+        """
+        tmp_path = lookup_file + ".tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        conn.execute(
+            "CREATE TABLE xsec ("
+            " process_name TEXT NOT NULL, das TEXT, cross_section REAL, total_uncertainty REAL,"
+            " other_uncertainty REAL, kfactor REAL, energy REAL, accuracy TEXT, mcm TEXT)"
+        )
+        conn.executemany(
+            "INSERT INTO xsec VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    process_name, row.get("DAS") or None,
+                    self._to_float(row.get("cross_section")), self._to_float(row.get("total_uncertainty")),
+                    self._to_float(row.get("other_uncertainty")), self._to_float(row.get("kFactor")),
+                    self._to_float(row.get("energy")), row.get("accuracy") or None, row.get("MCM") or None,
+                )
+                for process_name, (rows, _, _) in self.processes.items()
+                for row in rows
+            ),
+        )
+        conn.execute("CREATE INDEX xsec_process_name ON xsec (process_name)")
+        conn.execute("CREATE INDEX xsec_das ON xsec (das)")
+        conn.commit()
+        conn.close()
+        os.replace(tmp_path, lookup_file)
+        print(f"Lookup table saved to {lookup_file}")
+
     @staticmethod
     def get_json_files_from_directory(directory):
         return [os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(".json")]
@@ -45,6 +186,8 @@ if __name__ == "__main__":
         "python3 json_updater.py --base base.json --updates update1.json update2.json --output updated.json \n"
         "python3 json_updater.py --base base.json --dir path/to/jsons \n"
         "python3 json_updater.py --base base.json --updates update1.json --dir path/to/jsons --output merged.json \n"
+        "python3 json_updater.py --base base.json --dir path/to/jsons --policy prefer-manual --manual ManualRecords_XSDB.json --report diff.json \n"
+        "python3 json_updater.py --base base.json --dir path/to/jsons --output merged.json --lookup merged.sqlite \n"
         ),
         formatter_class=argparse.RawTextHelpFormatter
     )
@@ -52,18 +195,25 @@ if __name__ == "__main__":
     parser.add_argument("--updates", "-u", "-i", nargs="*", help="List of JSON files to merge into the base file.")
     parser.add_argument("--dir", "-d", help="Path to a directory containing JSON files to merge.")
     parser.add_argument("--output", "-o", help="Optional output file to save the updated JSON.")
-    
+    parser.add_argument("--policy", "-p", choices=POLICIES, default="keep-first", help="Which rows win when a process is already present.")
+    parser.add_argument("--manual", "-m", nargs="*", default=[], help="JSON files holding manual records (merged too, and preferred by --policy prefer-manual).")
+    parser.add_argument("--report", "-r", help="Optional JSON file for the report of added/replaced processes.")
+    parser.add_argument("--lookup", "-l", help="Optional SQLite lookup table to export for analysis jobs (see xsection_lookup.py).")
+
     args = parser.parse_args()
-    
+
     update_files = args.updates if args.updates else []
     if args.dir:
         update_files.extend(JSONUpdater.get_json_files_from_directory(args.dir))
-    
+    update_files.extend(args.manual)
+
     if not update_files:
         print("No update files provided.")
         exit(1)
-    
-    updater = JSONUpdater(args.base)
+
+    updater = JSONUpdater(args.base, policy=args.policy, manual_files=args.manual)
     updater.update_with(update_files)
+    updater.report(args.report)
     updater.save(args.output)
-
+    if args.lookup:
+        updater.export_lookup(args.lookup)
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+import concurrent.futures
+
+from compare_samples import file_digest
+
+SNAPSHOT_VERSION = 1
+
+
+def _dir_hash(node):
+    """Hash of a directory node from its (sorted) children: file digests and sub-directory hashes."""
+    h = hashlib.sha256()
+    for name in sorted(node["files"]):
+        h.update(f"f {name} {node['files'][name]['digest']}\n".encode())
+    for name in sorted(node["dirs"]):
+        h.update(f"d {name} {node['dirs'][name]['hash']}\n".encode())
+    return h.hexdigest()
+
+
+def _scan(path, previous, todo):
+    """
+    Build the tree under path with os.scandir. Files whose size and mtime match the previous
+    snapshot keep their digest; the others are appended to todo as (node, name, full path).
+    """
+    node = {"dirs": {}, "files": {}}
+    previous = previous or {"dirs": {}, "files": {}}
+    with os.scandir(path) as it:
+        entries = sorted(it, key=lambda e: e.name)
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            node["dirs"][entry.name] = _scan(entry.path, previous["dirs"].get(entry.name), todo)
+        elif entry.is_file():
+            st = entry.stat()
+            record = {"size": st.st_size, "mtime": st.st_mtime_ns, "digest": None}
+            old = previous["files"].get(entry.name)
+            if old and old["size"] == record["size"] and old["mtime"] == record["mtime"]:
+                record["digest"] = old["digest"]
+            else:
+                todo.append((record, entry.path))
+            node["files"][entry.name] = record
+    return node
+
+
+def _fill_hashes(node):
+    for child in node["dirs"].values():
+        _fill_hashes(child)
+    node["hash"] = _dir_hash(node)
+
+
+def build_snapshot(root, previous=None, workers=None):
+    """
+    Merkle tree of root: every file carries its order-independent line digest (see
+    compare_samples.file_digest), size and mtime; every directory the hash of its children.
+    With a previous snapshot of the same tree only new or modified files are read.
+    Returns (tree, number of files digested).
+    """
+    todo = []
+    tree = _scan(root, previous, todo)
+    if todo:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            chunksize = max(1, len(todo) // (8 * (workers or os.cpu_count() or 1)))
+            for (record, _), digest in zip(todo, executor.map(file_digest, [p for _, p in todo], chunksize=chunksize)):
+                record["digest"] = digest
+    _fill_hashes(tree)
+    return tree, len(todo)
+
+
+def load_snapshot(path):
+    with open(path, "r") as f:
+        snapshot = json.load(f)
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"{path}: unsupported snapshot version {snapshot.get('version')}")
+    return snapshot
+
+
+def save_snapshot(path, root, tree):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"version": SNAPSHOT_VERSION, "root": os.path.abspath(root), "tree": tree}, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def _all_files(node, prefix):
+    for name in node["files"]:
+        yield os.path.join(prefix, name)
+    for name, child in node["dirs"].items():
+        yield from _all_files(child, os.path.join(prefix, name))
+
+
+def diff_trees(tree1, tree2, prefix=""):
+    """
+    Yield (status, relpath) for every difference, status in 'only1', 'only2', 'differ'.
+    Subtrees with equal hashes are skipped without being visited.
+    """
+    if tree1["hash"] == tree2["hash"]:
+        return
+    files1, files2 = tree1["files"], tree2["files"]
+    for name in sorted(files1.keys() | files2.keys()):
+        relpath = os.path.join(prefix, name)
+        if name not in files2:
+            yield "only1", relpath
+        elif name not in files1:
+            yield "only2", relpath
+        elif files1[name]["digest"] != files2[name]["digest"]:
+            yield "differ", relpath
+    dirs1, dirs2 = tree1["dirs"], tree2["dirs"]
+    for name in sorted(dirs1.keys() | dirs2.keys()):
+        relpath = os.path.join(prefix, name)
+        if name not in dirs2:
+            for path in sorted(_all_files(dirs1[name], relpath)):
+                yield "only1", path
+        elif name not in dirs1:
+            for path in sorted(_all_files(dirs2[name], relpath)):
+                yield "only2", path
+        else:
+            yield from diff_trees(dirs1[name], dirs2[name], relpath)
+
+
+def cache_for(snapshot, directory):
+    """
+    Tree of snapshot if it was taken of directory, else None: digests are only reused for the
+    same files, never for a same-named file with equal size/mtime in another tree (cp -p, rsync -t).
+    """
+    if snapshot and snapshot.get("root") == os.path.abspath(directory):
+        return snapshot["tree"]
+    return None
+
+
+def resolve(source, reference=None, workers=None):
+    """
+    Tree for a snapshot file or a live directory. A live directory is scanned with reference
+    (a loaded snapshot) as the mtime/size cache if it was taken of that directory, so unchanged
+    files are not read.
+    """
+    if os.path.isdir(source):
+        tree, n_read = build_snapshot(source, cache_for(reference, source), workers)
+        print(f"[Snapshot] {source}: {n_read} file(s) read", file=sys.stderr)
+        return tree
+    return load_snapshot(source)["tree"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Merkle-tree snapshots of a samples/ tree, compared in time proportional to what changed.",
+        epilog=(
+        "Example usage:\n"
+        "python3 samples_snapshot.py snapshot samples/ -o samples_prod.snap.json\n"
+        "python3 samples_snapshot.py snapshot samples/ -o samples_new.snap.json --previous samples_prod.snap.json\n"
+        "python3 samples_snapshot.py diff samples_prod.snap.json samples/\n"
+        "python3 samples_snapshot.py diff samples_prod.snap.json samples_new.snap.json --json report.json\n"
+        ),
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    snap = sub.add_parser("snapshot", help="Write a snapshot of a directory.")
+    snap.add_argument("directory")
+    snap.add_argument("-o", "--output", required=True, help="Snapshot file to write.")
+    snap.add_argument("--previous", default=None, help="Earlier snapshot of the same tree: files with unchanged size/mtime are not re-read.")
+    snap.add_argument("-j", "--workers", type=int, default=None, help="Worker processes for digesting (default: number of CPUs).")
+
+    diff = sub.add_parser("diff", help="Compare two snapshots, or a snapshot and a live directory.")
+    diff.add_argument("source1", help="Snapshot file or directory.")
+    diff.add_argument("source2", help="Snapshot file or directory.")
+    diff.add_argument("-j", "--workers", type=int, default=None, help="Worker processes for digesting live directories.")
+    diff.add_argument("--json", dest="json_output", default=None, help="Write a machine-readable report to this file ('-' for stdout).")
+    return parser.parse_args()
+
+
+def main():
+
+    args = parse_args()
+
+    if args.command == "snapshot":
+        previous = load_snapshot(args.previous) if args.previous else None
+        if previous and cache_for(previous, args.directory) is None:
+            print(f"[Snapshot] {args.previous} was taken of {previous.get('root')}, not {os.path.abspath(args.directory)}: reading every file", file=sys.stderr)
+        previous = cache_for(previous, args.directory)
+        tree, n_read = build_snapshot(args.directory, previous, args.workers)
+        save_snapshot(args.output, args.directory, tree)
+        print(f"[Snapshot] {args.directory}: {n_read} file(s) read, root hash {tree['hash']}, saved to {args.output}")
+        return
+
+    # A live directory is scanned against the snapshot on the other side as its cache when that
+    # snapshot was taken of the same directory; two live directories are scanned independently
+    snap1 = None if os.path.isdir(args.source1) else load_snapshot(args.source1)
+    snap2 = None if os.path.isdir(args.source2) else load_snapshot(args.source2)
+    tree1 = snap1["tree"] if snap1 else resolve(args.source1, snap2, args.workers)
+    tree2 = snap2["tree"] if snap2 else resolve(args.source2, snap1, args.workers)
+
+    report = {"only_in_1": [], "only_in_2": [], "differ": []}
+    keys = {"only1": "only_in_1", "only2": "only_in_2", "differ": "differ"}
+    for status, relpath in diff_trees(tree1, tree2):
+        report[keys[status]].append(relpath)
+
+    if args.json_output:
+        report.update({"source1": args.source1, "source2": args.source2, "hash1": tree1["hash"], "hash2": tree2["hash"]})
+        if args.json_output == "-":
+            json.dump(report, sys.stdout, indent=2, sort_keys=True)
+            print()
+        else:
+            with open(args.json_output, "w") as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            print(f"Report written to {args.json_output}")
+        return
+
+    for relpath in report["only_in_1"]:
+        print(f"Only in {args.source1}: {relpath}")
+    for relpath in report["only_in_2"]:
+        print(f"Only in {args.source2}: {relpath}")
+    for relpath in report["differ"]:
+        print(f"DIFFER: {relpath}")
+    print("Identical." if tree1["hash"] == tree2["hash"] else "Done.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+import os
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from xsdb_api_client import XSDBAPIClient
+from xsection_store import XSectionStore
+from eos_sync import EOSSync, MANIFEST
+
+# Checks of the XSDB tools against a local stand-in server and saved pages; run with
+# python3 -m pytest test_xsdb_tools.py
+
+WANTED = {'process_name', 'cross_section', 'total_uncertainty', 'other_uncertainty', 'accuracy',
+          'DAS', 'MCM', 'kFactor', 'energy', 'modifiedOn'}
+
+def xsdb_record(name, xsec="1.0", **kw):
+    # Shape of a record returned by the XSDB search endpoint (more fields than the scraper keeps)
+    record = {"process_name": name, "cross_section": xsec, "total_uncertainty": "0.01", "other_uncertainty": None,
+              "accuracy": "NLO", "DAS": f"/{name}/Run3Summer23MiniAODv4-130X_mcRun3_2023_realistic_v14-v2/MINIAODSIM",
+              "MCM": "", "kFactor": 1, "energy": "13.6", "modifiedOn": "2024-03-01T10:00:00.000Z",
+              "createdOn": "2023-11-20T08:00:00.000Z", "createdBy": "someone", "status": "approved", "_id": "65f1c0"}
+    record.update(kw)
+    return record
+
+RECORDED = {
+    "TTto2L2Nu_TuneCP5_13p6TeV_powheg-pythia8": [xsdb_record("TTto2L2Nu_TuneCP5_13p6TeV_powheg-pythia8", "96.9")],
+    "TTto2L2Nu_TuneCP5_13p6TeV_powheg-pythia8_ext": [xsdb_record("TTto2L2Nu_TuneCP5_13p6TeV_powheg-pythia8_ext", "97.0")],
+    "WtoLNu-2Jets_TuneCP5_13p6TeV_amcatnloFXFX-pythia8": [xsdb_record("WtoLNu-2Jets_TuneCP5_13p6TeV_amcatnloFXFX-pythia8", " 64481.58 ")],
+}
+
+class XSDBStandIn(BaseHTTPRequestHandler):
+    """Serves self.server.records for process_name searches, like the XSDB search endpoint (substring match)."""
+    def do_POST(self):
+        server = self.server
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        name = payload["search"]["process_name"]
+        with server.lock:
+            server.requests.append((name, self.headers.get("Cookie")))
+            fail = server.fail.get(name, 0)
+            if fail:
+                server.fail[name] = fail - 1
+        time.sleep(server.delay(name))
+        if server.status != 200 or fail:
+            self.send_error(server.status if server.status != 200 else 503)
+            return
+        body = json.dumps([r for key, records in server.records.items() if name in key for r in records]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def xsdb_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), XSDBStandIn)
+    server.daemon_threads = True
+    server.records = dict(RECORDED)
+    server.requests = []
+    server.lock = threading.Lock()
+    server.fail = {}                # process_name -> number of 503 answers before the records
+    server.status = 200             # 401/403 rejects every request
+    server.delay = lambda name: 0.0
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/api/search"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def make_client(server, **kw):
+    return XSDBAPIClient([{"name": "_saml_idp", "value": "abc"}, {"name": "session", "value": "xyz"}], WANTED, url=server.url, **kw)
+
+# ---------------------------
+# XSDBAPIClient
+# ---------------------------
+def test_api_get_info_maps_wanted_fields(xsdb_server):
+    client = make_client(xsdb_server)
+    name = "TTto2L2Nu_TuneCP5_13p6TeV_powheg-pythia8"
+    rows = client.get_info(name + "\n")
+    # The _ext record also matches the search but is not the process asked for
+    assert len(rows) == 1
+    assert set(rows[0]) == WANTED
+    assert rows[0]["cross_section"] == "96.9" and rows[0]["kFactor"] == "1" and rows[0]["other_uncertainty"] == ""
+    assert client.get_info("WtoLNu-2Jets_TuneCP5_13p6TeV_amcatnloFXFX-pythia8")[0]["cross_section"] == "64481.58"
+    assert client.get_info("NotInXSDB") == []
+    assert xsdb_server.requests[0] == (name, "_saml_idp=abc; session=xyz")
+
+def test_api_search_and_matching(xsdb_server):
+    client = make_client(xsdb_server)
+    records = client.search({"process_name": "TTto2L2Nu"})
+    assert sorted(r["process_name"] for r in records) == sorted(RECORDED)[:2]
+    assert [r["process_name"] for r in client.get_info_matching("TTto2L2Nu")] == [r["process_name"] for r in records]
+
+def test_api_retries_server_errors(xsdb_server):
+    client = make_client(xsdb_server)
+    name = "TTto2L2Nu_TuneCP5_13p6TeV_powheg-pythia8"
+    xsdb_server.fail[name] = 2
+    assert len(client.search({"process_name": name}, max_retries=3, backoff=0)) == 2
+    assert len(xsdb_server.requests) == 3
+
+    xsdb_server.fail[name] = 3
+    with pytest.raises(Exception) as error:
+        client.search({"process_name": name}, max_retries=3, backoff=0)
+    assert getattr(error.value, "code", None) == 503
+
+@pytest.mark.parametrize("status", [401, 403])
+def test_api_expired_session(xsdb_server, status):
+    xsdb_server.status = status
+    with pytest.raises(PermissionError):
+        make_client(xsdb_server).search({"process_name": "TTto2L2Nu"}, backoff=0)
+    # Not retried: the cookie will not get any better
+    assert len(xsdb_server.requests) == 1
+
+def test_api_get_info_many_keeps_input_order(xsdb_server):
+    names = [f"Process_{i}" for i in range(12)]
+    xsdb_server.records = {name: [xsdb_record(name, str(i))] for i, name in enumerate(names)}
+    # Earlier names answer later, so results arrive in reverse order
+    xsdb_server.delay = lambda name: 0.01 * (len(names) - names.index(name)) if name in names else 0.0
+    arrived = []
+    results = make_client(xsdb_server, max_workers=6).get_info_many(names + ["Missing"], callback=lambda i, rows: arrived.append(i))
+    assert [rows[0]["cross_section"] for rows in results[:-1]] == [str(i) for i in range(12)]
+    assert results[-1] == []
+    assert sorted(arrived) == list(range(13)) and arrived != sorted(arrived)
+
+def test_api_get_info_many_stops_on_expired_session(xsdb_server):
+    xsdb_server.status = 401
+    xsdb_server.delay = lambda name: 0.02
+    names = [f"Process_{i}" for i in range(200)]
+    with pytest.raises(PermissionError):
+        make_client(xsdb_server, max_workers=4).get_info_many(names)
+    # Only the requests already in flight reach the server, the queued ones are cancelled
+    time.sleep(0.1)
+    assert len(xsdb_server.requests) < 20
+
+# ---------------------------
+# XSDB_HTML_Scraper on a saved results page
+# ---------------------------
+@pytest.fixture
+def scraper():
+    # The scraper module needs selenium and tqdm at import time, the parsing helpers do not use them
+    pytest.importorskip("selenium")
+    pytest.importorskip("tqdm")
+    import XSDB_HTML_Scraper
+    return XSDB_HTML_Scraper
+
+def result_row(scraper, name, xsec):
+    values = {"process_name": name, "cross_section": xsec, "total_uncertainty": "0.5", "accuracy": "NNLO",
+              "DAS": f"/{name}/Run3Summer23MiniAODv4/MINIAODSIM", "energy": "13.6", "kFactor": "1.0",
+              "modifiedOn": "2024-03-01T10:00:00.000Z"}
+    cells = "".join(f'<td aria-colindex="{i + 1}" role="cell"><div><span class="cell">{values.get(col, "")}</span>\n</div></td>'
+                    for i, col in enumerate(scraper.XSDB_COLUMNS))
+    return f'<tr role="row">{cells}</tr>'
+
+def results_page(scraper, names):
+    # Layout of a saved XSDB search result: a layout table above, the b-table of results, pagination below
+    rows = "".join(result_row(scraper, name, f"{100 + i}.5") for i, name in enumerate(names))
+    header = "".join(f'<th role="columnheader">{col}</th>' for col in scraper.XSDB_COLUMNS)
+    return ('<html><head><script>window.__INITIAL_STATE__ = {"query": ""};</script></head><body><div id="app">'
+            '<table class="layout"><tbody><tr><td><input id="searchField" value="process_name=QCD"></td></tr></tbody></table>'
+            f'<table role="table" class="table b-table table-sm"><thead role="rowgroup"><tr role="row">{header}</tr></thead>'
+            f'<tbody role="rowgroup">{rows}</tbody></table>'
+            '<ul class="pagination"><li>1</li></ul></div></body></html>')
+
+QCD_FAMILY = [f"QCD-4Jets_HT-{ht}_TuneCP5_13p6TeV_madgraphMLM-pythia8" for ht in ("1000to1200", "100to200", "1200to1500", "200to400")]
+
+def test_scraper_parse_saved_results_page(scraper):
+    page = results_page(scraper, QCD_FAMILY)
+    info = scraper.rows_to_info(scraper.parse_result_rows(page, "QCD-4Jets_HT-", prefix=True))
+    assert [row["process_name"] for row in info] == QCD_FAMILY
+    assert set(info[0]) == scraper.WANTED
+    assert info[1]["cross_section"] == "101.5" and info[1]["DAS"].startswith("/QCD-4Jets_HT-100to200")
+    assert scraper.parse_result_rows(page, "WtoLNu", prefix=True) is None
+
+def test_scraper_group_by_prefix(scraper):
+    names = QCD_FAMILY + ["TTto2L2Nu_TuneCP5_13p6TeV_powheg-pythia8", "WtoLNu-2Jets_TuneCP5_13p6TeV_amcatnloFXFX-pythia8"]
+    groups = scraper.group_by_prefix(names + QCD_FAMILY[:1], max_group=3)
+    assert groups == [("QCD-4Jets_HT-1", sorted(QCD_FAMILY)[:3]), (None, [sorted(QCD_FAMILY)[3]]),
+                      (None, ["TTto2L2Nu_TuneCP5_13p6TeV_powheg-pythia8"]), (None, ["WtoLNu-2Jets_TuneCP5_13p6TeV_amcatnloFXFX-pythia8"])]
+
+def test_scraper_lookup_group_on_saved_page(scraper):
+    # The page only lists three of the four family members; the fourth goes to the exact search
+    page = results_page(scraper, QCD_FAMILY[:3])
+    exact = []
+    def lookup_exact(name):
+        exact.append(name)
+        return [{"process_name": name, "cross_section": "7.0", "total_uncertainty": "0.1"}]
+    found = dict(scraper.lookup_group("QCD-4Jets_HT-", QCD_FAMILY,
+                                      lambda prefix: scraper.rows_to_info(scraper.parse_result_rows(page, prefix, prefix=True)), lookup_exact))
+    assert list(found) == QCD_FAMILY
+    assert exact == [QCD_FAMILY[3]]
+    assert found[QCD_FAMILY[0]][0]["cross_section"] == "100.5"
+
+def test_scraper_parse_exact_row(scraper):
+    names = [f"Process_{i}" for i in range(50)] + ["TTto2L2Nu_TuneCP5_13p6TeV_powheg-pythia8_ext", "TTto2L2Nu_TuneCP5_13p6TeV_powheg-pythia8"]
+    page = results_page(scraper, names)
+    # The _ext row and the search field mention the name first; only the row of the process itself counts
+    rows = scraper.parse_result_rows(page.replace("process_name=QCD", "process_name=TTto2L2Nu_TuneCP5_13p6TeV_powheg-pythia8"),
+                                     "TTto2L2Nu_TuneCP5_13p6TeV_powheg-pythia8")
+    assert len(rows) == 1 and rows[0][:2] == ["TTto2L2Nu_TuneCP5_13p6TeV_powheg-pythia8", "151.5"]
+    assert scraper.parse_result_rows(page, "TTto2L2Nu_TuneCP5_13p6TeV") is None
+    assert scraper.parse_result_rows(page, "Process_7")[0][1] == "107.5"
+
+def test_scraper_row_parser_stops_at_first_match(scraper):
+    page = results_page(scraper, ["Process_0", "Process_1", "Process_1", "Process_2"])
+    parser = scraper.ResultRowParser("Process_1")
+    parser.feed(page)
+    assert parser.done and len(parser.rows) == 1 and parser.rows[0][1] == "101.5"
+    # Nothing after the matching row is collected
+    assert len(parser._rows) == 2
+
+class ScriptedDriver:
+    """Returns the scripted results of EXTRACT_ROWS_JS one call after the other (the last one repeats)."""
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def execute_script(self, script, *args):
+        self.calls += 1
+        return self.results[min(self.calls, len(self.results)) - 1]
+
+def test_scraper_wait_for_result_rows(scraper):
+    row = ["TTto2L2Nu", "96.9"]
+    ext = ["TTto2L2Nu_ext", "97.0"]
+    # Rows of the previous search first, then the result
+    driver = ScriptedDriver(None, [["Other", "1.0"]], [ext, row, row])
+    assert scraper.wait_for_result_rows(driver, "TTto2L2Nu", timeout=5) == [row]
+    assert driver.calls == 3
+    assert scraper.wait_for_result_rows(ScriptedDriver([ext, row]), "TTto2L2Nu", prefix=True, timeout=5) == [ext, row]
+
+    # XSDB says it found nothing: no waiting for the timeout
+    driver = ScriptedDriver(None, [])
+    start = time.perf_counter()
+    assert scraper.wait_for_result_rows(driver, "NotInXSDB", timeout=10) == []
+    assert time.perf_counter() - start < 1
+    assert scraper.wait_for_result_rows(ScriptedDriver(None), "NotInXSDB", timeout=0.2) is None
+
+# ---------------------------
+# XSectionStore
+# ---------------------------
+def iso_days_ago(days):
+    return time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(time.time() - days * 86400))
+
+def test_store_seed_uses_modified_on_not_file_time(tmp_path):
+    path = os.path.join(str(tmp_path), "info_XSDB_2024-01-01_00-00.json")
+    with open(path, "w") as f:
+        json.dump([{"process_name": "Recent", "cross_section": "1.0", "modifiedOn": iso_days_ago(2)},
+                   {"process_name": "Old", "cross_section": "2.0", "modifiedOn": iso_days_ago(400)},
+                   {"process_name": "NoDate", "cross_section": "3.0"}], f)
+    # Freshly written (as after a pull from EOS): the file time says nothing about the rows
+    store = XSectionStore(os.path.join(str(tmp_path), "store.sqlite"))
+    store.seed_from_json([path])
+    cached, to_query = store.split(["Recent", "Old", "NoDate", "Unknown"])
+    assert list(cached) == ["Recent"]
+    assert to_query == ["Old", "NoDate", "Unknown"]
+
+    # Once looked up again the fetch time is known
+    store.put("Old", [{"process_name": "Old", "cross_section": "2.0", "modifiedOn": iso_days_ago(400)}])
+    assert "Old" in store.split(["Old"])[0]
+    store.close()
+
+# ---------------------------
+# EOSSync with a local directory standing in for EOS
+# ---------------------------
+def write_files(directory, files):
+    os.makedirs(directory, exist_ok=True)
+    for name, content in files.items():
+        with open(os.path.join(directory, name), "w") as f:
+            f.write(content)
+
+def read_files(directory):
+    files = {}
+    for name in sorted(os.listdir(directory)):
+        if name == MANIFEST:
+            continue
+        with open(os.path.join(directory, name)) as f:
+            files[name] = f.read()
+    return files
+
+def test_eos_push_and_pull(tmp_path):
+    remote, a, b = (os.path.join(str(tmp_path), d) for d in ("eos", "a", "b"))
+    write_files(a, {"info_1.json": "[1]", "info_2.json": "[2]"})
+    assert EOSSync(remote, a, verbose=False).push() == 2
+    assert EOSSync.read_manifest(os.path.join(remote, MANIFEST)) == {name: EOSSync.file_hash(os.path.join(a, name)) for name in ("info_1.json", "info_2.json")}
+    assert not [name for name in os.listdir(remote) if name.endswith(".tmp")]
+
+    assert EOSSync(remote, b, verbose=False).pull() == 2
+    assert read_files(b) == read_files(a)
+    # Only what changed travels
+    write_files(a, {"info_2.json": "[2, 3]"})
+    assert EOSSync(remote, a, verbose=False).push() == 1
+    assert EOSSync(remote, b, verbose=False).pull() == 1
+    with open(os.path.join(b, "info_2.json")) as f:
+        assert f.read() == "[2, 3]"
+    assert EOSSync(remote, b, verbose=False).pull() == 0
+
+def test_eos_pull_without_manifest(tmp_path):
+    remote, local = os.path.join(str(tmp_path), "eos"), os.path.join(str(tmp_path), "local")
+    write_files(remote, {"info_old.json": "[0]", "ManualRecords_XSDB.json": "[]"})
+    sync = EOSSync(remote, local, verbose=False)
+    # Legacy layout: the whole directory is copied once
+    assert sync.pull() == -1
+    assert read_files(local) == read_files(remote)
+    # The next push writes the manifest, after which pulls are incremental
+    assert sync.push() == 2
+    assert sync.pull() == 0
+
+def test_eos_concurrent_pushes_keep_each_others_entries(tmp_path):
+    remote, a, b = (os.path.join(str(tmp_path), d) for d in ("eos", "a", "b"))
+    write_files(a, {"info_a.json": "[1]"})
+    write_files(b, {"info_b.json": "[2]"})
+    sync_a, sync_b = EOSSync(remote, a, verbose=False), EOSSync(remote, b, verbose=False)
+
+    # b pushes while a is uploading its data, i.e. after a read the (empty) remote manifest
+    upload = sync_a._upload
+    def upload_racing_b(src, name):
+        if name == "info_a.json":
+            sync_b.push()
+        return upload(src, name)
+    sync_a._upload = upload_racing_b
+    assert sync_a.push() == 1
+    assert sorted(EOSSync.read_manifest(os.path.join(remote, MANIFEST))) == ["info_a.json", "info_b.json"]
+    assert EOSSync(remote, os.path.join(str(tmp_path), "c"), verbose=False).pull() == 2
@@ -0,0 +1,119 @@
+import json
+import time
+import urllib.request
+import urllib.error
+import concurrent.futures
+
+XSDB_API_URL = "https://xsecdb-xsdb-official.app.cern.ch/api/search"
+
+class XSDBAPIClient:
+    """
+    Query the XSDB search endpoint directly over HTTP instead of driving the web page.
+
+    The browser is still needed once for CERN_login; its session cookies are reused here
+    so every search is a single POST returning JSON records.
+
+    Usage:
+        client = XSDBAPIClient(driver.get_cookies(), wanted=WANTED)
+        infos = client.get_info_many(dataset_names)
+    """
+    def __init__(self, cookies, wanted, url: str = XSDB_API_URL, page_size: int = 1000,
+                 timeout: int = 30, max_workers: int = 16):
+        self.url = url
+        self.wanted = set(wanted)
+        self.page_size = page_size
+        self.timeout = timeout
+        self.max_workers = max(1, int(max_workers))
+        self.headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "Cookie": self.cookie_header(cookies),
+        }
+
+    @staticmethod
+    def cookie_header(cookies) -> str:
+        """Turn selenium's driver.get_cookies() list (or a plain dict) into a Cookie header."""
+        if isinstance(cookies, dict):
+            return "; ".join(f"{k}={v}" for k, v in cookies.items())
+        return "; ".join(f"{c['name']}={c['value']}" for c in cookies or [])
+
+    def _post(self, payload: dict):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(payload).encode("utf-8"),
+            headers=self.headers,
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def search(self, search: dict, max_retries: int = 3, backoff: float = 1.0) -> list:
+        """
+        POST one search (e.g. {"process_name": name}) and return the raw records.
+        Transient HTTP/network errors are retried; an expired session raises PermissionError.
+        """
+        payload = {
+            "search": search,
+            "pagination": {"pageSize": self.page_size, "currentPage": 0},
+            "orderBy": {},
+        }
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                records = self._post(payload)
+                break
+            except urllib.error.HTTPError as e:
+                if e.code in (401, 403):
+                    raise PermissionError(f"XSDB rejected the session cookie (HTTP {e.code}), login again")
+                if attempt >= max_retries:
+                    raise
+            except (urllib.error.URLError, TimeoutError, json.JSONDecodeError):
+                if attempt >= max_retries:
+                    raise
+            time.sleep(backoff * attempt)
+        # Some deployments wrap the list, accept both shapes
+        if isinstance(records, dict):
+            records = records.get("data") or records.get("records") or []
+        return records
+
+    def _to_row(self, record: dict) -> dict:
+        # Match the HTML scraper output: only WANTED fields, every value as a string
+        return {
+            key: "" if record.get(key) is None else str(record.get(key)).strip()
+            for key in self.wanted
+        }
+
+    def get_info(self, dataset_name: str) -> list:
+        """Return the WANTED fields of every XSDB record whose process_name is exactly dataset_name."""
+        dataset_name = dataset_name.replace('\n', '').replace('\r', '').strip()
+        records = self.search({"process_name": dataset_name})
+        return [self._to_row(r) for r in records if r.get("process_name") == dataset_name]
+
+    def get_info_matching(self, pattern: str) -> list:
+        """Return the WANTED fields of every record XSDB returns for a process_name search on pattern."""
+        return [self._to_row(r) for r in self.search({"process_name": pattern}) if pattern in str(r.get("process_name", ""))]
+
+    def get_info_many(self, dataset_names, callback=None) -> list:
+        """
+        Look up many datasets concurrently. Returns one list of rows per input name, in input order.
+        Lookups that raise are reported and returned as empty lists. callback(index, rows) is called
+        as results arrive. An expired session (PermissionError) cancels the lookups not started yet
+        and is raised once the ones in flight have returned.
+        """
+        results = [[] for _ in dataset_names]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.get_info, name): i for i, name in enumerate(dataset_names)}
+            for future in concurrent.futures.as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except PermissionError:
+                    # Every queued request would be rejected too, do not wait for them
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise
+                except Exception as e:
+                    print(f"[XSDBAPIClient] lookup failed for {dataset_names[i].strip()}: {e}", flush=True)
+                if callback:
+                    callback(i, results[i])
+        return results
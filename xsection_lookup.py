@@ -0,0 +1,61 @@
+import sqlite3
+import argparse
+
+class XSectionLookup:
+    """
+    Read-only access to the lookup table written by JSONUpdater.export_lookup.
+
+    Lookups are indexed (O(log n)) and nothing is parsed at startup, so thousands of jobs
+    can open the same file cheaply.
+
+    Usage:
+        xsecs = XSectionLookup("info_XSDB.sqlite")
+        weight = xsecs.xsec_times_kfactor("TTto2L2Nu_TuneCP5_13p6TeV_powheg-pythia8")
+        record = xsecs.by_das("/TTto2L2Nu_TuneCP5_13p6TeV_powheg-pythia8/Run3Summer22.../MINIAODSIM")
+    """
+    FIELDS = ("process_name", "das", "cross_section", "total_uncertainty",
+              "other_uncertainty", "kfactor", "energy", "accuracy", "mcm")
+
+    def __init__(self, lookup_file: str):
+        # immutable=1: no locking or journal checks, the file is never written once published
+        self.conn = sqlite3.connect(f"file:{lookup_file}?mode=ro&immutable=1", uri=True)
+        self._select = "SELECT " + ", ".join(self.FIELDS) + " FROM xsec WHERE "
+
+    def close(self):
+        self.conn.close()
+
+    def _rows(self, where: str, value: str):
+        return [dict(zip(self.FIELDS, row)) for row in self.conn.execute(self._select + where, (value,))]
+
+    def get_all(self, process_name: str):
+        """Every record for process_name (one per DAS path)."""
+        return self._rows("process_name = ?", process_name)
+
+    def get(self, process_name: str):
+        """First record for process_name, None if unknown."""
+        rows = self._rows("process_name = ? LIMIT 1", process_name)
+        return rows[0] if rows else None
+
+    def by_das(self, das: str):
+        """Record for a DAS dataset path, None if unknown."""
+        rows = self._rows("das = ? LIMIT 1", das)
+        return rows[0] if rows else None
+
+    def xsec_times_kfactor(self, process_name: str):
+        """cross_section * kFactor (kFactor defaults to 1), None if the process or its cross section is unknown."""
+        record = self.get(process_name)
+        if record is None or record["cross_section"] is None:
+            return None
+        return record["cross_section"] * (record["kfactor"] if record["kfactor"] is not None else 1.0)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Look up cross sections in a compiled XSDB lookup table.")
+    parser.add_argument("lookup_file", help="SQLite file written by json_updater.py --lookup.")
+    parser.add_argument("names", nargs="+", help="Process names or DAS paths (starting with /).")
+    args = parser.parse_args()
+
+    xsecs = XSectionLookup(args.lookup_file)
+    for name in args.names:
+        record = xsecs.by_das(name) if name.startswith("/") else xsecs.get(name)
+        print(name, record)
+    xsecs.close()
@@ -0,0 +1,153 @@
+import json
+import os
+import sqlite3
+import time
+import argparse
+from json_updater import modified_on_timestamp
+
+DAY = 24 * 3600
+
+class XSectionStore:
+    """
+    Persistent local cache of XSDB results, keyed by process name (SQLite).
+
+    Each process keeps the rows found in XSDB (or an empty list for a miss), the XSDB
+    'modifiedOn' of those rows and when we fetched them. Staleness policy:
+      - manual records never go stale
+      - records modified in XSDB shortly before we fetched them are still moving, recheck after recent_max_age
+      - other records are rechecked after max_age
+      - misses (process not in XSDB) are retried after miss_max_age
+
+    Usage:
+        store = XSectionStore("xsection_store.sqlite")
+        store.seed_from_json(JSONUpdater.get_json_files_from_directory("XSectionJSONs/"))
+        cached, to_query = store.split(dataset_names)
+    """
+    def __init__(self, path: str = "xsection_store.sqlite", max_age_days: float = 90,
+                 recent_max_age_days: float = 7, recent_window_days: float = 30, miss_max_age_days: float = 1):
+        self.path = path
+        self.max_age = max_age_days * DAY
+        self.recent_max_age = recent_max_age_days * DAY
+        self.recent_window = recent_window_days * DAY
+        self.miss_max_age = miss_max_age_days * DAY
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            " process_name TEXT PRIMARY KEY,"
+            " rows TEXT NOT NULL,"
+            " modified_on REAL,"
+            " fetched_on REAL NOT NULL,"
+            " source TEXT NOT NULL)"
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    @staticmethod
+    def _group(entries):
+        grouped = {}
+        for entry in entries:
+            if "process_name" in entry:
+                grouped.setdefault(entry["process_name"], []).append(entry)
+        return grouped
+
+    def _upsert(self, process_name, rows, fetched_on, source, replace=True):
+        # Without replace, only fill in processes that are absent or recorded as misses
+        condition = "" if replace else " WHERE records.source = 'miss'"
+        self.conn.execute(
+            "INSERT INTO records (process_name, rows, modified_on, fetched_on, source) VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT(process_name) DO UPDATE SET rows = excluded.rows, modified_on = excluded.modified_on,"
+            " fetched_on = excluded.fetched_on, source = excluded.source" + condition,
+            (process_name, json.dumps(rows, sort_keys=True), modified_on_timestamp(rows), fetched_on, source),
+        )
+
+    def seed_from_json(self, files, overwrite: bool = False):
+        """
+        Load XSDB json outputs (e.g. XSectionJSONs/*.json). When their rows were fetched is not
+        recorded (a file just pulled from EOS is new however old its rows are), so the rows' XSDB
+        modifiedOn, the earliest they can have been fetched, is used as fetch time; rows without
+        modifiedOn (files written before it was scraped) are stale at once and looked up again.
+        Existing records (other than misses) are kept unless overwrite is set.
+        """
+        for file in files:
+            try:
+                with open(file, "r", encoding="utf-8") as f:
+                    entries = json.load(f)
+            except Exception as e:
+                print(f"[XSectionStore] Error loading {file}: {e}")
+                continue
+            for process_name, rows in self._group(entries).items():
+                self._upsert(process_name, rows, modified_on_timestamp(rows) or 0.0, "seed", replace=overwrite)
+        self.conn.commit()
+
+    def seed_manual(self, entries):
+        """Manual records (ManualRecords_XSDB.json) always win and never go stale."""
+        now = time.time()
+        for process_name, rows in self._group(entries).items():
+            self._upsert(process_name, rows, now, "manual")
+        self.conn.commit()
+
+    def put(self, process_name: str, rows):
+        """Store a fresh XSDB result for process_name; empty rows record a miss."""
+        self._upsert(process_name, list(rows), time.time(), "xsdb" if rows else "miss")
+
+    def commit(self):
+        self.conn.commit()
+
+    def _lookup(self, process_name):
+        return self.conn.execute(
+            "SELECT rows, modified_on, fetched_on, source FROM records WHERE process_name = ?",
+            (process_name,),
+        ).fetchone()
+
+    def _is_stale(self, modified_on, fetched_on, source, now) -> bool:
+        if source == "manual":
+            return False
+        age = now - fetched_on
+        if source == "miss":
+            return age > self.miss_max_age
+        if modified_on is not None and fetched_on - modified_on < self.recent_window:
+            return age > self.recent_max_age
+        return age > self.max_age
+
+    def split(self, process_names):
+        """
+        Partition process_names into (cached, to_query):
+          cached:   {process_name: rows} for fresh records (rows may be [] for a known miss)
+          to_query: names that are missing from the store or stale, in input order
+        """
+        now = time.time()
+        cached = {}
+        to_query = []
+        for name in process_names:
+            row = self._lookup(name)
+            if row is None:
+                to_query.append(name)
+                continue
+            rows, modified_on, fetched_on, source = row
+            if self._is_stale(modified_on, fetched_on, source, now):
+                to_query.append(name)
+            else:
+                cached[name] = json.loads(rows)
+        return cached, to_query
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed or inspect the local cross-section store.")
+    parser.add_argument("--store", "-s", default="xsection_store.sqlite", help="Path to the SQLite store.")
+    parser.add_argument("--seed", nargs="*", default=[], help="XSDB json files to seed the store with.")
+    parser.add_argument("--dir", "-d", help="Directory of XSDB json files to seed the store with (e.g. XSectionJSONs/).")
+    parser.add_argument("--manual", "-m", help="Manual records json (never stale).")
+    args = parser.parse_args()
+
+    store = XSectionStore(args.store)
+    files = list(args.seed)
+    if args.dir:
+        files.extend(os.path.join(args.dir, f) for f in os.listdir(args.dir) if f.endswith(".json"))
+    store.seed_from_json(files)
+    if args.manual:
+        with open(args.manual, "r", encoding="utf-8") as f:
+            store.seed_manual(json.load(f))
+    for source, count in store.conn.execute("SELECT source, COUNT(*) FROM records GROUP BY source"):
+        print(f"{source}: {count}")
+    store.close()